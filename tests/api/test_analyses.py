@@ -191,7 +191,7 @@ async def test_blast(error, mocker, spawn_client, resp_is, static_time):
 
     m_check_rid = mocker.patch("virtool.bio.check_rid", make_mocked_coro(return_value=False))
 
-    m_wait_for_blast_result = mocker.patch("virtool.bio.wait_for_blast_result", make_mocked_coro())
+    m_add = mocker.patch.object(client.app["blast"], "add")
 
     await client.put("/api/analyses/foobar/5/blast", {})
 
@@ -235,18 +235,101 @@ async def test_blast(error, mocker, spawn_client, resp_is, static_time):
 
     m_initialize_ncbi_blast.assert_called_with(
         {},
+        client.app["client"],
         "GGAGTTAGATTGG"
     )
 
     m_check_rid.assert_called_with(
         {},
+        client.app["client"],
         "FOOBAR1337"
     )
 
-    m_wait_for_blast_result.assert_called_with(
-        client.db,
-        {},
+    m_add.assert_called_with(
         "foobar",
         5,
         "FOOBAR1337"
     )
+
+
+@pytest.mark.parametrize("error", [None, "404_sequence", "409_algorithm"])
+async def test_blast_many(error, mocker, spawn_client, resp_is, static_time):
+    """
+    Test that the handler submits several NuVs sequences as a single BLAST request and attaches the shared RID to each
+    of them.
+
+    """
+    client = await spawn_client(authorize=True)
+
+    await client.db.samples.insert_one({
+        "_id": "baz",
+        "all_read": True,
+        "all_write": True,
+        "group": "tech",
+        "group_read": True,
+        "group_write": True,
+        "user": {
+            "id": "fred"
+        }
+    })
+
+    await client.db.analyses.insert_one({
+        "_id": "foobar",
+        "algorithm": "pathoscope_bowtie" if error == "409_algorithm" else "nuvs",
+        "ready": True,
+        "results": [
+            {"index": 3, "sequence": "ATAGAGATTAGAT"},
+            {"index": 5, "sequence": "GGAGTTAGATTGG"},
+            {"index": 8, "sequence": "ACCAATAGACATT"}
+        ],
+        "sample": {
+            "id": "baz"
+        }
+    })
+
+    m_initialize_ncbi_blast_many = mocker.patch(
+        "virtool.bio.initialize_ncbi_blast_many",
+        make_mocked_coro(("FOOBAR1337", 23))
+    )
+
+    mocker.patch("virtool.bio.check_rid", make_mocked_coro(return_value=False))
+
+    m_add_many = mocker.patch.object(client.app["blast"], "add_many")
+
+    resp = await client.put("/api/analyses/foobar/blast", {
+        "sequence_indexes": [8, 3, 9] if error == "404_sequence" else [8, 3]
+    })
+
+    if error == "404_sequence":
+        assert await resp_is.not_found(resp, "Sequence not found")
+        return
+
+    if error == "409_algorithm":
+        assert await resp_is.conflict(resp, "Not a NuVs analysis")
+        return
+
+    assert resp.status == 201
+
+    blast = {
+        "rid": "FOOBAR1337",
+        "interval": 3,
+        "ready": False,
+        "last_checked_at": static_time.iso,
+        "queries": [3, 8]
+    }
+
+    assert await resp.json() == [
+        {"index": 3, "blast": blast},
+        {"index": 8, "blast": blast}
+    ]
+
+    m_initialize_ncbi_blast_many.assert_called_with({}, client.app["client"], {
+        3: "ATAGAGATTAGAT",
+        8: "ACCAATAGACATT"
+    })
+
+    m_add_many.assert_called_with("foobar", [3, 8], "FOOBAR1337")
+
+    document = await client.db.analyses.find_one("foobar")
+
+    assert [result.get("blast", {}).get("rid") for result in document["results"]] == ["FOOBAR1337", None, "FOOBAR1337"]
@@ -2,6 +2,8 @@ import aiohttp.client
 import pytest
 from aiohttp.test_utils import make_mocked_coro
 
+import virtool.cache
+
 
 @pytest.mark.parametrize("error", [None, "404"])
 async def test_get(error, mocker, resp_is, spawn_client):
@@ -29,3 +31,24 @@ async def test_get(error, mocker, resp_is, spawn_client):
 
     assert resp.status == 200
     assert await resp.json() == expected
+
+
+async def test_get_cached(mocker, tmpdir, spawn_client):
+    """
+    Test that a cached GenBank record is returned without contacting NCBI.
+
+    """
+    client = await spawn_client(authorize=True)
+
+    client.app["genbank_cache"] = virtool.cache.DiskCache(str(tmpdir), max_size=1000, ttl=60)
+
+    await client.app["genbank_cache"].set("NC_016574.1", {"accession": "baz"})
+
+    m_fetch = mocker.patch("virtool.genbank.fetch", make_mocked_coro(None))
+
+    resp = await client.get("/api/genbank/NC_016574.1")
+
+    assert resp.status == 200
+    assert await resp.json() == {"accession": "baz"}
+
+    assert not m_fetch.called
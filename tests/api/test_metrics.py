@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.mark.parametrize("administrator", [True, False])
+async def test_get(administrator, spawn_client, resp_is):
+    client = await spawn_client(authorize=True, administrator=administrator)
+
+    resp = await client.get("/api/metrics")
+
+    if not administrator:
+        assert await resp_is.insufficient_rights(resp)
+        return
+
+    assert resp.status == 200
+
+    data = await resp.json()
+
+    # The sessions collection is queried to authorize the request.
+    assert data["collections"]["sessions"]["operations"]["find_one"]["count"] >= 1
@@ -162,6 +162,49 @@ async def test_update(error, mocker, spawn_client, check_ref_right, id_exists, r
     }
 
 
+@pytest.mark.parametrize("administrator", [True, False])
+async def test_compact_history(administrator, mocker, spawn_client, id_exists, resp_is):
+    client = await spawn_client(authorize=True, administrator=administrator)
+
+    m_compact_history = mocker.patch("virtool.db.references.compact_history", make_mocked_coro())
+
+    m_register = mocker.patch(
+        "virtool.db.processes.register",
+        make_mocked_coro({
+            "id": "process",
+            "step": "find_changes",
+            "type": "compact_history"
+        })
+    )
+
+    resp = await client.post("/api/refs/foo/history/compact")
+
+    if not administrator:
+        assert await resp_is.insufficient_rights(resp)
+        return
+
+    id_exists.assert_called_with(
+        client.db.references,
+        "foo"
+    )
+
+    if not id_exists:
+        assert await resp_is.not_found(resp)
+        return
+
+    m_register.assert_called_with(client.db, "compact_history")
+
+    m_compact_history.assert_called_with(client.app, "foo", "process")
+
+    assert resp.status == 202
+
+    assert await resp.json() == {
+        "id": "process",
+        "step": "find_changes",
+        "type": "compact_history"
+    }
+
+
 async def test_find_indexes(mocker, spawn_client, id_exists, md_proxy, resp_is):
     client = await spawn_client(authorize=True)
 
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+from aiohttp.test_utils import make_mocked_coro
+
+import virtool.api.websocket
+from virtool.dispatcher import Dispatcher
+
+
+@pytest.mark.parametrize("data,subscribed", [
+    ('{"method": "subscribe", "interfaces": ["jobs", "samples"]}', ["jobs", "samples"]),
+    ('{"method": "subscribe", "interfaces": "jobs"}', None),
+    ('{"method": "foo", "interfaces": ["jobs"]}', None),
+    ('[1, 2]', None),
+    ("not json", None)
+], ids=["valid", "not_list", "unknown_method", "not_object", "malformed"])
+async def test_handle_message(data, subscribed, loop, mocker):
+    dispatcher = Dispatcher(loop)
+
+    connection = mocker.Mock()
+
+    dispatcher.add_connection(connection)
+
+    await virtool.api.websocket.handle_message(dispatcher, connection, data)
+
+    if subscribed is None:
+        assert dispatcher.subscribers == {}
+        assert dispatcher.get_subscribers("jobs") == [connection]
+    else:
+        assert sorted(dispatcher.subscribers) == subscribed
+        assert dispatcher.get_subscribers("jobs") == [connection]
+        assert dispatcher.get_subscribers("otus") == []
+
+
+async def test_handle_unsubscribe(loop, mocker):
+    dispatcher = Dispatcher(loop)
+
+    connection = mocker.Mock()
+
+    dispatcher.add_connection(connection)
+
+    for method in ["subscribe", "unsubscribe"]:
+        data = '{"method": "%s", "interfaces": ["jobs"]}' % method
+        await virtool.api.websocket.handle_message(dispatcher, connection, data)
+
+    assert dispatcher.get_subscribers("jobs") == []
+
+
+async def test_handle_get(loop, mocker):
+    dispatcher = Dispatcher(loop)
+
+    m_send_current = mocker.patch.object(dispatcher, "send_current", make_mocked_coro(True))
+
+    connection = mocker.Mock()
+
+    data = '{"method": "get", "interface": "otus", "id": "foo"}'
+
+    await virtool.api.websocket.handle_message(dispatcher, connection, data)
+
+    m_send_current.assert_called_with(connection, "otus", "foo")
+
+
+@pytest.mark.parametrize("data", [
+    '{"method": "get", "interface": "otus", "id": "foo"}',
+    '{"method": "subscribe", "interfaces": ["otus"]}',
+    '{"method": "resume", "sequence": 0}'
+], ids=["get", "subscribe", "resume"])
+async def test_handle_unauthorized(data, loop, mocker):
+    """
+    Test that connections without a user id can't request documents, subscribe to interfaces, or resume.
+
+    """
+    dispatcher = Dispatcher(loop)
+
+    m_send_current = mocker.patch.object(dispatcher, "send_current", make_mocked_coro(True))
+    m_resume = mocker.patch.object(dispatcher, "resume", make_mocked_coro())
+
+    connection = mocker.Mock(user_id=None)
+
+    dispatcher.add_connection(connection)
+
+    await virtool.api.websocket.handle_message(dispatcher, connection, data)
+
+    assert not m_send_current.called
+    assert not m_resume.called
+    assert dispatcher.subscribers == {}
+
+
+@pytest.mark.parametrize("sequence,called", [(1337, True), ("1337", False), (True, False)])
+async def test_handle_resume(sequence, called, loop, mocker):
+    dispatcher = Dispatcher(loop)
+
+    m_resume = mocker.patch.object(dispatcher, "resume", make_mocked_coro())
+
+    connection = mocker.Mock()
+
+    data = json.dumps({"method": "resume", "sequence": sequence})
+
+    await virtool.api.websocket.handle_message(dispatcher, connection, data)
+
+    if called:
+        m_resume.assert_called_with(connection, 1337)
+    else:
+        assert not m_resume.called
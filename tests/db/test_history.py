@@ -3,6 +3,7 @@ import datetime
 import pytest
 
 import virtool.db.history
+import virtool.otus
 
 
 class TestAdd:
@@ -22,21 +23,21 @@ class TestAdd:
 
         document = await dbi.history.find_one()
 
-        # Sort the real and expected diffs so they are directly comparable.
-        returned_change["diff"].sort()
-        document["diff"].sort()
-        test_change["diff"].sort()
+        diff = {
+            "format": "otu",
+            "fields": {
+                "abbreviation": {"old": "PVF", "new": ""},
+                "name": {"old": "Prunus virus F", "new": "Prunus virus E"},
+                "version": {"old": 0, "new": 1}
+            }
+        }
 
-        assert document == test_change
+        assert document == dict(test_change, diff=diff)
 
         assert returned_change == {
             "_id": "6116cba1.1",
             "description": "Edited Prunus virus E",
-            "diff": [
-                ("change", "abbreviation", ("PVF", "")),
-                ("change", "name", ("Prunus virus F", "Prunus virus E")),
-                ("change", "version", (0, 1))
-            ],
+            "diff": diff,
             "index": {
                 "id": "unbuilt",
                 "version": "unbuilt"
@@ -165,6 +166,152 @@ async def test_patch_to_version(remove, dbi, test_merged_otu, create_mock_histor
     assert reverted_change_ids == expected_reverted_change_ids
 
 
+    async def test_snapshot(self, monkeypatch, dbi, static_time, test_otu_edit):
+        """
+        Test that the new otu is stored with changes that produce a version divisible by ``SNAPSHOT_INTERVAL``.
+
+        """
+        monkeypatch.setattr("virtool.history.SNAPSHOT_INTERVAL", 1)
+
+        old, new = test_otu_edit
+
+        change = await virtool.db.history.add(dbi, "edit", old, new, "Edited", "test")
+
+        assert change["snapshot"] == new
+        assert (await dbi.history.find_one())["snapshot"] == new
+
+
+@pytest.mark.parametrize("version", [0, 1, 2])
+@pytest.mark.parametrize("snapshot", [True, False])
+async def test_patch_to_version_snapshot(version, snapshot, dbi, test_merged_otu, create_mock_history):
+    """
+    Test that otus are patched to the correct version when patching starts from a stored snapshot, the creation
+    change, or the current otu.
+
+    """
+    await create_mock_history(False)
+
+    expected = {
+        0: test_merged_otu,
+        1: dict(test_merged_otu, abbreviation="TST", version=1),
+        2: dict(test_merged_otu, abbreviation="TST", name="Test Virus", version=2)
+    }
+
+    if snapshot:
+        await dbi.history.update_one({"_id": "6116cba1.2"}, {"$set": {"snapshot": expected[2]}})
+
+    _, patched, reverted_change_ids = await virtool.db.history.patch_to_version(dbi, "6116cba1", version)
+
+    assert patched == expected[version]
+
+    assert reverted_change_ids == ["6116cba1.{}".format(v) for v in range(3, version, -1)]
+
+
+@pytest.mark.parametrize("version", [-1, 0, 1, 2, 3])
+@pytest.mark.parametrize("remove", [True, False])
+async def test_patch_many_to_version(version, remove, mocker, dbi, test_otu, test_sequence, create_mock_history):
+    """
+    Test that the otus patched in a batch match those patched one at a time and that otus already at the requested
+    version are joined without reading their history.
+
+    """
+    await create_mock_history(remove)
+
+    await dbi.otus.insert_one(dict(test_otu, _id="foobar", version=4))
+    await dbi.sequences.insert_one(dict(test_sequence, otu_id="foobar"))
+
+    _, expected, _ = await virtool.db.history.patch_to_version(dbi, "6116cba1", version)
+
+    # Don't use the otu cached by ``patch_to_version``.
+    dbi.otu_cache.memory.clear()
+
+    m_find = mocker.spy(dbi.history, "find")
+
+    patched = await virtool.db.history.patch_many_to_version(dbi, {
+        "6116cba1": version,
+        "foobar": 4
+    })
+
+    assert patched == {
+        "6116cba1": expected,
+        "foobar": virtool.otus.merge_otu(dict(test_otu, _id="foobar", version=4), [
+            dict(test_sequence, otu_id="foobar")
+        ])
+    }
+
+    assert m_find.call_count == (0 if version == 3 and not remove else 2)
+
+
+async def test_patch_many_to_version_cached(mocker, dbi, create_mock_history):
+    """
+    Test that otus are returned from the otu cache without querying the database, that current otus are not cached,
+    and that reverting a change removes the reverted versions from the cache.
+
+    """
+    await create_mock_history(False)
+
+    await virtool.db.history.patch_many_to_version(dbi, {"6116cba1": 3})
+
+    assert await dbi.otu_cache.get("6116cba1", 3) is None
+
+    patched = await virtool.db.history.patch_many_to_version(dbi, {"6116cba1": 1})
+
+    m_find = mocker.spy(dbi.otus, "find")
+
+    assert await virtool.db.history.patch_many_to_version(dbi, {"6116cba1": 1}) == patched
+
+    assert not m_find.called
+
+    await virtool.db.history.patch_many_to_version(dbi, {"6116cba1": 2})
+
+    assert await dbi.otu_cache.get("6116cba1", 2) is not None
+
+    await virtool.db.history.revert(dbi, "6116cba1.2")
+
+    assert await dbi.otu_cache.get("6116cba1", 1) == patched["6116cba1"]
+    assert await dbi.otu_cache.get("6116cba1", 2) is None
+
+
+async def test_compact(dbi, test_merged_otu, create_mock_history):
+    """
+    Test that compacted changes are deleted, that kept versions can still be patched to, and that a later unbuilt
+    change can still be reverted.
+
+    """
+    await create_mock_history(False)
+
+    await dbi.history.update_many({"otu.version": {"$lte": 2}}, {
+        "$set": {
+            "index": {
+                "id": "foo",
+                "version": 0
+            }
+        }
+    })
+
+    expected = {
+        0: test_merged_otu,
+        1: dict(test_merged_otu, abbreviation="TST", version=1),
+        2: dict(test_merged_otu, abbreviation="TST", name="Test Virus", version=2)
+    }
+
+    assert await virtool.db.history.compact(dbi, "6116cba1", [0, 1, 2], []) == 1
+
+    assert await dbi.history.distinct("_id") == ["6116cba1.0", "6116cba1.2", "6116cba1.3"]
+
+    change = await dbi.history.find_one("6116cba1.2")
+
+    assert change["snapshot"] == expected[2]
+
+    dbi.otu_cache.memory.clear()
+
+    for version in [0, 2]:
+        _, patched, _ = await virtool.db.history.patch_to_version(dbi, "6116cba1", version)
+        assert patched == expected[version]
+
+    assert await virtool.db.history.revert(dbi, "6116cba1.3") == expected[2]
+
+
 @pytest.mark.parametrize("exists", [True, False])
 async def test_get_most_recent_change(exists, dbi, static_time):
     """
@@ -0,0 +1,436 @@
+import pytest
+from aiohttp.test_utils import make_mocked_coro
+
+import virtool.db.iface
+import virtool.db.metrics
+import virtool.utils
+
+
+@pytest.fixture
+def collection(test_motor):
+    return virtool.db.iface.Collection(
+        "foo",
+        test_motor.foo,
+        make_mocked_coro(),
+        virtool.utils.base_processor,
+        ["_id", "name"]
+    )
+
+
+@pytest.mark.parametrize("projection", [["_id", "name"], {"count": False}])
+def test_get_projection_dict(projection):
+    if isinstance(projection, list):
+        assert virtool.db.iface.get_projection_dict(projection) == {"_id": True, "name": True}
+    else:
+        assert virtool.db.iface.get_projection_dict(projection) is projection
+
+
+class TestUpdateOne:
+
+    async def test(self, collection):
+        """
+        Test that the updated document is dispatched with the collection projection applied and that the returned
+        update result describes the update.
+
+        """
+        await collection._collection.insert_one({"_id": "bar", "name": "Bar", "count": 1})
+
+        update_result = await collection.update_one({"_id": "bar"}, {"$inc": {"count": 1}})
+
+        assert update_result.matched_count == 1
+        assert update_result.upserted_id is None
+
+        collection.dispatch.assert_called_with("foo", "update", {"id": "bar", "name": "Bar"})
+
+        assert await collection._collection.find_one() == {"_id": "bar", "name": "Bar", "count": 2}
+
+    async def test_upsert(self, collection):
+        update_result = await collection.update_one({"_id": "bar"}, {"$set": {"name": "Bar"}}, upsert=True)
+
+        assert update_result.matched_count == 0
+        assert update_result.upserted_id == "bar"
+
+        collection.dispatch.assert_called_with("foo", "update", {"id": "bar", "name": "Bar"})
+
+    async def test_no_match(self, collection):
+        update_result = await collection.update_one({"_id": "bar"}, {"$set": {"name": "Bar"}})
+
+        assert update_result.matched_count == 0
+        assert update_result.upserted_id is None
+
+        assert not collection.dispatch.called
+
+    async def test_silent(self, collection):
+        await collection._collection.insert_one({"_id": "bar", "name": "Bar"})
+
+        update_result = await collection.update_one({"_id": "bar"}, {"$set": {"name": "Baz"}}, silent=True)
+
+        assert update_result.matched_count == 1
+
+        assert not collection.dispatch.called
+
+
+class TestUpdateMany:
+
+    @pytest.fixture
+    def documents(self, collection, loop):
+        loop.run_until_complete(collection._collection.insert_many([
+            {"_id": "bar", "name": "Bar", "ready": False},
+            {"_id": "baz", "name": "Baz", "ready": False},
+            {"_id": "foo", "name": "Foo", "ready": False}
+        ]))
+
+    @pytest.mark.parametrize("silent", [True, False])
+    async def test(self, silent, collection, documents, monkeypatch):
+        """
+        Test that an update is dispatched for each updated document by default.
+
+        """
+        monkeypatch.setattr("virtool.db.iface.NOTIFICATION_LIMIT", 2)
+
+        update_result = await collection.update_many({"ready": False}, {"$set": {"ready": True}}, silent=silent)
+
+        assert update_result.matched_count == 3
+
+        if silent:
+            assert not collection.dispatch.called
+            return
+
+        assert [c[0] for c in collection.dispatch.call_args_list] == [
+            ("foo", "update", {"id": "bar", "name": "Bar"}),
+            ("foo", "update", {"id": "baz", "name": "Baz"}),
+            ("foo", "update", {"id": "foo", "name": "Foo"})
+        ]
+
+    async def test_batched(self, collection, documents, monkeypatch):
+        """
+        Test that updated documents are dispatched in batches when batched notifications are enabled.
+
+        """
+        monkeypatch.setattr("virtool.db.iface.NOTIFICATION_BATCH_SIZE", 2)
+
+        collection.batch_notifications = True
+
+        await collection.update_many({"ready": False}, {"$set": {"ready": True}})
+
+        assert [c[0] for c in collection.dispatch.call_args_list] == [
+            ("foo", "update_many", [{"id": "bar", "name": "Bar"}, {"id": "baz", "name": "Baz"}]),
+            ("foo", "update", {"id": "foo", "name": "Foo"})
+        ]
+
+    async def test_limit(self, collection, documents, monkeypatch):
+        """
+        Test that clients are told to refetch when batched notifications are enabled and more than
+        ``NOTIFICATION_LIMIT`` documents are updated.
+
+        """
+        monkeypatch.setattr("virtool.db.iface.NOTIFICATION_LIMIT", 2)
+
+        collection.batch_notifications = True
+
+        update_result = await collection.update_many({"ready": False}, {"$set": {"ready": True}})
+
+        assert update_result.matched_count == 3
+
+        collection.dispatch.assert_called_once_with("foo", "refetch", None)
+
+
+@pytest.mark.parametrize("batched", [True, False])
+@pytest.mark.parametrize("limit", [1000, 1])
+async def test_delete_many(limit, batched, collection, monkeypatch):
+    """
+    Test that clients are only told to refetch when batched notifications are enabled and more than
+    ``NOTIFICATION_LIMIT`` documents are deleted.
+
+    """
+    monkeypatch.setattr("virtool.db.iface.NOTIFICATION_LIMIT", limit)
+
+    collection.batch_notifications = batched
+
+    await collection._collection.insert_many([
+        {"_id": "bar", "ready": False},
+        {"_id": "baz", "ready": False},
+        {"_id": "foo", "ready": True}
+    ])
+
+    delete_result = await collection.delete_many({"ready": False})
+
+    assert delete_result.deleted_count == 2
+
+    if limit == 1 and batched:
+        collection.dispatch.assert_called_once_with("foo", "refetch", None)
+    else:
+        collection.dispatch.assert_called_once_with("foo", "delete", ["bar", "baz"])
+
+
+class TestBulk:
+
+    @pytest.fixture
+    def bulk_db(self, test_motor, loop):
+        db = virtool.db.iface.DB(test_motor, make_mocked_coro(), loop)
+        loop.run_until_complete(db.bind_collection("foo", projection=["_id", "name"]))
+        return db
+
+    async def test(self, bulk_db, mocker):
+        """
+        Test that buffered writes are sent in batches and that a summarised change set is dispatched when the block
+        exits.
+
+        """
+        await bulk_db.foo._collection.insert_many([
+            {"_id": "bar", "name": "Bar", "tag": "a"},
+            {"_id": "baz", "name": "Baz", "tag": "b"}
+        ])
+
+        m_bulk_write = mocker.spy(bulk_db.foo._collection, "bulk_write")
+
+        async with bulk_db.bulk("foo", batch_size=2) as batch:
+            await batch.insert_one({"_id": "foo", "name": "Foo"})
+            await batch.update_one({"_id": "bar"}, {"$set": {"name": "Bar 2"}})
+            await batch.update_one({"tag": "b"}, {"$set": {"name": "Baz 2"}})
+
+            assert m_bulk_write.call_count == 1
+            assert not bulk_db.dispatch.called
+
+        assert m_bulk_write.call_count == 2
+
+        assert [c[0] for c in bulk_db.dispatch.call_args_list] == [
+            ("foo", "insert", {"id": "foo", "name": "Foo"}),
+            ("foo", "update", {"id": "bar", "name": "Bar 2"}),
+            ("foo", "update", {"id": "baz", "name": "Baz 2"})
+        ]
+
+    @pytest.mark.parametrize("limit", [1000, 1])
+    async def test_batched(self, limit, bulk_db, monkeypatch):
+        """
+        Test that batched messages are only dispatched when batched notifications are enabled.
+
+        """
+        monkeypatch.setattr("virtool.db.iface.NOTIFICATION_LIMIT", limit)
+
+        bulk_db.foo.batch_notifications = True
+
+        async with bulk_db.bulk("foo") as batch:
+            await batch.insert_one({"_id": "bar", "name": "Bar"})
+            await batch.insert_one({"_id": "baz", "name": "Baz"})
+
+        expected = ("foo", "insert_many", [{"id": "bar", "name": "Bar"}, {"id": "baz", "name": "Baz"}])
+
+        if limit == 1:
+            expected = ("foo", "refetch", None)
+
+        bulk_db.dispatch.assert_called_once_with(*expected)
+
+    @pytest.mark.parametrize("limit", [1000, 1])
+    async def test_unbatched(self, limit, bulk_db, monkeypatch):
+        monkeypatch.setattr("virtool.db.iface.NOTIFICATION_LIMIT", limit)
+
+        async with bulk_db.bulk("foo") as batch:
+            await batch.insert_one({"_id": "bar", "name": "Bar"})
+            await batch.insert_one({"_id": "baz", "name": "Baz"})
+
+        assert [c[0] for c in bulk_db.dispatch.call_args_list] == [
+            ("foo", "insert", {"id": "bar", "name": "Bar"}),
+            ("foo", "insert", {"id": "baz", "name": "Baz"})
+        ]
+
+    async def test_generated_ids(self, bulk_db):
+        async with bulk_db.bulk("foo") as batch:
+            documents = [await batch.insert_one({"name": "Foo {}".format(i)}) for i in range(3)]
+
+        assert await bulk_db.foo.count() == 3
+        assert len({d["_id"] for d in documents}) == 3
+
+    async def test_silent(self, bulk_db):
+        async with bulk_db.bulk("foo", silent=True) as batch:
+            await batch.insert_one({"_id": "foo", "name": "Foo"})
+
+        assert await bulk_db.foo.count() == 1
+        assert not bulk_db.dispatch.called
+
+    async def test_exception(self, bulk_db):
+        """
+        Test that buffered writes are discarded when the block raises.
+
+        """
+        with pytest.raises(ValueError):
+            async with bulk_db.bulk("foo") as batch:
+                await batch.insert_one({"_id": "foo", "name": "Foo"})
+                raise ValueError("Failed")
+
+        assert await bulk_db.foo.count() == 0
+        assert not bulk_db.dispatch.called
+
+
+@pytest.mark.parametrize("query,expected", [
+    ("foo", "foo"),
+    ({"_id": "foo"}, "foo"),
+    ({"_id": "foo", "user.id": "bob"}, "foo"),
+    ({"_id": {"$in": ["foo"]}}, None),
+    ({"_id": "foo", "groups": {"$size": 0}}, None),
+    ({"name": "Foo"}, None),
+    ({"_id": "foo", "archived": None}, None),
+    ({"_id": "foo", "archived": False}, None),
+    (None, None)
+])
+def test_get_cache_key(query, expected):
+    assert virtool.db.iface.get_cache_key(query) == expected
+
+
+@pytest.mark.parametrize("query,expected", [
+    ("foo", True),
+    ({"_id": "foo", "user.id": "bob"}, True),
+    ({"_id": "foo", "user.id": "fred"}, False),
+    ({"_id": "foo", "groups.id": "baz"}, True),
+    ({"_id": "foo", "groups.id": "missing"}, False),
+    ({"_id": "foo", "tags": "b"}, True),
+    ({"_id": "foo", "missing.id": "b"}, False),
+    ({"_id": "foo", "count": 1}, True),
+    ({"_id": "foo", "count": 1.0}, True),
+    ({"_id": "foo", "count": True}, False),
+    ({"_id": "foo", "ready": 1}, False),
+    ({"_id": "foo", "scores": 0}, False)
+])
+def test_match_query(query, expected):
+    document = {
+        "_id": "foo",
+        "user": {"id": "bob"},
+        "groups": [{"id": "bar"}, {"id": "baz"}],
+        "tags": ["a", "b"],
+        "count": 1,
+        "ready": True,
+        "scores": [False]
+    }
+
+    assert virtool.db.iface.match_query(document, query) is expected
+
+
+class TestCache:
+
+    @pytest.fixture
+    def cached(self, test_motor, loop):
+        db = virtool.db.iface.DB(test_motor, make_mocked_coro(), loop)
+        loop.run_until_complete(db.bind_collection("foo", cache=True))
+        return db.foo
+
+    async def test_find_one(self, cached, mocker):
+        """
+        Test that ``find_one`` calls by ``_id`` are served from the cache after the first call and that projections are
+        applied to cached documents.
+
+        """
+        await cached._collection.insert_one({"_id": "bar", "name": "Bar", "user": {"id": "bob"}})
+
+        m_find_one = mocker.spy(cached._collection, "find_one")
+
+        assert await cached.find_one("bar") == {"_id": "bar", "name": "Bar", "user": {"id": "bob"}}
+        assert await cached.find_one({"_id": "bar", "user.id": "bob"}, ["name"]) == {"_id": "bar", "name": "Bar"}
+        assert await cached.find_one({"_id": "bar", "user.id": "fred"}) is None
+
+        assert m_find_one.call_count == 1
+
+        # Queries that can't be served from the cache go to the database.
+        assert await cached.find_one({"name": "Bar"}, ["name"]) == {"_id": "bar", "name": "Bar"}
+
+        assert m_find_one.call_count == 2
+
+    async def test_find_one_mongo_semantics(self, cached):
+        """
+        Test that queries on ``None`` or booleans return the same results as Mongo when the document is cached.
+
+        """
+        await cached._collection.insert_one({"_id": "bar", "count": 1})
+
+        await cached.find_one("bar")
+
+        # A missing field matches ``None`` in Mongo.
+        assert await cached.find_one({"_id": "bar", "archived": None}) == {"_id": "bar", "count": 1}
+
+        # ``True`` does not match ``1`` in Mongo.
+        assert await cached.find_one({"_id": "bar", "count": True}) is None
+
+    async def test_copy(self, cached):
+        """
+        Test that changes to a returned document do not affect the cached document.
+
+        """
+        await cached._collection.insert_one({"_id": "bar", "name": "Bar"})
+
+        document = await cached.find_one("bar")
+        document["name"] = "Baz"
+
+        assert await cached.find_one("bar") == {"_id": "bar", "name": "Bar"}
+
+    @pytest.mark.parametrize("method", ["update_one", "find_one_and_update", "update_many", "replace_one", "delete_one"])
+    async def test_invalidate(self, method, cached):
+        """
+        Test that writes through the collection invalidate cached documents.
+
+        """
+        await cached._collection.insert_one({"_id": "bar", "name": "Bar"})
+
+        await cached.find_one("bar")
+
+        if method == "replace_one":
+            await cached.replace_one({"_id": "bar"}, {"_id": "bar", "name": "Baz"})
+        elif method == "delete_one":
+            await cached.delete_one({"_id": "bar"})
+        else:
+            await getattr(cached, method)({"_id": "bar"}, {"$set": {"name": "Baz"}})
+
+        expected = None if method == "delete_one" else {"_id": "bar", "name": "Baz"}
+
+        assert await cached.find_one("bar") == expected
+
+
+class TestMetrics:
+
+    @pytest.fixture
+    def timed(self, test_motor):
+        return virtool.db.iface.Collection(
+            "foo",
+            test_motor.foo,
+            make_mocked_coro(),
+            virtool.utils.base_processor,
+            None,
+            metrics=virtool.db.metrics.Metrics()
+        )
+
+    async def test(self, timed):
+        """
+        Test that writes, passthrough queries, and cursors are recorded under the collection name.
+
+        """
+        await timed.insert_many([{"_id": "bar", "ready": False}, {"_id": "baz", "ready": False}])
+
+        await timed.update_many({}, {"$set": {"ready": True}})
+
+        assert await timed.count() == 2
+
+        assert await timed.find().sort("_id").to_list(None) == [
+            {"_id": "bar", "ready": True},
+            {"_id": "baz", "ready": True}
+        ]
+
+        operations = timed.metrics.to_dict()["collections"]["foo"]["operations"]
+
+        assert {key: value["documents"] for key, value in operations.items()} == {
+            "count": 0,
+            "find": 2,
+            "insert_many": 2,
+            "update_many": 2
+        }
+
+
+async def test_insert_one_collision(collection, test_random_alphanumeric):
+    """
+    Test that an insert is retried with a new id when the generated id already exists.
+
+    """
+    await collection._collection.insert_one({"_id": "9pfsom1b"})
+
+    document = await collection.insert_one({"name": "Bar"})
+
+    assert document == {"_id": "u3cuwaoq", "name": "Bar"}
+
+    collection.dispatch.assert_called_with("foo", "insert", {"id": "u3cuwaoq", "name": "Bar"})
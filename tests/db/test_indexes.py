@@ -5,6 +5,28 @@ import virtool.errors
 import virtool.jobs.build_index
 
 
+async def test_get_active_index_ids(dbi, test_indexes):
+    """
+    Test that the current index, unready indexes, and indexes used by unfinished analyses for the reference are
+    active.
+
+    """
+    await dbi.indexes.insert_many(test_indexes)
+
+    await dbi.indexes.insert_many([
+        {"_id": "building", "version": 4, "ready": False, "reference": {"id": "hxn167"}},
+        {"_id": "other", "version": 0, "ready": False, "reference": {"id": "foobar"}}
+    ])
+
+    await dbi.analyses.insert_many([
+        {"_id": "a", "ready": False, "index": {"id": "cdffbdjk"}, "reference": {"id": "hxn167"}},
+        {"_id": "b", "ready": True, "index": {"id": "jgwlhulj"}, "reference": {"id": "hxn167"}},
+        {"_id": "c", "ready": False, "index": {"id": "bar"}, "reference": {"id": "foobar"}}
+    ])
+
+    assert sorted(await virtool.db.indexes.get_active_index_ids(dbi, "hxn167")) == ["building", "cdffbdjk", "ptlrcefm"]
+
+
 @pytest.mark.parametrize("exists", [True, False])
 @pytest.mark.parametrize("has_ref", [True, False])
 async def test_get_current_id_and_version(exists, has_ref, test_indexes, dbi):
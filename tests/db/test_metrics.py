@@ -0,0 +1,128 @@
+import logging
+
+import pytest
+
+import virtool.db.metrics
+
+
+class FakeCursor:
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        self._iterator = iter(self.documents)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    def sort(self, *args):
+        return self
+
+    async def count(self):
+        return len(self.documents)
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+
+@pytest.fixture
+def metrics():
+    return virtool.db.metrics.Metrics()
+
+
+def test_observe(metrics):
+    metrics.observe("otus", "find", 0.003, 5)
+    metrics.observe("otus", "find", 0.2, 10)
+    metrics.observe("otus", "update_one", 20, 1)
+
+    metrics.record_dispatch("otus")
+    metrics.record_dispatch("samples")
+
+    collections = metrics.to_dict()["collections"]
+
+    assert collections["samples"] == {"dispatches": 1, "operations": {}}
+
+    assert collections["otus"]["dispatches"] == 1
+
+    find = collections["otus"]["operations"]["find"]
+
+    assert find["count"] == 2
+    assert find["documents"] == 15
+    assert find["max_time"] == 0.2
+    assert find["mean_time"] == pytest.approx(0.1015)
+
+    assert find["histogram"]["0.005"] == 1
+    assert find["histogram"]["0.25"] == 1
+    assert sum(find["histogram"].values()) == 2
+
+    assert collections["otus"]["operations"]["update_one"]["histogram"]["inf"] == 1
+
+
+@pytest.mark.parametrize("slow_threshold", [None, 0.5])
+def test_slow(slow_threshold, caplog):
+    metrics = virtool.db.metrics.Metrics(slow_threshold=slow_threshold)
+
+    with caplog.at_level(logging.WARNING, logger="virtool.db.metrics"):
+        metrics.observe("otus", "find", 0.1, 1, query={"name": "Foo"})
+        metrics.observe("otus", "find", 1.2, 1, query={"name": "Bar"})
+
+    messages = [record.getMessage() for record in caplog.records]
+
+    if slow_threshold is None:
+        assert messages == []
+    else:
+        assert messages == ["Slow database operation: otus.find took 1.200s (query keys: ['name'])"]
+
+
+@pytest.mark.parametrize("query,expected", [
+    ({"_id": "secret", "ip": "127.0.0.1"}, ["_id", "ip"]),
+    ("secret", ["_id"]),
+    (None, [])
+])
+def test_slow_redacted(query, expected, caplog):
+    """
+    Test that query values, such as session tokens, are not written to slow operation log messages.
+
+    """
+    metrics = virtool.db.metrics.Metrics(slow_threshold=0.5)
+
+    with caplog.at_level(logging.WARNING, logger="virtool.db.metrics"):
+        metrics.observe("sessions", "find_one", 1.2, 1, query=query)
+
+    assert "secret" not in caplog.text
+
+    message = "Slow database operation: sessions.find_one took 1.200s (query keys: {})".format(expected)
+
+    assert caplog.records[0].getMessage() == message
+
+
+class TestTimedCursor:
+
+    async def test_iterate(self, metrics):
+        cursor = virtool.db.metrics.TimedCursor(FakeCursor([1, 2, 3]), lambda d, n: metrics.observe("foo", "find", d, n))
+
+        # Chained methods return the wrapper.
+        cursor = cursor.sort("name")
+
+        assert isinstance(cursor, virtool.db.metrics.TimedCursor)
+
+        assert await cursor.count() == 3
+
+        assert [d async for d in cursor] == [1, 2, 3]
+
+        find = metrics.to_dict()["collections"]["foo"]["operations"]["find"]
+
+        assert find["count"] == 1
+        assert find["documents"] == 3
+
+    async def test_to_list(self, metrics):
+        cursor = virtool.db.metrics.TimedCursor(FakeCursor([1, 2, 3]), lambda d, n: metrics.observe("foo", "find", d, n))
+
+        assert await cursor.to_list(2) == [1, 2]
+
+        assert metrics.to_dict()["collections"]["foo"]["operations"]["find"]["documents"] == 2
@@ -2,6 +2,7 @@ import os
 import sys
 
 import pytest
+from aiohttp.test_utils import make_mocked_coro
 
 import virtool.db.references
 import virtool.errors
@@ -143,6 +144,48 @@ async def test_check_right(admin, expect, member, ref, right, mocker, mock_req,
     assert result == expect
 
 
+async def test_compact_history(mocker, dbi):
+    """
+    Test that only changes in inactive builds are compacted and that versions in index manifests are kept.
+
+    """
+    m_compact = mocker.patch("virtool.db.history.compact", make_mocked_coro(1))
+
+    mocker.patch("virtool.db.indexes.get_active_index_ids", make_mocked_coro(["active"]))
+
+    await dbi.processes.insert_one({"_id": "process", "progress": 0})
+
+    await dbi.indexes.insert_many([
+        {"_id": "old", "reference": {"id": "foo"}, "manifest": {"a": 2, "b": 1}},
+        {"_id": "active", "reference": {"id": "foo"}, "manifest": {"a": 4, "b": 1}}
+    ])
+
+    await dbi.history.insert_many([
+        {"_id": "a.0", "otu": {"id": "a", "version": 0}, "index": {"id": "old"}, "reference": {"id": "foo"}},
+        {"_id": "a.1", "otu": {"id": "a", "version": 1}, "index": {"id": "old"}, "reference": {"id": "foo"}},
+        {"_id": "a.2", "otu": {"id": "a", "version": 2}, "index": {"id": "old"}, "reference": {"id": "foo"}},
+        {"_id": "a.3", "otu": {"id": "a", "version": 3}, "index": {"id": "active"}, "reference": {"id": "foo"}},
+        {"_id": "a.4", "otu": {"id": "a", "version": 4}, "index": {"id": "unbuilt"}, "reference": {"id": "foo"}},
+        {"_id": "b.0", "otu": {"id": "b", "version": 0}, "index": {"id": "old"}, "reference": {"id": "foo"}},
+        {
+            "_id": "b.removed",
+            "otu": {"id": "b", "version": "removed"},
+            "index": {"id": "old"},
+            "reference": {"id": "foo"}
+        },
+        {"_id": "c.0", "otu": {"id": "c", "version": 0}, "index": {"id": "old"}, "reference": {"id": "bar"}}
+    ])
+
+    await virtool.db.references.compact_history({"db": dbi}, "foo", "process")
+
+    assert m_compact.call_args_list == [
+        mocker.call(dbi, "a", [0, 1, 2], {2, 4}),
+        mocker.call(dbi, "b", [0], {1})
+    ]
+
+    assert (await dbi.processes.find_one("process"))["progress"] == 1
+
+
 async def test_create_manifest(dbi, test_otu):
     await dbi.otus.insert_many([
         test_otu,
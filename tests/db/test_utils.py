@@ -52,3 +52,16 @@ class TestApplyProjection:
             virtool.db.utils.apply_projection({}, "_id")
 
         assert "Invalid type for projection: <class 'str'>" in str(err)
+
+
+@pytest.mark.parametrize("excluded", [None, ["9pfsom1b"]])
+async def test_get_new_id(excluded, test_motor, test_random_alphanumeric):
+    """
+    Test that ids that already exist in the collection or are excluded are skipped.
+
+    """
+    await test_motor.foo.insert_one({"_id": "u3cuwaoq"})
+
+    expected = "xjqvxigh" if excluded else "9pfsom1b"
+
+    assert await virtool.db.utils.get_new_id(test_motor.foo, excluded=excluded) == expected
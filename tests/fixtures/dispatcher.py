@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from aiohttp import web
 
@@ -26,6 +28,9 @@ def create_test_connection(mocker):
         async def send(self, message):
             self.send_stub(message)
 
+        async def send_encoded(self, encoded):
+            self.send_stub(json.loads(encoded))
+
         async def close(self):
             self.close_stub()
 
@@ -48,11 +53,20 @@ def test_ws_connection(mocker):
 
     ws.send_json = send_json
 
+    send_str_stub = mocker.stub(name="send_str")
+
+    async def send_str(data):
+        return send_str_stub(data)
+
+    send_str.stub = send_str_stub
+
+    ws.send_str = send_str
+
     # Setup async stub for checking if close method was called.
     close_stub = mocker.stub(name="close")
 
-    async def close():
-        return close_stub()
+    async def close(**kwargs):
+        return close_stub(**kwargs)
 
     close.stub = close_stub
 
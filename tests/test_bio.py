@@ -1,8 +1,14 @@
+import gzip
+import io
 import json
 import os
 import pickle
 import pytest
 import sys
+import types
+import zipfile
+
+import aiohttp
 from aiohttp import web
 
 import virtool.bio
@@ -18,7 +24,39 @@ def orf_containing():
 
 
 @pytest.fixture
-def mock_blast_server(monkeypatch, loop, test_server):
+def http_session(loop):
+    session = aiohttp.ClientSession(loop=loop)
+    yield session
+    loop.run_until_complete(session.close())
+
+
+@pytest.fixture
+def multi_blast_zip():
+    """
+    A mock multi-query BLAST result containing two copies of the single-query report in ``blast.zip``.
+
+    """
+    with zipfile.ZipFile(os.path.join(TEST_BIO_PATH, "blast.zip")) as single:
+        report = single.read("YA6M9135015_1.json")
+
+    buffer = io.BytesIO()
+
+    with zipfile.ZipFile(buffer, "w") as zipped:
+        zipped.writestr("MULTI1337.json", json.dumps({
+            "BlastJSON": [
+                {"File": "MULTI1337_1.json"},
+                {"File": "MULTI1337_2.json"}
+            ]
+        }))
+
+        zipped.writestr("MULTI1337_1.json", report)
+        zipped.writestr("MULTI1337_2.json", report)
+
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def mock_blast_server(monkeypatch, loop, test_server, multi_blast_zip):
     async def get_handler(req):
 
         params = dict(req.query)
@@ -40,11 +78,16 @@ def mock_blast_server(monkeypatch, loop, test_server):
         if format_object == "Alignment":
             assert params == {
                 "CMD": "Get",
-                "RID": "YA6M9135015",
+                "RID": params["RID"],
                 "FORMAT_TYPE": "JSON2",
                 "FORMAT_OBJECT": "Alignment"
             }
 
+            if params["RID"] == "MULTI1337":
+                return web.Response(body=multi_blast_zip, status=200)
+
+            assert params["RID"] == "YA6M9135015"
+
             with open(os.path.join(TEST_BIO_PATH, "blast.zip"), "rb") as f:
                 return web.Response(body=f.read(), status=200)
 
@@ -63,9 +106,10 @@ def mock_blast_server(monkeypatch, loop, test_server):
 
         data = await req.post()
 
-        assert dict(data) == {
-            "QUERY": "ATGTACAGGATCAGCATCGAGCTACGAT",
-        }
+        assert dict(data) in [
+            {"QUERY": "ATGTACAGGATCAGCATCGAGCTACGAT"},
+            {"QUERY": ">3\nATGTACAGGATCAGCATCGAGCTACGAT\n>12\nGGACTTAGACTTACAGCATCAG"}
+        ]
 
         with open(os.path.join(TEST_BIO_PATH, "initialize_blast.html"), "r") as f:
             return web.Response(text=f.read(), status=200)
@@ -111,6 +155,62 @@ def test_read_fasta(illegal, tmpdir):
         ]
 
 
+@pytest.mark.parametrize("gzipped", [False, True], ids=["plain", "gzipped"])
+def test_iter_fasta(gzipped, tmpdir):
+    content = (
+        ">test_1\n"
+        "ATAGAGTACATATCTACTTCTATCATTTATATATTATAAAAACCTC\n"
+        "ATAGAGTACATATC\n"
+        ">test_2\n"
+        "CCTCTGACTGACTATGGGCTCTCGACTATTTACGATCAGCATCGTT\n"
+    )
+
+    if gzipped:
+        path = str(tmpdir.join("test.fa.gz"))
+
+        with gzip.open(path, "wt") as f:
+            f.write(content)
+    else:
+        tmpfile = tmpdir.join("test.fa")
+        tmpfile.write(content)
+        path = str(tmpfile)
+
+    records = virtool.bio.iter_fasta(path)
+
+    assert isinstance(records, types.GeneratorType)
+
+    assert next(records) == ("test_1", "ATAGAGTACATATCTACTTCTATCATTTATATATTATAAAAACCTCATAGAGTACATATC")
+    assert next(records) == ("test_2", "CCTCTGACTGACTATGGGCTCTCGACTATTTACGATCAGCATCGTT")
+
+    with pytest.raises(StopIteration):
+        next(records)
+
+
+def test_read_fastq_gzipped(tmpdir):
+    content = (
+        "@read_1\n"
+        "ATAGAGTACA\n"
+        "+\n"
+        "#1=DDDFFHH\n"
+        "@read_2\n"
+        "CCTCTGACTG\n"
+        "+\n"
+        "#4=DFFFFHH\n"
+    )
+
+    path = str(tmpdir.join("test.fq.gz"))
+
+    with gzip.open(path, "wt") as f:
+        f.write(content)
+
+    assert virtool.bio.read_fastq(path) == [
+        ("@read_1", "ATAGAGTACA", "#1=DDDFFHH"),
+        ("@read_2", "CCTCTGACTG", "#4=DFFFFHH")
+    ]
+
+    assert virtool.bio.read_fastq_headers(path) == ["@read_1", "@read_2"]
+
+
 @pytest.mark.parametrize("headers_only", [True, False], ids=["read_fastq_headers", "read_fastq"])
 def test_fastq(headers_only, tmpdir):
     tmpfile = tmpdir.join("test.fa")
@@ -159,6 +259,15 @@ def test_reverse_complement():
     assert virtool.bio.reverse_complement(sequence) == expected
 
 
+def test_reverse_complement_lowercase():
+    assert virtool.bio.reverse_complement("atagggattn") == "NAATCCCTAT"
+
+
+def test_reverse_complement_illegal():
+    with pytest.raises(KeyError):
+        virtool.bio.reverse_complement("ATAGRGATT")
+
+
 @pytest.mark.parametrize("sequence,expected", [
     ("ATAGGGATTAGAGACACAGATAAGGAGAGATATAGAACATGTGACGTACGTACGATCTGAGCTA", "IGIRDTDKERYRTCDVRTI*A"),
     ("ATACCNATTAGAGACACAGATAAGGAGAGATATAGAACATGTGACGTACGTACGATCTGAGCTA", "IPIRDTDKERYRTCDVRTI*A"),
@@ -172,6 +281,34 @@ def test_translate(sequence, expected):
     assert virtool.bio.translate(sequence) == expected
 
 
+@pytest.mark.parametrize("sequence,expected", [
+    ("", ""),
+    ("AT", ""),
+    ("atgtgg", "MW"),
+    ("ATGTGGA", "MW"),
+    ("ATGRYA", "MX")
+], ids=["empty", "short", "lowercase", "trailing", "unresolvable"])
+def test_translate_edge_cases(sequence, expected):
+    assert virtool.bio.translate(sequence) == expected
+
+
+def test_translate_matches_table(orf_containing):
+    """
+    Test that translation of a real sequence in all frames matches a naive codon-by-codon lookup in
+    ``TRANSLATION_TABLE``.
+
+    """
+    for nuc in [orf_containing, virtool.bio.reverse_complement(orf_containing)]:
+        for frame in range(3):
+            shifted = nuc[frame:]
+
+            expected = "".join(
+                virtool.bio.TRANSLATION_TABLE.get(shifted[i:i + 3], "X") for i in range(0, len(shifted) - 2, 3)
+            )
+
+            assert virtool.bio.translate(shifted) == expected
+
+
 def test_find_orfs(orf_containing):
     result = virtool.bio.find_orfs(orf_containing)
 
@@ -179,14 +316,28 @@ def test_find_orfs(orf_containing):
         assert pickle.load(f) == result
 
 
-async def test_initialize_ncbi_blast(mock_blast_server):
+@pytest.mark.parametrize("chunk_size", [50, 1], ids=["serial", "process_pool"])
+def test_find_orfs_many(chunk_size, orf_containing):
+    sequences = [orf_containing, orf_containing[:200], virtool.bio.reverse_complement(orf_containing)]
+
+    result = virtool.bio.find_orfs_many(sequences, processes=2, chunk_size=chunk_size)
+
+    assert result == [virtool.bio.find_orfs(sequence) for sequence in sequences]
+
+    with open(os.path.join(TEST_BIO_PATH, "orfs"), "rb") as f:
+        assert result[0] == pickle.load(f)
+
+    assert result[1] == []
+
+
+async def test_initialize_ncbi_blast(mock_blast_server, http_session):
     """
     Using a mock BLAST server, test that a BLAST initialization request works properly.
 
     """
     seq = "ATGTACAGGATCAGCATCGAGCTACGAT"
 
-    assert await virtool.bio.initialize_ncbi_blast({"proxy_enable": False}, seq) == ("YA40WNN5014", 19)
+    assert await virtool.bio.initialize_ncbi_blast({"proxy_enable": False}, http_session, seq) == ("YA40WNN5014", 19)
 
 
 def test_extract_blast_info():
@@ -202,14 +353,44 @@ def test_extract_blast_info():
     ("YA27F0T6015", True),
     ("5106T0F27AY", False)
 ])
-async def test_check_rid(rid, expected, mock_blast_server):
+async def test_check_rid(rid, expected, mock_blast_server, http_session):
     """
     Test that check_rid() returns the correct result given HTML for a ready BLAST request and a waiting BLAST request.
 
     """
-    assert await virtool.bio.check_rid({"proxy_enable": False}, rid) == expected
+    assert await virtool.bio.check_rid({"proxy_enable": False}, http_session, rid) == expected
 
 
-async def test_get_ncbi_blast_result(mock_blast_server):
+async def test_get_ncbi_blast_result(mock_blast_server, http_session):
     with open(os.path.join(TEST_BIO_PATH, "blast.json"), "r") as f:
-        assert await virtool.bio.get_ncbi_blast_result({"proxy_enable": False}, "YA6M9135015") == json.load(f)
+        assert await virtool.bio.get_ncbi_blast_result({"proxy_enable": False}, http_session, "YA6M9135015") == json.load(f)
+
+
+def test_compose_blast_query():
+    assert virtool.bio.compose_blast_query({12: "GGAC", 3: "ATGT"}) == ">3\nATGT\n>12\nGGAC"
+
+
+async def test_initialize_ncbi_blast_many(mock_blast_server, http_session):
+    """
+    Test that several sequences are submitted to the mock BLAST server as a single multi-FASTA query.
+
+    """
+    sequences = {
+        12: "GGACTTAGACTTACAGCATCAG",
+        3: "ATGTACAGGATCAGCATCGAGCTACGAT"
+    }
+
+    assert await virtool.bio.initialize_ncbi_blast_many({"proxy_enable": False}, http_session, sequences) == (
+        "YA40WNN5014",
+        19
+    )
+
+
+async def test_get_ncbi_blast_result_many(mock_blast_server, http_session):
+    with open(os.path.join(TEST_BIO_PATH, "blast.json"), "r") as f:
+        expected = json.load(f)
+
+    assert await virtool.bio.get_ncbi_blast_result_many({"proxy_enable": False}, http_session, "MULTI1337") == [
+        expected,
+        expected
+    ]
@@ -0,0 +1,312 @@
+import asyncio
+import io
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+from aiohttp.test_utils import make_mocked_coro
+
+import virtool.bio
+import virtool.blast
+import virtool.cache
+
+TEST_BIO_PATH = os.path.join(sys.path[0], "tests", "test_files", "bio")
+
+
+@pytest.fixture
+def poller(loop, tmpdir, dbi):
+    cache = virtool.cache.DiskCache(str(tmpdir), max_size=100000, ttl=60)
+    return virtool.blast.Poller(loop, dbi, {"proxy_enable": False}, "session", cache=cache)
+
+
+@pytest.fixture
+def nuvs_analysis():
+    return {
+        "_id": "foobar",
+        "algorithm": "nuvs",
+        "ready": True,
+        "results": [
+            {"index": 3, "sequence": "ATAGAGATTAGAT"},
+            {
+                "index": 5,
+                "sequence": "GGAGTTAGATTGG",
+                "blast": {
+                    "interval": 3,
+                    "last_checked_at": None,
+                    "ready": False,
+                    "rid": "FOOBAR1337"
+                }
+            }
+        ]
+    }
+
+
+@pytest.mark.parametrize("ready", [True, False])
+async def test_poll(ready, mocker, dbi, poller, nuvs_analysis, static_time):
+    """
+    Test that a waiting RID is rescheduled without touching the database and that a ready RID has its result attached
+    to the analysis.
+
+    """
+    await dbi.analyses.insert_one(nuvs_analysis)
+
+    m_check_rid = mocker.patch("virtool.bio.check_rid", make_mocked_coro(ready))
+
+    m_get_ncbi_blast_result = mocker.patch("virtool.bio.get_ncbi_blast_result", make_mocked_coro({"foo": "bar"}))
+
+    poller.add("foobar", 5, "FOOBAR1337", interval=0)
+
+    await poller.poll()
+
+    m_check_rid.assert_called_with({"proxy_enable": False}, "session", "FOOBAR1337")
+
+    document = await dbi.analyses.find_one("foobar")
+
+    if not ready:
+        assert not m_get_ncbi_blast_result.called
+        assert document == nuvs_analysis
+        assert poller.pending_count == 1
+        assert poller._heap[0][-1] == 5
+        return
+
+    m_get_ncbi_blast_result.assert_called_with({"proxy_enable": False}, "session", "FOOBAR1337")
+
+    assert document["results"][1]["blast"] == {
+        "interval": 0,
+        "last_checked_at": static_time.datetime,
+        "ready": True,
+        "result": {"foo": "bar"},
+        "rid": "FOOBAR1337"
+    }
+
+    assert poller.pending_count == 0
+    assert poller._heap == []
+
+    assert await poller.cache.get("GGAGTTAGATTGG") == {
+        "rid": "FOOBAR1337",
+        "result": {"foo": "bar"}
+    }
+
+
+async def test_poll_many(mocker, dbi, poller, nuvs_analysis, static_time):
+    """
+    Test that the results of a multi-query RID are attached to each submitted sequence in a single update.
+
+    """
+    await dbi.analyses.insert_one(nuvs_analysis)
+
+    mocker.patch("virtool.bio.check_rid", make_mocked_coro(True))
+
+    m_get_ncbi_blast_result_many = mocker.patch(
+        "virtool.bio.get_ncbi_blast_result_many",
+        make_mocked_coro([{"foo": "bar"}, {"foo": "baz"}])
+    )
+
+    poller.add_many("foobar", [5, 3], "FOOBAR1337", interval=0)
+
+    await poller.poll()
+
+    m_get_ncbi_blast_result_many.assert_called_with({"proxy_enable": False}, "session", "FOOBAR1337")
+
+    document = await dbi.analyses.find_one("foobar")
+
+    assert [result["blast"]["result"] for result in document["results"]] == [{"foo": "bar"}, {"foo": "baz"}]
+
+    assert poller.pending_count == 0
+
+
+async def test_poll_many_missing(mocker, dbi, poller, nuvs_analysis, static_time):
+    """
+    Test that sequences in a multi-query RID without a report in the result archive are marked as failed and
+    forgotten.
+
+    """
+    await dbi.analyses.insert_one(nuvs_analysis)
+
+    with zipfile.ZipFile(os.path.join(TEST_BIO_PATH, "blast.zip")) as single:
+        report = single.read("YA6M9135015_1.json")
+
+    buffer = io.BytesIO()
+
+    # The archive only contains a report for the first of the two queries.
+    with zipfile.ZipFile(buffer, "w") as zipped:
+        zipped.writestr("FOOBAR1337.json", json.dumps({"BlastJSON": [{"File": "FOOBAR1337_1.json"}]}))
+        zipped.writestr("FOOBAR1337_1.json", report)
+
+    async def get_ncbi_blast_result_many(settings, session, rid):
+        return virtool.bio.parse_blast_content_many(buffer.getvalue(), rid)
+
+    mocker.patch("virtool.bio.check_rid", make_mocked_coro(True))
+    mocker.patch("virtool.bio.get_ncbi_blast_result_many", get_ncbi_blast_result_many)
+
+    poller.add_many("foobar", [5, 3], "FOOBAR1337", interval=0)
+
+    await poller.poll()
+
+    document = await dbi.analyses.find_one("foobar")
+
+    first, second = [result["blast"] for result in document["results"]]
+
+    assert first["result"] is not None
+    assert "error" not in first
+
+    assert second == {
+        "error": "Could not retrieve BLAST result",
+        "interval": 0,
+        "last_checked_at": static_time.datetime,
+        "ready": True,
+        "result": None,
+        "rid": "FOOBAR1337"
+    }
+
+    assert poller.pending_count == 0
+    assert poller._heap == []
+
+
+async def test_poll_parse_error(mocker, dbi, poller, nuvs_analysis, static_time):
+    """
+    Test that a RID whose result can't be parsed is marked as failed instead of stopping the poller.
+
+    """
+    await dbi.analyses.insert_one(nuvs_analysis)
+
+    mocker.patch("virtool.bio.check_rid", make_mocked_coro(True))
+
+    mocker.patch("virtool.bio.get_ncbi_blast_result", make_mocked_coro(raise_exception=zipfile.BadZipFile))
+
+    poller.add("foobar", 5, "FOOBAR1337", interval=0)
+
+    await poller.poll()
+
+    document = await dbi.analyses.find_one("foobar")
+
+    assert document["results"][1]["blast"] == {
+        "error": "Could not retrieve BLAST result",
+        "interval": 0,
+        "last_checked_at": static_time.datetime,
+        "ready": True,
+        "result": None,
+        "rid": "FOOBAR1337"
+    }
+
+    assert poller.pending_count == 0
+    assert poller._heap == []
+
+    assert await poller.cache.get("GGAGTTAGATTGG") is None
+
+
+async def test_poll_error(mocker, dbi, poller):
+    """
+    Test that a RID is rescheduled with a longer interval when an unexpected error occurs while checking it.
+
+    """
+    mocker.patch("virtool.bio.check_rid", make_mocked_coro(True))
+    mocker.patch("virtool.bio.get_ncbi_blast_result", make_mocked_coro({"foo": "bar"}))
+    mocker.patch.object(dbi.analyses, "find_one", make_mocked_coro(raise_exception=RuntimeError))
+
+    poller.add("foobar", 5, "FOOBAR1337", interval=0)
+
+    await poller.poll()
+
+    assert poller.pending_count == 1
+    assert poller._heap[0][-1] == virtool.blast.INTERVAL_INCREMENT
+
+
+async def test_poll_max_checks(mocker, poller):
+    """
+    Test that no more than ``max_checks`` RIDs are checked in a single poll.
+
+    """
+    m_check_rid = mocker.patch("virtool.bio.check_rid", make_mocked_coro(False))
+
+    for index in range(7):
+        poller.add("foobar", index, "RID{}".format(index), interval=0)
+
+    await poller.poll()
+
+    assert m_check_rid.call_count == 5
+
+
+async def test_poll_stale(mocker, poller):
+    """
+    Test that only the most recent RID for a sequence is checked.
+
+    """
+    m_check_rid = mocker.patch("virtool.bio.check_rid", make_mocked_coro(False))
+
+    poller.add("foobar", 5, "OLD", interval=0)
+    poller.add("foobar", 5, "NEW", interval=0)
+
+    await poller.poll()
+
+    m_check_rid.assert_called_once_with({"proxy_enable": False}, "session", "NEW")
+
+
+async def test_load(dbi, poller, nuvs_analysis):
+    """
+    Test that waiting RIDs stored in analysis documents are scheduled again.
+
+    """
+    await dbi.analyses.insert_many([
+        nuvs_analysis,
+        {
+            "_id": "multi",
+            "algorithm": "nuvs",
+            "results": [
+                {"index": 1, "blast": {"interval": 3, "ready": False, "rid": "MULTI", "queries": [1, 4]}},
+                {"index": 4, "blast": {"interval": 3, "ready": False, "rid": "NEWER"}}
+            ]
+        },
+        {
+            "_id": "baz",
+            "algorithm": "nuvs",
+            "results": [
+                {"index": 2, "blast": {"interval": 8, "ready": True, "rid": "DONE"}}
+            ]
+        }
+    ])
+
+    await poller.load()
+
+    assert poller._rids == {
+        ("foobar", 5): "FOOBAR1337",
+        ("multi", 1): "MULTI",
+        ("multi", 4): "NEWER"
+    }
+
+    assert sorted(entry[2:] for entry in poller._heap) == [
+        ("foobar", (5,), "FOOBAR1337", 3),
+        ("multi", (1, 4), "MULTI", 3),
+        ("multi", (4,), "NEWER", 3)
+    ]
+
+
+async def test_run_load_error(loop, mocker):
+    """
+    Test that the poller retries loading pending RIDs if loading fails and then starts polling.
+
+    """
+    poller = virtool.blast.Poller(loop, mocker.Mock(), {"proxy_enable": False}, "session")
+    poller.tick = 0
+
+    errors = [RuntimeError("Database unavailable")]
+
+    async def load():
+        if errors:
+            raise errors.pop()
+
+    m_load = mocker.patch.object(poller, "load", side_effect=load)
+    m_poll = mocker.patch.object(poller, "poll", make_mocked_coro())
+
+    task = loop.create_task(poller.run())
+
+    await asyncio.sleep(0.05)
+
+    task.cancel()
+
+    await task
+
+    assert m_load.call_count == 2
+    assert m_poll.called
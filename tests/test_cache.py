@@ -0,0 +1,189 @@
+import asyncio
+import os
+
+import pytest
+
+import virtool.cache
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return virtool.cache.DiskCache(str(tmpdir.join("cache")), max_size=1000, ttl=60)
+
+
+async def test_get_set(cache):
+    assert await cache.get("ATAGAGATTAG") is None
+
+    await cache.set("ATAGAGATTAG", {"rid": "FOOBAR1337", "result": {"hits": []}})
+
+    assert await cache.get("ATAGAGATTAG") == {"rid": "FOOBAR1337", "result": {"hits": []}}
+
+    assert os.listdir(cache.path) == [virtool.cache.hash_key("ATAGAGATTAG") + ".json"]
+
+
+async def test_ttl(mocker, cache):
+    m_time = mocker.patch("time.time", return_value=1000)
+
+    await cache.set("foo", {"bar": "baz"})
+
+    m_time.return_value = 1061
+
+    assert await cache.get("foo") is None
+
+    assert os.listdir(cache.path) == []
+
+
+async def test_evict(cache):
+    """
+    Test that the least recently used entries are evicted when the cache grows larger than ``max_size``.
+
+    """
+    value = {"data": "a" * 300}
+
+    await cache.set("foo", value)
+    await cache.set("bar", value)
+
+    # Make "foo" the most recently used entry.
+    assert await cache.get("foo") == value
+
+    await cache.set("baz", value)
+
+    assert await cache.get("foo") == value
+    assert await cache.get("bar") is None
+    assert await cache.get("baz") == value
+
+
+async def test_concurrent_set(cache):
+    """
+    Test that concurrent writes of the same key don't interfere with each other or leave temporary files behind.
+
+    """
+    values = [{"value": i} for i in range(10)]
+
+    await asyncio.gather(*[cache.set("foo", value) for value in values])
+
+    assert await cache.get("foo") in values
+
+    assert os.listdir(cache.path) == [virtool.cache.hash_key("foo") + ".json"]
+
+
+async def test_reload(tmpdir, cache):
+    """
+    Test that existing entries are found by a new cache instance using the same path.
+
+    """
+    await cache.set("foo", {"bar": "baz"})
+
+    reloaded = virtool.cache.DiskCache(cache.path, max_size=1000, ttl=60)
+
+    assert await reloaded.get("foo") == {"bar": "baz"}
+
+
+async def test_disabled():
+    cache = virtool.cache.DiskCache(None, max_size=1000, ttl=60)
+
+    await cache.set("foo", {"bar": "baz"})
+
+    assert await cache.get("foo") is None
+
+
+class TestMemoryCache:
+
+    def test_lru(self):
+        cache = virtool.cache.MemoryCache(max_size=2, ttl=60)
+
+        cache.set("foo", 1)
+        cache.set("bar", 2)
+
+        # Make "foo" the most recently used entry.
+        assert cache.get("foo") == 1
+
+        cache.set("baz", 3)
+
+        assert len(cache) == 2
+        assert cache.get("bar") is None
+        assert cache.get("foo") == 1
+        assert cache.get("baz") == 3
+
+    def test_ttl(self, mocker):
+        m_monotonic = mocker.patch("time.monotonic", return_value=100)
+
+        cache = virtool.cache.MemoryCache(max_size=2, ttl=60)
+
+        cache.set("foo", 1)
+
+        m_monotonic.return_value = 161
+
+        assert cache.get("foo") is None
+        assert len(cache) == 0
+
+    def test_delete_and_clear(self):
+        cache = virtool.cache.MemoryCache(max_size=5, ttl=60)
+
+        cache.set("foo", 1)
+        cache.set("bar", 2)
+
+        cache.delete("foo")
+        cache.delete("missing")
+
+        assert cache.get("foo") is None
+        assert cache.get("bar") == 2
+
+        cache.clear()
+
+        assert len(cache) == 0
+
+
+async def test_delete(cache):
+    await cache.set("foo", {"bar": "baz"})
+
+    await cache.delete("foo")
+
+    assert await cache.get("foo") is None
+    assert os.listdir(cache.path) == []
+
+
+class TestOTUCache:
+
+    @pytest.fixture
+    def otu_cache(self, tmpdir):
+        return virtool.cache.OTUCache(str(tmpdir.join("otus")), namespace="test:")
+
+    async def test_get_set(self, otu_cache, static_time):
+        otu = {"_id": "foo", "version": 3, "created_at": static_time.datetime, "isolates": []}
+
+        await otu_cache.set("foo", 3, otu)
+
+        cached = await otu_cache.get("foo", 3)
+
+        assert cached == otu
+
+        # Modifying a returned otu does not affect the cache.
+        cached["isolates"].append({"id": "bar"})
+
+        assert await otu_cache.get("foo", 3) == otu
+
+        assert await otu_cache.get("foo", 2) is None
+
+    async def test_disk(self, otu_cache, static_time):
+        """
+        Test that otus are read from disk, with datetimes restored, when they are not held in memory.
+
+        """
+        otu = {"_id": "foo", "version": 3, "created_at": static_time.datetime}
+
+        await otu_cache.set("foo", 3, otu)
+
+        otu_cache.memory.clear()
+
+        cached = await otu_cache.get("foo", 3)
+
+        assert cached == otu
+
+    async def test_delete(self, otu_cache):
+        await otu_cache.set("foo", 3, {"_id": "foo", "version": 3})
+
+        await otu_cache.delete("foo", 3)
+
+        assert await otu_cache.get("foo", 3) is None
+        assert os.listdir(otu_cache.disk.path) == []
@@ -0,0 +1,129 @@
+import copy
+
+import pytest
+
+import virtool.diff
+
+
+@pytest.fixture
+def otu():
+    return {
+        "_id": "foo",
+        "name": "Foo virus",
+        "abbreviation": "FV",
+        "version": 1,
+        "isolates": [
+            {
+                "id": "bar",
+                "default": True,
+                "sequences": [
+                    {"_id": "KX269872.1", "isolate_id": "bar", "sequence": "ATAG"},
+                    {"_id": "KX269873.1", "isolate_id": "bar", "sequence": "GGCA"}
+                ]
+            },
+            {
+                "id": "baz",
+                "default": False,
+                "sequences": []
+            }
+        ]
+    }
+
+
+def edit_sequence(otu):
+    otu["isolates"][0]["sequences"][1]["sequence"] = "GGCT"
+
+
+def add_sequence(otu):
+    otu["isolates"][1]["sequences"].append({"_id": "KX269874.1", "isolate_id": "baz", "sequence": "TTAG"})
+
+
+def remove_isolate(otu):
+    otu["isolates"].pop(0)
+    otu["isolates"][0]["default"] = True
+
+
+def reorder_isolates(otu):
+    otu["isolates"].reverse()
+
+
+def remove_field(otu):
+    otu.pop("abbreviation")
+
+
+@pytest.mark.parametrize("edit,expected", [
+    (edit_sequence, {
+        "isolates": {
+            "items": [{
+                "id": "bar",
+                "sequences": {
+                    "items": [{"id": "KX269873.1", "fields": {"sequence": {"old": "GGCA", "new": "GGCT"}}}]
+                }
+            }]
+        }
+    }),
+    (add_sequence, {
+        "isolates": {
+            "items": [{
+                "id": "baz",
+                "sequences": {
+                    "items": [{
+                        "id": "KX269874.1",
+                        "new": {"_id": "KX269874.1", "isolate_id": "baz", "sequence": "TTAG"}
+                    }],
+                    "order": {"old": [], "new": ["KX269874.1"]}
+                }
+            }]
+        }
+    }),
+    (remove_isolate, None),
+    (reorder_isolates, {
+        "isolates": {
+            "order": {"old": ["bar", "baz"], "new": ["baz", "bar"]}
+        }
+    }),
+    (remove_field, {
+        "fields": {"abbreviation": {"old": "FV"}, "version": {"old": 1, "new": 2}}
+    })
+], ids=["edit_sequence", "add_sequence", "remove_isolate", "reorder_isolates", "remove_field"])
+def test_diff_otus(edit, expected, otu):
+    """
+    Test that only the changed isolates and sequences are recorded and that the diff can be applied and reverted.
+
+    """
+    new = copy.deepcopy(otu)
+    edit(new)
+    new["version"] = 2
+
+    diff = virtool.diff.diff_otus(otu, new)
+
+    assert virtool.diff.is_otu_diff(diff)
+
+    if expected:
+        assert diff == dict({"format": "otu", "fields": {"version": {"old": 1, "new": 2}}}, **expected)
+
+    assert virtool.diff.apply_otu_diff(otu, diff) == new
+    assert virtool.diff.apply_otu_diff(new, diff, reverse=True) == otu
+
+
+def test_duplicate_ids(otu):
+    """
+    Test that isolates are diffed as a whole field when they can't be matched by id.
+
+    """
+    otu["isolates"][1]["id"] = "bar"
+
+    new = copy.deepcopy(otu)
+    new["isolates"][1]["default"] = True
+
+    diff = virtool.diff.diff_otus(otu, new)
+
+    assert diff["fields"] == {"isolates": {"old": otu["isolates"], "new": new["isolates"]}}
+    assert "isolates" not in diff
+
+    assert virtool.diff.apply_otu_diff(otu, diff) == new
+
+
+def test_is_otu_diff():
+    assert not virtool.diff.is_otu_diff([["change", "name", ["Foo", "Bar"]]])
+    assert not virtool.diff.is_otu_diff({"_id": "foo", "name": "Foo"})
@@ -1,6 +1,11 @@
+import asyncio
+import json
+
 import pytest
+from aiohttp.test_utils import make_mocked_coro
 
 import virtool.api.utils
+import virtool.dispatcher
 from virtool.dispatcher import Dispatcher
 
 
@@ -16,6 +21,10 @@ class TestConnection:
         assert test_ws_connection.permissions == ["create_sample"]
 
     async def test_send(self, test_ws_connection):
+        """
+        Test that messages are queued without being written and then written in order by the connection's task.
+
+        """
         await test_ws_connection.send({
             "interface": "users",
             "operation": "update",
@@ -25,18 +34,52 @@ class TestConnection:
             }
         })
 
-        assert test_ws_connection._ws.send_json.stub.call_args[0] == ({
-            'data': {
-                'groups': [],
-                'user_id': 'john'
-            },
-            'interface': 'users',
-            'operation': 'update'
-        }, virtool.api.utils.dumps)
+        await test_ws_connection.send_encoded('{"interface":"users"}')
+
+        assert not test_ws_connection._ws.send_str.stub.called
+
+        test_ws_connection.start()
+
+        await asyncio.sleep(0)
+
+        assert [call[0][0] for call in test_ws_connection._ws.send_str.stub.call_args_list] == [
+            virtool.api.utils.dumps({
+                "interface": "users",
+                "operation": "update",
+                "data": {
+                    "user_id": "john",
+                    "groups": []
+                }
+            }),
+            '{"interface":"users"}'
+        ]
+
+        test_ws_connection.stop()
+
+    async def test_evict(self, test_ws_connection):
+        """
+        Test that evicting a connection discards its queued messages, sends a resync message, and closes the socket with
+        the resync close code.
+
+        """
+        for i in range(3):
+            await test_ws_connection.send_encoded(str(i))
+
+        test_ws_connection.evict()
+        test_ws_connection.start()
+
+        await asyncio.sleep(0)
+
+        test_ws_connection._ws.send_str.stub.assert_called_once_with(virtool.dispatcher.RESYNC_MESSAGE)
+        test_ws_connection._ws.close.stub.assert_called_once_with(code=4000, message=b"resync")
 
     async def test_close(self, test_ws_connection):
+        test_ws_connection.start()
+
         await test_ws_connection.close()
 
+        assert test_ws_connection._task is None
+
         assert test_ws_connection._ws.close.stub.called
 
 
@@ -89,6 +132,33 @@ async def test_dispatch_authorized(loop, create_test_connection):
     })
 
 
+async def test_dispatch_encoded_once(loop, mocker, create_test_connection):
+    """
+    Test that a message sent with the default writer is encoded once and the same compact JSON string is sent to every
+    connection.
+
+    """
+    dispatcher = Dispatcher(loop)
+
+    connections = [create_test_connection() for _ in range(3)]
+
+    for connection in connections:
+        connection.user_id = "test"
+        connection.send_encoded = mocker.stub()
+        connection.send_encoded.side_effect = make_mocked_coro()
+
+        dispatcher.add_connection(connection)
+
+    m_compact_dumps = mocker.spy(virtool.api.utils, "compact_dumps")
+
+    await dispatcher.dispatch("test", "test", {"test": True})
+
+    assert m_compact_dumps.call_count == 1
+
+    for connection in connections:
+        connection.send_encoded.assert_called_with('{"operation":"test","interface":"test","data":{"test":true}}')
+
+
 async def test_dispatch_unauthorized(loop, create_test_connection):
     """
     Test an unauthorized connections does not have its ``send`` method called during a dispatch.
@@ -329,3 +399,474 @@ async def test_writer_not_callable(loop):
         await Dispatcher(loop).dispatch("test", "test", {"test": True}, writer="writer")
 
     assert "writer must be callable" in str(err)
+
+
+async def test_subscribe(loop, create_test_connection):
+    """
+    Test that a subscribed connection only receives messages for its interfaces and that connections that have never
+    subscribed receive all messages.
+
+    """
+    dispatcher = Dispatcher(loop)
+
+    m_subscribed = create_test_connection()
+    m_subscribed.user_id = "bob"
+
+    m_all = create_test_connection()
+    m_all.user_id = "fred"
+
+    dispatcher.add_connection(m_subscribed)
+    dispatcher.add_connection(m_all)
+
+    dispatcher.subscribe(m_subscribed, ["jobs"])
+
+    await dispatcher.dispatch("samples", "update", {"id": "foo"})
+
+    m_subscribed.send_stub.assert_not_called()
+    assert m_all.send_stub.call_count == 1
+
+    await dispatcher.dispatch("jobs", "update", {"id": "bar"})
+
+    m_subscribed.send_stub.assert_called_with({
+        "interface": "jobs",
+        "operation": "update",
+        "data": {
+            "id": "bar"
+        }
+    })
+
+    assert m_all.send_stub.call_count == 2
+
+
+async def test_unsubscribe(loop, create_test_connection):
+    dispatcher = Dispatcher(loop)
+
+    m = create_test_connection()
+    m.user_id = "bob"
+
+    dispatcher.add_connection(m)
+
+    dispatcher.subscribe(m, ["jobs", "samples"])
+    dispatcher.unsubscribe(m, ["jobs"])
+
+    assert dispatcher.get_subscribers("jobs") == []
+    assert dispatcher.get_subscribers("samples") == [m]
+
+    await dispatcher.dispatch("jobs", "update", {"id": "bar"})
+
+    m.send_stub.assert_not_called()
+
+
+def test_remove_subscribed_connection(loop, mocker):
+    """
+    Test that removing a connection also removes it from the subscriber index.
+
+    """
+    dispatcher = Dispatcher(loop)
+
+    m = mocker.Mock()
+
+    dispatcher.add_connection(m)
+    dispatcher.subscribe(m, ["jobs"])
+
+    dispatcher.remove_connection(m)
+
+    assert dispatcher.connections == []
+    assert dispatcher.subscribers == {}
+    assert dispatcher._subscriptions == {}
+
+
+class TestCoalesce:
+
+    @pytest.fixture
+    def coalescing(self, loop, create_test_connection):
+        dispatcher = Dispatcher(loop, coalesce_interval=0.01)
+
+        m = create_test_connection()
+        m.user_id = "test"
+
+        dispatcher.add_connection(m)
+
+        return dispatcher, m
+
+    async def test_latest(self, coalescing):
+        """
+        Test that bursts of updates are buffered and only the latest document for each id is sent in a single batched
+        message.
+
+        """
+        dispatcher, m = coalescing
+
+        await dispatcher.dispatch("jobs", "update", {"id": "foo", "progress": 0.1})
+        await dispatcher.dispatch("jobs", "update", {"id": "bar", "progress": 0.1})
+        await dispatcher.dispatch("jobs", "update", {"id": "foo", "progress": 0.2})
+
+        m.send_stub.assert_not_called()
+
+        await asyncio.sleep(0.05)
+
+        m.send_stub.assert_called_once_with({
+            "interface": "jobs",
+            "operation": "update_many",
+            "data": [
+                {"id": "bar", "progress": 0.1},
+                {"id": "foo", "progress": 0.2}
+            ]
+        })
+
+    async def test_single(self, coalescing):
+        """
+        Test that a single buffered update is sent as a normal ``update`` message.
+
+        """
+        dispatcher, m = coalescing
+
+        await dispatcher.dispatch("jobs", "update", {"id": "foo", "progress": 0.1})
+        await dispatcher.flush()
+
+        m.send_stub.assert_called_once_with({
+            "interface": "jobs",
+            "operation": "update",
+            "data": {"id": "foo", "progress": 0.1}
+        })
+
+    async def test_delete(self, coalescing):
+        """
+        Test that a delete flushes buffered updates for its interface first and discards those for deleted documents.
+
+        """
+        dispatcher, m = coalescing
+
+        await dispatcher.dispatch("jobs", "update", {"id": "foo", "progress": 0.1})
+        await dispatcher.dispatch("jobs", "update", {"id": "bar", "progress": 0.1})
+        await dispatcher.dispatch("samples", "update", {"id": "baz"})
+        await dispatcher.dispatch("jobs", "delete", ["foo"])
+
+        assert [call[0][0] for call in m.send_stub.call_args_list] == [
+            {"interface": "jobs", "operation": "update", "data": {"id": "bar", "progress": 0.1}},
+            {"interface": "jobs", "operation": "delete", "data": ["foo"]}
+        ]
+
+        await dispatcher.close()
+
+        assert m.send_stub.call_args[0][0] == {"interface": "samples", "operation": "update", "data": {"id": "baz"}}
+
+
+async def test_dispatch_evict(loop, test_ws_connection, create_test_connection):
+    """
+    Test that a connection whose send queue is full is evicted without affecting other connections.
+
+    """
+    dispatcher = Dispatcher(loop)
+
+    test_ws_connection._queue = asyncio.Queue(maxsize=2)
+
+    m = create_test_connection()
+    m.user_id = "bob"
+
+    dispatcher.add_connection(test_ws_connection)
+    dispatcher.add_connection(m)
+
+    for i in range(3):
+        await dispatcher.dispatch("test", "test", {"test": i})
+
+    assert m.send_stub.call_count == 3
+
+    assert dispatcher.connections == [m]
+
+    assert test_ws_connection._queue.qsize() == 2
+    assert test_ws_connection._queue.get_nowait() == virtool.dispatcher.RESYNC_MESSAGE
+
+
+class TestDelta:
+
+    @pytest.fixture
+    def delta(self, loop, create_test_connection):
+        dispatcher = Dispatcher(loop, delta_interfaces=["otus"])
+
+        m = create_test_connection()
+        m.user_id = "test"
+
+        dispatcher.add_connection(m)
+
+        return dispatcher, m
+
+    @pytest.fixture
+    def document(self):
+        return {
+            "id": "foo",
+            "name": "Prunus virus F",
+            "isolates": [{"id": "bar", "sequences": ["ATAGAGATAGATAGATTAGGATGATAGTTTAGATGAG" * 5]}]
+        }
+
+    async def test_patch(self, delta, document):
+        """
+        Test that an update after the first is sent as a versioned patch when the patch is smaller than the document.
+
+        """
+        dispatcher, m = delta
+
+        await dispatcher.dispatch("otus", "insert", document)
+
+        document["name"] = "Prunus virus E"
+
+        await dispatcher.dispatch("otus", "update", document)
+
+        # Changing the dispatched document after the fact should not affect later patches.
+        document["name"] = "Prunus virus D"
+
+        assert [call[0][0] for call in m.send_stub.call_args_list] == [
+            {
+                "interface": "otus",
+                "operation": "insert",
+                "version": 1,
+                "data": {
+                    "id": "foo",
+                    "name": "Prunus virus F",
+                    "isolates": document["isolates"]
+                }
+            },
+            {
+                "interface": "otus",
+                "operation": "patch",
+                "version": 2,
+                "data": {
+                    "id": "foo",
+                    "patch": [{"op": "replace", "path": "/name", "value": "Prunus virus E"}]
+                }
+            }
+        ]
+
+    async def test_full(self, delta, document):
+        """
+        Test that the full document is sent when the patch would be larger than the document.
+
+        """
+        dispatcher, m = delta
+
+        await dispatcher.dispatch("otus", "update", {"id": "foo", "name": "a"})
+        await dispatcher.dispatch("otus", "update", {"id": "foo", "name": "b"})
+
+        assert m.send_stub.call_args[0][0] == {
+            "interface": "otus",
+            "operation": "update",
+            "version": 2,
+            "data": {"id": "foo", "name": "b"}
+        }
+
+    async def test_untracked(self, delta, document):
+        """
+        Test that interfaces not configured for delta updates are unchanged.
+
+        """
+        dispatcher, m = delta
+
+        await dispatcher.dispatch("jobs", "update", {"id": "foo", "progress": 0.5})
+
+        m.send_stub.assert_called_with({
+            "interface": "jobs",
+            "operation": "update",
+            "data": {"id": "foo", "progress": 0.5}
+        })
+
+    async def test_delete(self, delta, document):
+        """
+        Test that the version of a deleted document is forgotten.
+
+        """
+        dispatcher, m = delta
+
+        await dispatcher.dispatch("otus", "insert", document)
+        await dispatcher.dispatch("otus", "delete", ["foo"])
+
+        assert dispatcher._versions == {}
+
+    @pytest.mark.parametrize("operation", ["update_many", "refetch"])
+    async def test_forget(self, operation, delta, document):
+        """
+        Test that versions are forgotten for documents sent in ``update_many`` messages and for all documents in an
+        interface when clients are told to refetch it.
+
+        """
+        dispatcher, m = delta
+
+        await dispatcher.dispatch("otus", "insert", document)
+
+        if operation == "update_many":
+            await dispatcher.dispatch("otus", "update_many", [document])
+        else:
+            await dispatcher.dispatch("otus", "refetch", None)
+
+        assert dispatcher._versions == {}
+
+    async def test_send_current(self, delta, document, create_test_connection):
+        dispatcher, m = delta
+
+        await dispatcher.dispatch("otus", "insert", document)
+
+        other = create_test_connection()
+        other.user_id = "bob"
+
+        assert await dispatcher.send_current(other, "otus", "foo") is True
+        assert await dispatcher.send_current(other, "otus", "missing") is False
+
+        unauthorized = create_test_connection()
+        unauthorized.user_id = None
+
+        assert await dispatcher.send_current(unauthorized, "otus", "foo") is False
+
+        assert not unauthorized.send_stub.called
+
+        other.send_stub.assert_called_once_with({
+            "interface": "otus",
+            "operation": "update",
+            "version": 1,
+            "data": document
+        })
+
+
+class TestEventLog:
+
+    def test_append(self):
+        event_log = virtool.dispatcher.EventLog(size=3)
+
+        start = event_log.sequence
+
+        message = {"interface": "jobs", "operation": "update", "data": {"id": "foo"}}
+
+        encoded = event_log.append("jobs", message)
+
+        assert message["sequence"] == start + 1
+        assert json.loads(encoded) == message
+
+    def test_since(self):
+        """
+        Test that only messages after the requested sequence are returned and that ``None`` is returned when the
+        requested messages have fallen out of the log.
+
+        """
+        event_log = virtool.dispatcher.EventLog(size=3)
+
+        start = event_log.sequence
+
+        for i in range(5):
+            event_log.append("jobs", {"data": i})
+
+        assert [json.loads(e)["data"] for _, e in event_log.since(start + 3)] == [3, 4]
+        assert [json.loads(e)["data"] for _, e in event_log.since(start + 2, until=start + 4)] == [2, 3]
+        assert event_log.since(start + 5) == []
+
+        # Sequence numbers from before the log was created or from a different log.
+        assert event_log.since(start + 1) is None
+        assert event_log.since(start + 6) is None
+
+    async def test_persist_error(self, mocker, caplog):
+        """
+        Test that failures to persist a message are logged.
+
+        """
+        event_log = virtool.dispatcher.EventLog()
+
+        event_log._collection = mocker.Mock(insert_one=make_mocked_coro(raise_exception=ValueError("Write failed")))
+
+        event_log.append("jobs", {"data": 1})
+
+        await asyncio.sleep(0.01)
+
+        assert "Could not persist event log message" in caplog.text
+        assert "Write failed" in caplog.text
+
+    async def test_persist(self, test_motor):
+        """
+        Test that persisted messages are loaded by a new log so clients can resume across restarts.
+
+        """
+        event_log = virtool.dispatcher.EventLog(size=3)
+
+        await event_log.persist(test_motor)
+
+        for i in range(2):
+            event_log.append("jobs", {"data": i})
+
+        await asyncio.sleep(0.1)
+
+        restarted = virtool.dispatcher.EventLog(size=3)
+        restarted.sequence = 0
+
+        await restarted.persist(test_motor)
+
+        assert restarted.sequence == event_log.sequence
+        assert restarted.since(event_log.sequence - 2) == event_log.since(event_log.sequence - 2)
+
+
+async def test_resume(loop, create_test_connection):
+    """
+    Test that a reconnected client receives only the messages it missed before connecting, filtered by its
+    subscriptions.
+
+    """
+    dispatcher = Dispatcher(loop, event_log=virtool.dispatcher.EventLog())
+
+    start = dispatcher.event_log.sequence
+
+    await dispatcher.dispatch("jobs", "update", {"id": "foo"})
+    await dispatcher.dispatch("samples", "update", {"id": "bar"})
+
+    m = create_test_connection()
+    m.user_id = "test"
+
+    dispatcher.add_connection(m)
+    dispatcher.subscribe(m, ["jobs"])
+
+    await dispatcher.dispatch("jobs", "update", {"id": "baz"})
+
+    assert m.send_stub.call_args[0][0]["sequence"] == start + 3
+
+    m.send_stub.reset_mock()
+
+    await dispatcher.resume(m, start)
+
+    m.send_stub.assert_called_once_with({
+        "interface": "jobs",
+        "operation": "update",
+        "data": {"id": "foo"},
+        "sequence": start + 1
+    })
+
+
+async def test_resume_unauthorized(loop, create_test_connection):
+    """
+    Test that logged messages are not replayed to a connection without a user id.
+
+    """
+    dispatcher = Dispatcher(loop, event_log=virtool.dispatcher.EventLog())
+
+    start = dispatcher.event_log.sequence
+
+    await dispatcher.dispatch("samples", "update", {"id": "foo"})
+
+    m = create_test_connection()
+    m.user_id = None
+
+    dispatcher.add_connection(m)
+
+    await dispatcher.resume(m, start)
+
+    assert not m.send_stub.called
+
+
+async def test_resume_resync(loop, create_test_connection):
+    """
+    Test that a client that is too far behind is told to resync.
+
+    """
+    dispatcher = Dispatcher(loop, event_log=virtool.dispatcher.EventLog())
+
+    m = create_test_connection()
+    m.user_id = "test"
+
+    dispatcher.add_connection(m)
+
+    await dispatcher.resume(m, 12)
+
+    m.send_stub.assert_called_once_with(json.loads(virtool.dispatcher.RESYNC_MESSAGE))
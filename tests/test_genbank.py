@@ -0,0 +1,131 @@
+import aiohttp
+import pytest
+from aiohttp import web
+
+import virtool.genbank
+
+RECORD = """LOCUS       NC_016574               6404 bp ss-RNA     linear   VRL 14-SEP-2011
+DEFINITION  Actinidia virus A isolate TP7-93A, complete genome.
+ACCESSION   NC_016574
+VERSION     NC_016574.1
+FEATURES             Location/Qualifiers
+     source          1..6404
+                     /organism="Actinidia virus A"
+                     /host="Actinidia chinensis"
+ORIGIN
+        1 gaaaacaaac aaaacaccaa ctcaataaca aaatggctac tgccacatca atcttccgta
+       61 tgcccctcaa ctctca
+//
+"""
+
+EXPECTED = {
+    "accession": "NC_016574.1",
+    "definition": "Actinidia virus A isolate TP7-93A, complete genome.",
+    "host": "Actinidia chinensis",
+    "sequence": "GAAAACAAACAAAACACCAACTCAATAACAAAATGGCTACTGCCACATCAATCTTCCGTATGCCCCTCAACTCTCA"
+}
+
+
+@pytest.fixture
+def http_session(loop):
+    session = aiohttp.ClientSession(loop=loop)
+    yield session
+    loop.run_until_complete(session.close())
+
+
+@pytest.fixture
+def mock_efetch_server(monkeypatch, loop, test_server):
+    async def get_handler(req):
+        accessions = req.query["id"].split(",")
+
+        if "missing" in accessions:
+            return web.Response(text="Failed to retrieve sequence", status=400)
+
+        body = "".join(RECORD.replace("NC_016574", accession) for accession in accessions)
+
+        return web.Response(text=body + "\n\n", status=200)
+
+    app = web.Application()
+
+    app.router.add_get("/efetch", get_handler)
+
+    server = loop.run_until_complete(test_server(app))
+
+    monkeypatch.setattr("virtool.genbank.FETCH_URL", "http://{}:{}/efetch".format(server.host, server.port))
+
+    return server
+
+
+def test_parse():
+    assert virtool.genbank.parse(RECORD) == [EXPECTED]
+
+
+def test_parse_many():
+    """
+    Test that a multi-record response is split into one parsed record per accession. The last record is not terminated
+    with ``//``.
+
+    """
+    body = RECORD + RECORD.replace("NC_016574", "NC_001234").replace("//\n", "")
+
+    assert virtool.genbank.parse(body) == [
+        EXPECTED,
+        dict(EXPECTED, accession="NC_001234.1")
+    ]
+
+
+@pytest.mark.parametrize("missing", [False, True])
+async def test_fetch(missing, http_session, mock_efetch_server):
+    accession = "missing" if missing else "NC_016574"
+
+    result = await virtool.genbank.fetch({"proxy_enable": False}, http_session, accession)
+
+    if missing:
+        assert result is None
+    else:
+        assert result == EXPECTED
+
+
+@pytest.mark.parametrize("missing", [False, True])
+async def test_fetch_many(missing, http_session, mock_efetch_server):
+    """
+    Test that several accessions are fetched and keyed by the requested accession. If one of the accessions can't be
+    retrieved, the others are still returned.
+
+    """
+    accessions = ["NC_001234.1", "NC_016574"]
+
+    if missing:
+        accessions.append("missing")
+
+    result = await virtool.genbank.fetch_many({"proxy_enable": False}, http_session, accessions)
+
+    expected = {
+        "NC_001234.1": dict(EXPECTED, accession="NC_001234.1.1"),
+        "NC_016574": EXPECTED
+    }
+
+    if missing:
+        expected["missing"] = None
+
+    assert result == expected
+
+
+def test_match_records():
+    """
+    Test that records are matched by versioned or unversioned accession regardless of response order and that
+    accessions without a record are ``None``.
+
+    """
+    records = [
+        dict(EXPECTED, accession="NC_001234.2"),
+        EXPECTED
+    ]
+
+    assert virtool.genbank.match_records(["NC_016574.1", "NC_001234", "NC_999999"], records) == {
+        "NC_016574.1": EXPECTED,
+        "NC_001234": records[0],
+        "NC_999999": None
+    }
+
+    assert virtool.genbank.match_records([12345], [EXPECTED]) == {12345: EXPECTED}
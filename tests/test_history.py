@@ -7,18 +7,42 @@ import virtool.utils
 
 def test_calculate_diff(test_otu_edit):
     """
-    Test that a diff is correctly calculated. Should work since the tested function is a very light wrapper for the
-    dict differ function.
+    Test that a diff is correctly calculated. Should work since the tested function is a very light wrapper for
+    :func:`virtool.diff.diff_otus`.
 
     """
     old, new = test_otu_edit
 
-    diff = virtool.history.calculate_diff(old, new)
+    assert virtool.history.calculate_diff(old, new) == {
+        "format": "otu",
+        "fields": {
+            "abbreviation": {"old": "PVF", "new": ""},
+            "name": {"old": "Prunus virus F", "new": "Prunus virus E"},
+            "version": {"old": 0, "new": 1}
+        }
+    }
 
-    assert diff.sort() == [
-        ("change", "name", ("Prunus virus F", "Prunus virus E")),
-        ("change", "abbreviation", ("PVF", "")), ("change", "version", (0, 1))
-    ].sort()
+
+@pytest.mark.parametrize("legacy", [True, False], ids=["dictdiffer", "otu"])
+def test_apply_and_revert_diff(legacy, test_otu_edit):
+    """
+    Test that both new diffs and the ``dictdiffer`` diffs stored in older change documents can be applied and
+    reverted.
+
+    """
+    old, new = test_otu_edit
+
+    if legacy:
+        diff = [
+            ["change", "abbreviation", ["PVF", ""]],
+            ["change", "name", ["Prunus virus F", "Prunus virus E"]],
+            ["change", "version", [0, 1]]
+        ]
+    else:
+        diff = virtool.history.calculate_diff(old, new)
+
+    assert virtool.history.apply_diff(old, diff) == new
+    assert virtool.history.revert_diff(new, diff) == old
 
 
 @pytest.mark.parametrize("document,description", [
@@ -83,3 +107,69 @@ def test_compose_create_description(document, description):
 ])
 def test_compose_edit_description(name, abbreviation, old_abbreviation, schema, description):
     assert virtool.history.compose_edit_description(name, abbreviation, old_abbreviation, schema) == description
+
+
+@pytest.mark.parametrize("version,expected", [(0, 0), (4, 3), (12, 20), (30, 20)])
+def test_get_nearest(version, expected):
+    assert virtool.history.get_nearest(version, [0, 3, 20]) == expected
+
+
+def test_get_nearest_empty():
+    assert virtool.history.get_nearest(3, []) is None
+
+
+@pytest.mark.parametrize("start,version,expected", [
+    (3, 1, ["foo.3", "foo.2"]),
+    (1, 3, ["foo.2", "foo.3"]),
+    (2, -1, ["foo.2", "foo.1", "foo.0"]),
+    (2, 2, [])
+])
+def test_get_change_ids(start, version, expected):
+    assert virtool.history.get_change_ids("foo", start, version) == expected
+
+
+@pytest.mark.parametrize("versions,keep,folded,deleted", [
+    ([0, 1, 2, 3, 4], [], [(0, 4)], [1, 2, 3]),
+    ([0, 1, 2, 3, 4], [1], [(1, 4)], [2, 3]),
+    ([0, 1, 2, 3, 4], [2], [(0, 2), (2, 4)], [1, 3]),
+    ([7, 5, 1, 6, 2, 3], [], [(1, 3), (5, 7)], [2, 6]),
+    ([0, 1], [], [], []),
+    ([], [], [], [])
+])
+def test_get_compaction_plan(versions, keep, folded, deleted):
+    assert virtool.history.get_compaction_plan(versions, keep) == (folded, deleted)
+
+
+class TestPatch:
+
+    @pytest.fixture
+    def changes(self):
+        return [
+            {"method_name": "create", "diff": {"name": "Foo", "version": 0, "isolates": [{"id": "bar"}]}},
+            {"method_name": "edit", "diff": [["change", "version", [0, 1]], ["change", "name", ["Foo", "Baz"]]]},
+            {"method_name": "remove_isolate", "diff": [
+                ["change", "version", [1, 2]],
+                ["remove", "isolates", [[0, {"id": "bar"}]]]
+            ]}
+        ]
+
+    def test_forward(self, changes):
+        assert virtool.history.patch_forward(changes[0]["diff"], changes[1:]) == {
+            "name": "Baz",
+            "version": 2,
+            "isolates": []
+        }
+
+    def test_backward(self, changes):
+        otu = {"name": "Baz", "version": 2, "isolates": []}
+
+        assert virtool.history.patch_backward(otu, [changes[2], changes[1]]) == changes[0]["diff"]
+
+    def test_backward_create(self, changes):
+        """
+        Test that ``None`` is returned when the creation of the otu is reverted.
+
+        """
+        otu = {"name": "Baz", "version": 2, "isolates": []}
+
+        assert virtool.history.patch_backward(otu, reversed(changes)) is None
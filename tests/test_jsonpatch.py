@@ -0,0 +1,55 @@
+import copy
+
+import pytest
+
+import virtool.jsonpatch
+
+
+@pytest.mark.parametrize("old,new,expected", [
+    ({"a": 1}, {"a": 1}, []),
+    ({"a": 1}, {"a": 2}, [{"op": "replace", "path": "/a", "value": 2}]),
+    ({"a": 1, "b": 2}, {"a": 1}, [{"op": "remove", "path": "/b"}]),
+    ({"a": 1}, {"a": 1, "c/d": 3}, [{"op": "add", "path": "/c~1d", "value": 3}]),
+    ({"a": [1, 2]}, {"a": [1, 3, 4]}, [
+        {"op": "replace", "path": "/a/1", "value": 3},
+        {"op": "add", "path": "/a/-", "value": 4}
+    ]),
+    ({"a": [1, 2, 3]}, {"a": [1]}, [
+        {"op": "remove", "path": "/a/2"},
+        {"op": "remove", "path": "/a/1"}
+    ]),
+    ({"a": {"b": [{"c": 1}]}}, {"a": {"b": [{"c": 2}]}}, [{"op": "replace", "path": "/a/b/0/c", "value": 2}]),
+    ({"a": 1, "b": 0, "c": [1]}, {"a": True, "b": False, "c": [1.0]}, [
+        {"op": "replace", "path": "/a", "value": True},
+        {"op": "replace", "path": "/b", "value": False},
+        {"op": "replace", "path": "/c/0", "value": 1.0}
+    ])
+], ids=["equal", "replace", "remove", "add_escaped", "list_change_append", "list_truncate", "nested", "types"])
+def test_make_patch(old, new, expected):
+    patch = virtool.jsonpatch.make_patch(old, new)
+
+    assert patch == expected
+
+    patched = virtool.jsonpatch.apply_patch(copy.deepcopy(old), patch)
+
+    assert patched == new
+
+    # Equal values of different types (eg. 1 and True) must not survive the round trip.
+    assert repr(patched) == repr(new)
+
+
+def test_otu(test_merged_otu):
+    """
+    Test that a patch describing a change to a deeply nested sequence can be applied to produce the updated OTU.
+
+    """
+    new = copy.deepcopy(test_merged_otu)
+
+    new["isolates"][0]["sequences"][0]["sequence"] = "ATAGAGGAT"
+    new["isolates"].append({"id": "foobar", "default": False, "sequences": []})
+
+    patch = virtool.jsonpatch.make_patch(test_merged_otu, new)
+
+    assert len(patch) == 2
+
+    assert virtool.jsonpatch.apply_patch(copy.deepcopy(test_merged_otu), patch) == new
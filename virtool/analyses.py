@@ -23,6 +23,21 @@ def coverage_to_coordinates(coverage_list):
     return coordinates
 
 
+def get_nuvs_result_positions(document):
+    """
+    Get a dict mapping the index of each sequence in a NuVs analysis to its position in the ``results`` list. Used to
+    update several sequences in one write.
+
+    :param document: a NuVs analysis document
+    :type document: dict
+
+    :return: result list positions keyed by sequence index
+    :rtype: dict
+
+    """
+    return {result["index"]: position for position, result in enumerate(document["results"])}
+
+
 def get_nuvs_json_path(data_path, analysis_id, sample_id):
     return os.path.join(
         data_path,
@@ -2,8 +2,6 @@
 Provides request handlers for managing and viewing analyses.
 
 """
-import aiojobs.aiohttp
-
 import virtool.analyses
 import virtool.bio
 import virtool.db.analyses
@@ -90,6 +88,7 @@ async def blast(req):
 
     """
     db = req.app["db"]
+    session = req.app["client"]
     settings = req.app["settings"]
 
     analysis_id = req.match_info["analysis_id"]
@@ -121,23 +120,130 @@ async def blast(req):
     if not write:
         return insufficient_rights()
 
-    # Start a BLAST at NCBI with the specified sequence. Return a RID that identifies the BLAST run.
-    rid, _ = await virtool.bio.initialize_ncbi_blast(req.app["settings"], sequence)
+    cached = await req.app["blast_cache"].get(sequence.upper())
+
+    headers = {
+        "Location": "/api/analyses/{}/{}/blast".format(analysis_id, sequence_index)
+    }
 
-    blast_data, document = await virtool.db.analyses.update_nuvs_blast(db, settings, analysis_id, sequence_index, rid)
+    # Use a cached result for an identical sequence if there is one.
+    if cached:
+        blast_data, _ = await virtool.db.analyses.update_nuvs_blast(
+            db,
+            settings,
+            session,
+            analysis_id,
+            sequence_index,
+            cached["rid"],
+            result=cached["result"]
+        )
 
-    # Wait on BLAST request as a Task until the it completes on NCBI. At that point the sequence in the DB will be
-    # updated with the BLAST result.
-    await aiojobs.aiohttp.spawn(req, virtool.bio.wait_for_blast_result(
+        return json_response(blast_data, headers=headers, status=201)
+
+    # Start a BLAST at NCBI with the specified sequence. Return a RID that identifies the BLAST run.
+    rid, _ = await virtool.bio.initialize_ncbi_blast(settings, session, sequence)
+
+    blast_data, document = await virtool.db.analyses.update_nuvs_blast(
         db,
-        req.app["settings"],
+        settings,
+        session,
         analysis_id,
         sequence_index,
         rid
-    ))
+    )
+
+    # Have the BLAST poller check the RID until the request completes on NCBI. At that point the sequence in the DB
+    # will be updated with the BLAST result.
+    req.app["blast"].add(analysis_id, sequence_index, rid)
+
+    return json_response(blast_data, headers=headers, status=201)
+
+
+@routes.put("/api/analyses/{analysis_id}/blast", schema={
+    "sequence_indexes": {"type": "list", "schema": {"type": "integer"}, "minlength": 1}
+})
+async def blast_many(req):
+    """
+    BLAST several contig sequences from a NuVs result record as a single multi-query request. All sequences are BLASTed
+    if no ``sequence_indexes`` are given. The resulting BLAST data will be attached to each sequence. Cached results
+    are used for sequences that have been BLASTed before.
+
+    """
+    db = req.app["db"]
+    data = req["data"]
+    session = req.app["client"]
+    settings = req.app["settings"]
+
+    analysis_id = req.match_info["analysis_id"]
+
+    document = await db.analyses.find_one({"_id": analysis_id}, ["ready", "algorithm", "results", "sample"])
+
+    if not document:
+        return not_found("Analysis not found")
+
+    if document["algorithm"] != "nuvs":
+        return conflict("Not a NuVs analysis")
+
+    if not document["ready"]:
+        return conflict("Analysis is still running")
+
+    sequence_indexes = data.get("sequence_indexes") or [result["index"] for result in document["results"]]
+
+    sequences = {i: virtool.analyses.get_nuvs_sequence_by_index(document, i) for i in set(sequence_indexes)}
+
+    if any(sequence is None for sequence in sequences.values()):
+        return not_found("Sequence not found")
+
+    sample = await db.samples.find_one({"_id": document["sample"]["id"]}, virtool.db.samples.PROJECTION)
+
+    if not sample:
+        return bad_request("Parent sample does not exist")
+
+    _, write = virtool.samples.get_sample_rights(sample, req["client"])
+
+    if not write:
+        return insufficient_rights()
+
+    blast_cache = req.app["blast_cache"]
+
+    cached = dict()
+
+    for sequence_index, sequence in sequences.items():
+        entry = await blast_cache.get(sequence.upper())
+
+        if entry:
+            cached[sequence_index] = entry
+
+    blast_data = dict()
+
+    # Use cached results for identical sequences where possible.
+    if cached:
+        cached_data, _ = await virtool.db.analyses.apply_cached_nuvs_blast(db, analysis_id, cached)
+        blast_data.update(cached_data)
+
+    sequences = {i: sequence for i, sequence in sequences.items() if i not in cached}
+
+    if sequences:
+        # Start a single BLAST at NCBI with all of the uncached sequences. Return a RID that identifies the BLAST run.
+        rid, _ = await virtool.bio.initialize_ncbi_blast_many(settings, session, sequences)
+
+        sequence_indexes = sorted(sequences)
+
+        pending_data, _ = await virtool.db.analyses.update_nuvs_blast_many(
+            db,
+            settings,
+            session,
+            analysis_id,
+            sequence_indexes,
+            rid
+        )
+
+        blast_data.update({i: pending_data for i in sequence_indexes})
+
+        req.app["blast"].add_many(analysis_id, sequence_indexes, rid)
 
     headers = {
-        "Location": "/api/analyses/{}/{}/blast".format(analysis_id, sequence_index)
+        "Location": "/api/analyses/{}".format(analysis_id)
     }
 
-    return json_response(blast_data, headers=headers, status=201)
+    return json_response([{"index": i, "blast": blast_data[i]} for i in sorted(blast_data)], headers=headers, status=201)
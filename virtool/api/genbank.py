@@ -20,15 +20,23 @@ async def get(req):
 
     """
     accession = req.match_info["accession"]
+    cache = req.app["genbank_cache"]
     session = req.app["client"]
     settings = req.app["settings"]
 
+    data = await cache.get(accession)
+
+    if data:
+        return json_response(data)
+
     try:
         data = await virtool.genbank.fetch(settings, session, accession)
 
         if data is None:
             return not_found()
 
+        await cache.set(accession, data)
+
         return json_response(data)
 
     except aiohttp.ClientConnectorError:
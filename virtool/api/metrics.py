@@ -0,0 +1,14 @@
+import virtool.http.routes
+from virtool.api.utils import json_response
+
+routes = virtool.http.routes.Routes()
+
+
+@routes.get("/api/metrics", admin=True)
+async def get(req):
+    """
+    Get the latency and volume of database operations, labelled by collection and operation, recorded since the server
+    started.
+
+    """
+    return json_response(req.app["db"].metrics.to_dict())
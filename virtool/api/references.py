@@ -244,6 +244,31 @@ async def find_history(req):
     return json_response(data)
 
 
+@routes.post("/api/refs/{ref_id}/history/compact", admin=True)
+async def compact_history(req):
+    """
+    Start a background process that compacts the history of the reference. Changes included in index builds that are
+    no longer active are folded together. Unbuilt changes are not affected.
+
+    """
+    db = req.app["db"]
+
+    ref_id = req.match_info["ref_id"]
+
+    if not await virtool.db.utils.id_exists(db.references, ref_id):
+        return not_found()
+
+    process = await virtool.db.processes.register(db, "compact_history")
+
+    await aiojobs.aiohttp.spawn(req, virtool.db.references.compact_history(
+        req.app,
+        ref_id,
+        process["id"]
+    ))
+
+    return json_response(process, status=202)
+
+
 @routes.get("/api/refs/{ref_id}/indexes")
 async def find_indexes(req):
     db = req.app["db"]
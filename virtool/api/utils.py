@@ -35,6 +35,21 @@ def dumps(obj):
     return json.dumps(obj, indent=4, sort_keys=False, cls=CustomEncoder)
 
 
+def compact_dumps(obj):
+    """
+    A wrapper for :func:`json.dumps` that produces the most compact output possible. Used for encoding messages sent
+    over the websocket.
+
+    :param obj: a JSON-serializable object
+    :type obj: object
+
+    :return: a JSON string
+    :rtype: str
+
+    """
+    return json.dumps(obj, separators=(",", ":"), cls=CustomEncoder)
+
+
 def compose_regex_query(term, fields):
     if not isinstance(fields, (list, tuple)):
         raise TypeError("Type of 'fields' must be one of 'list' or 'tuple'")
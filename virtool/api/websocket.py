@@ -1,12 +1,94 @@
+import json
 import logging
 
-from aiohttp import web
+from aiohttp import web, WSMsgType
 
 import virtool.dispatcher
 
 logger = logging.getLogger(__name__)
 
 
+async def handle_message(dispatcher, connection, data):
+    """
+    Handle a text message received from a client. Clients can subscribe to and unsubscribe from interfaces by sending
+    messages like:
+
+    .. code-block:: json
+
+        {"method": "subscribe", "interfaces": ["jobs", "samples"]}
+
+    A client that has missed a delta update can request the current version of a document:
+
+    .. code-block:: json
+
+        {"method": "get", "interface": "otus", "id": "foo"}
+
+    A client that has reconnected can request the messages it missed since the last sequence number it saw:
+
+    .. code-block:: json
+
+        {"method": "resume", "sequence": 1538092800123}
+
+    Malformed messages are ignored. Requests for documents, subscriptions, and resumes are ignored for connections that
+    are not authorized, the same as broadcast messages.
+
+    :param dispatcher: the application dispatcher
+    :type dispatcher: :class:`.Dispatcher`
+
+    :param connection: the connection the message was received on
+    :type connection: :class:`.Connection`
+
+    :param data: the raw message
+    :type data: str
+
+    """
+    try:
+        message = json.loads(data)
+    except ValueError:
+        logger.debug("Received malformed websocket message")
+        return
+
+    if not isinstance(message, dict):
+        return
+
+    method = message.get("method")
+
+    if method == "get":
+        if not connection.user_id:
+            return
+
+        interface = message.get("interface")
+        document_id = message.get("id")
+
+        if isinstance(interface, str) and isinstance(document_id, str):
+            await dispatcher.send_current(connection, interface, document_id)
+
+        return
+
+    if method == "resume":
+        if not connection.user_id:
+            return
+
+        sequence = message.get("sequence")
+
+        if isinstance(sequence, int) and not isinstance(sequence, bool):
+            await dispatcher.resume(connection, sequence)
+
+        return
+
+    interfaces = message.get("interfaces")
+
+    if not isinstance(interfaces, list) or not all(isinstance(i, str) for i in interfaces):
+        return
+
+    if method == "subscribe":
+        if connection.user_id:
+            dispatcher.subscribe(connection, interfaces)
+
+    elif method == "unsubscribe":
+        dispatcher.unsubscribe(connection, interfaces)
+
+
 async def root(req):
     """
     Handles requests for WebSocket connections.
@@ -18,17 +100,24 @@ async def root(req):
 
     connection = virtool.dispatcher.Connection(ws, req["client"])
 
-    req.app["dispatcher"].add_connection(connection)
+    connection.start()
+
+    dispatcher = req.app["dispatcher"]
+
+    dispatcher.add_connection(connection)
 
     try:
-        async for _ in ws:
-            pass
+        async for msg in ws:
+            if msg.type == WSMsgType.TEXT:
+                await handle_message(dispatcher, connection, msg.data)
     except RuntimeError as err:
         if "TCPTransport" not in str(err):
             raise
 
     logger.info("Connection closed")
 
-    req.app["dispatcher"].remove_connection(connection)
+    dispatcher.remove_connection(connection)
+
+    connection.stop()
 
     return ws
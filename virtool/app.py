@@ -13,11 +13,14 @@ from motor import motor_asyncio
 from urllib.parse import quote_plus
 
 import virtool.app_auth
+import virtool.blast
+import virtool.cache
 import virtool.dispatcher
 import virtool.app_routes
 import virtool.settings
 import virtool.db.hmm
 import virtool.db.iface
+import virtool.db.metrics
 import virtool.db.references
 import virtool.db.software
 import virtool.db.status
@@ -35,13 +38,97 @@ import virtool.utils
 
 logger = logging.getLogger(__name__)
 
+#: The maximum number of simultaneous connections the shared HTTP client will open to a single host.
+HTTP_LIMIT_PER_HOST = 8
+
+#: The number of seconds an idle connection in the shared HTTP client is kept alive for reuse.
+HTTP_KEEPALIVE_TIMEOUT = 60
+
+#: Timeouts for the shared HTTP client. There is no total timeout so long-running downloads are not interrupted.
+HTTP_TIMEOUT = client.ClientTimeout(total=None, connect=30, sock_read=120)
+
 
 async def init_http_client(app):
+    """
+    An application ``on_startup`` callback that creates a pooled :class:`aiohttp.ClientSession` and attaches it to the
+    ``app`` object. All outbound requests (eg. NCBI, GitHub) should be made through this session so connections are
+    kept alive and reused.
+
+    :param app: the app object
+    :type app: :class:`aiohttp.web.Application`
+
+    """
     headers = {
         "user-agent": "virtool/{}".format(app["version"]),
     }
 
-    app["client"] = client.ClientSession(loop=app.loop, headers=headers)
+    connector = client.TCPConnector(
+        limit_per_host=HTTP_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        loop=app.loop
+    )
+
+    app["client"] = client.ClientSession(
+        connector=connector,
+        headers=headers,
+        loop=app.loop,
+        timeout=HTTP_TIMEOUT
+    )
+
+
+async def init_caches(app):
+    """
+    An application ``on_startup`` callback that initializes on-disk caches for BLAST results and GenBank records and
+    attaches them to the ``app`` object. The caches are disabled if no data path is configured.
+
+    :param app: the app object
+    :type app: :class:`aiohttp.web.Application`
+
+    """
+    data_path = app["settings"].get("data_path")
+
+    blast_path = None
+    genbank_path = None
+
+    if data_path:
+        blast_path = virtool.cache.get_cache_path(data_path, "blast")
+        genbank_path = virtool.cache.get_cache_path(data_path, "genbank")
+
+    app["blast_cache"] = virtool.cache.DiskCache(
+        blast_path,
+        virtool.cache.BLAST_MAX_SIZE,
+        virtool.cache.BLAST_TTL,
+        loop=app.loop
+    )
+
+    app["genbank_cache"] = virtool.cache.DiskCache(
+        genbank_path,
+        virtool.cache.GENBANK_MAX_SIZE,
+        virtool.cache.GENBANK_TTL,
+        loop=app.loop
+    )
+
+
+async def init_blast(app):
+    """
+    An application ``on_startup`` callback that initializes a :class:`virtool.blast.Poller` object, attaches it to the
+    ``app`` object, and starts polling for outstanding BLAST requests.
+
+    :param app: the app object
+    :type app: :class:`aiohttp.web.Application`
+
+    """
+    app["blast"] = virtool.blast.Poller(
+        app.loop,
+        app["db"],
+        app["settings"],
+        app["client"],
+        cache=app["blast_cache"]
+    )
+
+    scheduler = aiojobs.aiohttp.get_scheduler_from_app(app)
+
+    await scheduler.spawn(app["blast"].run())
 
 
 async def init_refresh(app):
@@ -114,7 +201,26 @@ async def init_dispatcher(app):
     :type app: :class:`aiohttp.web.Application`
 
     """
-    app["dispatcher"] = virtool.dispatcher.Dispatcher(app.loop)
+    settings = app["settings"]
+
+    coalesce_ms = settings.get("dispatcher_coalesce_ms", 0)
+
+    delta_interfaces = None
+
+    if settings.get("dispatcher_delta_updates", False):
+        delta_interfaces = virtool.dispatcher.DELTA_INTERFACES
+
+    event_log = None
+
+    if settings.get("dispatcher_event_log", False):
+        event_log = virtool.dispatcher.EventLog()
+
+    app["dispatcher"] = virtool.dispatcher.Dispatcher(
+        app.loop,
+        coalesce_interval=coalesce_ms / 1000 if coalesce_ms else None,
+        delta_interfaces=delta_interfaces,
+        event_log=event_log
+    )
 
 
 async def init_db(app):
@@ -163,10 +269,35 @@ async def init_db(app):
             "Could not connect to MongoDB server at {}:{}".format(db_host, db_port)
         )
 
-    app["db"] = virtool.db.iface.DB(db_client[app["db_name"]], app["dispatcher"].dispatch, app.loop)
+    slow_op_ms = settings.get("db_slow_op_ms", 500)
+
+    metrics = virtool.db.metrics.Metrics(slow_threshold=slow_op_ms / 1000 if slow_op_ms else None)
+
+    otu_cache_path = None
+
+    if settings.get("data_path") and settings.get("otu_disk_cache", True):
+        otu_cache_path = virtool.cache.get_cache_path(settings["data_path"], "otus")
+
+    otu_cache = virtool.cache.OTUCache(
+        otu_cache_path,
+        namespace="{}:{}:".format(app["db_name"], app["version"]),
+        loop=app.loop
+    )
+
+    app["db"] = virtool.db.iface.DB(
+        db_client[app["db_name"]],
+        app["dispatcher"].dispatch,
+        app.loop,
+        metrics=metrics,
+        otu_cache=otu_cache,
+        batch_notifications=settings.get("db_batch_notifications", False)
+    )
 
     await app["db"].connect()
 
+    if app["dispatcher"].event_log is not None and settings.get("dispatcher_persist_events", False):
+        await app["dispatcher"].event_log.persist(db_client[app["db_name"]])
+
 
 async def init_check_db(app):
     logger.info("Starting database checks. Do not interrupt. This may take several minutes.")
@@ -338,6 +469,7 @@ def create_app(loop, db_name=None, disable_job_manager=False, disable_file_manag
             app["settings"] = dict()
 
         app.on_startup.append(init_executors)
+        app.on_startup.append(init_caches)
         app.on_startup.append(init_dispatcher)
         app.on_startup.append(init_db)
 
@@ -347,6 +479,7 @@ def create_app(loop, db_name=None, disable_job_manager=False, disable_file_manag
             app.on_startup.append(init_check_db)
 
         app.on_startup.append(init_resources)
+        app.on_startup.append(init_blast)
 
         if not disable_job_manager:
             app.on_startup.append(init_job_manager)
@@ -14,6 +14,7 @@ import virtool.api.history
 import virtool.api.hmm
 import virtool.api.indexes
 import virtool.api.jobs
+import virtool.api.metrics
 import virtool.api.otus
 import virtool.api.processes
 import virtool.api.references
@@ -108,6 +109,7 @@ def setup_routes(app):
     app.router.add_routes(virtool.api.hmm.routes)
     app.router.add_routes(virtool.api.indexes.routes)
     app.router.add_routes(virtool.api.jobs.routes)
+    app.router.add_routes(virtool.api.metrics.routes)
     app.router.add_routes(virtool.api.otus.routes)
     app.router.add_routes(virtool.api.processes.routes)
     app.router.add_routes(virtool.api.references.routes)
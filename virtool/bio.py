@@ -1,18 +1,22 @@
-import asyncio
+import concurrent.futures
+import gzip
 import io
 import json
 import re
 import zipfile
 
-import aiohttp
+import numpy
 
 import virtool.analyses
 import virtool.errors
 import virtool.http.proxy
-import virtool.utils
 
 BLAST_URL = "https://blast.ncbi.nlm.nih.gov/Blast.cgi"
 
+GZIP_MAGIC = b"\x1f\x8b"
+
+#: The buffer size in bytes used when reading FASTA and FASTQ files.
+READ_BUFFER_SIZE = 1024 * 1024
 
 COMPLEMENT_TABLE = {
     "A": "T",
@@ -118,18 +122,98 @@ TRANSLATION_TABLE = {
     "GGN": "G"
 }
 
+#: The nucleotide alphabet used to encode codons as integer indices. Other characters are encoded as ``len(alphabet)``.
+CODON_ALPHABET = "ACGTN"
 
-def read_fasta(path):
-    data = list()
+CODON_BASE = len(CODON_ALPHABET) + 1
+
+
+def _make_complement_bytes_table():
+    table = bytearray(range(256))
+
+    for nucleotide, complement in COMPLEMENT_TABLE.items():
+        table[ord(nucleotide)] = ord(complement)
+
+    return bytes(table)
+
+
+def _make_codon_encoding_table():
+    table = bytearray([len(CODON_ALPHABET)] * 256)
+
+    for index, nucleotide in enumerate(CODON_ALPHABET):
+        table[ord(nucleotide)] = index
+
+    return bytes(table)
+
+
+def _make_codon_lookup():
+    lookup = numpy.full(CODON_BASE ** 3, ord("X"), dtype=numpy.uint8)
+
+    for codon, amino_acid in TRANSLATION_TABLE.items():
+        index = sum(CODON_ALPHABET.index(n) * CODON_BASE ** (2 - i) for i, n in enumerate(codon))
+        lookup[index] = ord(amino_acid)
+
+    return lookup
+
+
+#: The minimum number of sequences that will be split across processes by :func:`find_orfs_many`.
+ORF_CHUNK_SIZE = 50
+
+#: A :meth:`bytes.translate` table mapping each nucleotide in :data:`COMPLEMENT_TABLE` to its complement.
+COMPLEMENT_BYTES_TABLE = _make_complement_bytes_table()
+
+#: The nucleotides that can be complemented, as bytes.
+COMPLEMENT_BYTES = "".join(COMPLEMENT_TABLE).encode()
+
+#: A :meth:`bytes.translate` table mapping nucleotides to their index in :data:`CODON_ALPHABET`.
+CODON_ENCODING_TABLE = _make_codon_encoding_table()
+
+#: An array of amino acid characters indexed by encoded codon. Built from :data:`TRANSLATION_TABLE`.
+CODON_LOOKUP = _make_codon_lookup()
+
+STOP_CODE = ord("*")
 
-    with open(path, "r") as f:
+
+def open_sequence_file(path):
+    """
+    Open a FASTA or FASTQ file for reading as text. Gzip-compressed files are detected by their magic number and
+    decompressed transparently. Reads are buffered in chunks of :data:`READ_BUFFER_SIZE` bytes.
+
+    :param path: the path to the sequence file
+    :type path: str
+
+    :return: a text file object
+    :rtype: :class:`io.TextIOBase`
+
+    """
+    with open(path, "rb") as f:
+        is_gzipped = f.read(2) == GZIP_MAGIC
+
+    if is_gzipped:
+        return io.TextIOWrapper(io.BufferedReader(gzip.open(path, "rb"), buffer_size=READ_BUFFER_SIZE))
+
+    return open(path, "r", buffering=READ_BUFFER_SIZE)
+
+
+def iter_fasta(path):
+    """
+    Yield ``(header, sequence)`` tuples from the FASTA file at ``path`` one record at a time.
+
+    :param path: the path to the FASTA file, which may be gzipped
+    :type path: str
+
+    :return: a generator of FASTA records
+    :rtype: Generator[tuple]
+
+    """
+    with open_sequence_file(path) as f:
         header = None
         seq = []
 
         for line in f:
             if line[0] == ">":
                 if header:
-                    data.append((header, "".join(seq)))
+                    yield header, "".join(seq)
 
                 header = line.rstrip().replace(">", "")
                 seq = []
@@ -142,20 +226,26 @@ def read_fasta(path):
             raise IOError("Illegal FASTA line: {}".format(line))
 
         if header:
-            data.append((header, "".join(seq)))
+            yield header, "".join(seq)
+
 
-    return data
+def iter_fastq(path):
+    """
+    Yield ``(header, sequence, quality)`` tuples from the FASTQ file at ``path`` one record at a time.
 
+    :param path: the path to the FASTQ file, which may be gzipped
+    :type path: str
 
-def read_fastq(path):
-    data = list()
+    :return: a generator of FASTQ records
+    :rtype: Generator[tuple]
 
+    """
     had_plus = False
 
     header = None
     seq = None
 
-    with open(path, "r") as f:
+    with open_sequence_file(path) as f:
         for line in f:
             if line == "+\n":
                 had_plus = True
@@ -170,13 +260,19 @@ def read_fastq(path):
                 continue
 
             if had_plus:
-                data.append((header, seq, line.rstrip()))
+                yield header, seq, line.rstrip()
 
                 header = None
                 seq = None
                 had_plus = False
 
-    return data
+
+def read_fasta(path):
+    return list(iter_fasta(path))
+
+
+def read_fastq(path):
+    return list(iter_fastq(path))
 
 
 def read_fastq_headers(path):
@@ -184,7 +280,7 @@ def read_fastq_headers(path):
 
     had_plus = False
 
-    with open(path, "r") as f:
+    with open_sequence_file(path) as f:
         for line in f:
             if line == "+\n":
                 had_plus = True
@@ -201,29 +297,98 @@ def read_fastq_headers(path):
 
 
 def reverse_complement(sequence):
-    sequence = sequence.upper()
+    """
+    Return the reverse complement of a nucleotide sequence. The complement is calculated with a byte translation table
+    built from :data:`COMPLEMENT_TABLE`.
 
-    complement = [COMPLEMENT_TABLE[s] for s in sequence]
-    complement.reverse()
+    :param sequence: the nucleotide sequence
+    :type sequence: str
 
-    return "".join(complement)
+    :return: the reverse complement
+    :rtype: str
+
+    """
+    encoded = sequence.upper().encode("ascii", "replace")
+
+    illegal = encoded.translate(None, COMPLEMENT_BYTES)
+
+    if illegal:
+        raise KeyError(chr(illegal[0]))
+
+    return encoded.translate(COMPLEMENT_BYTES_TABLE)[::-1].decode()
 
 
 def translate(sequence):
-    sequence = sequence.upper()
+    """
+    Translate a nucleotide sequence to protein using :data:`TRANSLATION_TABLE`.
+
+    Codons are encoded as integer indices into :data:`CODON_LOOKUP` so the whole sequence is translated in a single
+    vectorized lookup. Codons that match no amino acid, taking into account ambiguous codons where possible, are
+    translated to ``X``.
+
+    :param sequence: the nucleotide sequence
+    :type sequence: str
+
+    :return: the protein sequence
+    :rtype: str
+
+    """
+    codon_count = len(sequence) // 3
+
+    if codon_count == 0:
+        return ""
+
+    encoded = sequence.upper().encode("ascii", "replace")[:codon_count * 3].translate(CODON_ENCODING_TABLE)
+
+    codons = numpy.frombuffer(encoded, dtype=numpy.uint8).reshape(codon_count, 3).astype(numpy.intp)
+
+    indices = codons[:, 0] * CODON_BASE ** 2 + codons[:, 1] * CODON_BASE + codons[:, 2]
 
-    protein = list()
+    return CODON_LOOKUP[indices].tobytes().decode()
 
-    for i in range(0, len(sequence) // 3):
-        codon = sequence[i * 3:(i + 1) * 3]
 
-        # Translate to X if the codon matches no amino acid (taking into account ambiguous codons where possible)
-        protein.append(TRANSLATION_TABLE.get(codon, "X"))
+def translate_all_frames(sequence):
+    """
+    Translate the codon starting at every position in ``sequence`` in a single vectorized pass.
+
+    The translation of frame ``n`` is every third element of the result starting at ``n``. This lets all three frames of
+    a strand share one encoding and one stop codon scan.
+
+    :param sequence: the nucleotide sequence
+    :type sequence: str
+
+    :return: an array of amino acid character codes, one for each codon position
+    :rtype: :class:`numpy.ndarray`
 
-    return "".join(protein)
+    """
+    if len(sequence) < 3:
+        return numpy.zeros(0, dtype=numpy.uint8)
+
+    encoded = numpy.frombuffer(
+        sequence.upper().encode("ascii", "replace").translate(CODON_ENCODING_TABLE),
+        dtype=numpy.uint8
+    ).astype(numpy.intp)
+
+    indices = encoded[:-2] * CODON_BASE ** 2 + encoded[1:-1] * CODON_BASE + encoded[2:]
+
+    return CODON_LOOKUP[indices]
 
 
 def find_orfs(sequence):
+    """
+    Find all ORFs at least 100 amino acids long in the six translation frames of ``sequence``. Only sequences longer
+    than 300 nucleotides are searched.
+
+    Stop codons are located once per strand by :func:`translate_all_frames` and split between the three frames by
+    position.
+
+    :param sequence: the nucleotide sequence
+    :type sequence: str
+
+    :return: the ORFs as dicts with ``pro``, ``nuc``, ``frame``, ``strand`` and ``pos`` keys
+    :rtype: List[dict]
+
+    """
     orfs = list()
 
     sequence_length = len(sequence)
@@ -232,19 +397,23 @@ def find_orfs(sequence):
     if sequence_length > 300:
         # Looks at both forward (+) and reverse (-) strands.
         for strand, nuc in [(+1, sequence), (-1, reverse_complement(sequence))]:
+            codons = translate_all_frames(nuc)
+
+            # Positions of every stop codon on the strand, regardless of frame.
+            stops = numpy.flatnonzero(codons == STOP_CODE)
+
             # Look in all three translation frames.
             for frame in range(3):
-                translation = translate(nuc[frame:])
+                translation = codons[frame::3].tobytes().decode()
                 translation_length = len(translation)
 
+                aa_ends = ((stops[stops % 3 == frame] - frame) // 3).tolist()
+                aa_ends.append(translation_length)
+
                 aa_start = 0
 
                 # Extract ORFs.
-                while aa_start < translation_length:
-                    aa_end = translation.find("*", aa_start)
-
-                    if aa_end == -1:
-                        aa_end = translation_length
+                for aa_end in aa_ends:
                     if aa_end - aa_start >= 100:
                         if strand == 1:
                             start = frame + aa_start * 3
@@ -266,13 +435,45 @@ def find_orfs(sequence):
     return orfs
 
 
-async def initialize_ncbi_blast(settings, sequence):
+def find_orfs_many(sequences, processes=None, chunk_size=ORF_CHUNK_SIZE):
+    """
+    Find ORFs in a batch of sequences. Returns a list of ORF lists in the same order as ``sequences``. Each list is
+    identical to the output of :func:`find_orfs` for the corresponding sequence.
+
+    Batches larger than ``chunk_size`` are fanned out across a process pool.
+
+    :param sequences: the nucleotide sequences to search
+    :type sequences: Iterable[str]
+
+    :param processes: the maximum number of worker processes to use (defaults to the CPU count)
+    :type processes: int
+
+    :param chunk_size: the number of sequences sent to a worker process at a time
+    :type chunk_size: int
+
+    :return: a list of ORF lists
+    :rtype: List[List[dict]]
+
+    """
+    sequences = list(sequences)
+
+    if len(sequences) <= chunk_size or processes == 1:
+        return [find_orfs(sequence) for sequence in sequences]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(find_orfs, sequences, chunksize=chunk_size))
+
+
+async def initialize_ncbi_blast(settings, session, sequence):
     """
     Send a request to NCBI to BLAST the passed sequence. Return the RID and RTOE from the response.
 
     :param settings: the application settings object
     :type settings: :class:`virtool.app_settings.Settings`
 
+    :param session: the application HTTP client session
+    :type session: :class:`aiohttp.ClientSession`
+
     :param sequence: the nucleotide sequence to BLAST
     :type sequence: str
 
@@ -296,13 +497,12 @@ async def initialize_ncbi_blast(settings, sequence):
         "QUERY": sequence,
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with virtool.http.proxy.ProxyRequest(settings, session.post, BLAST_URL, params=params, data=data) as resp:
-            if resp.status != 200:
-                raise virtool.errors.NCBIError("BLAST request returned status: {}".format(resp.status))
+    async with virtool.http.proxy.ProxyRequest(settings, session.post, BLAST_URL, params=params, data=data) as resp:
+        if resp.status != 200:
+            raise virtool.errors.NCBIError("BLAST request returned status: {}".format(resp.status))
 
-            # Extract and return the RID and RTOE from the QBlastInfo tag.
-            return extract_blast_info(await resp.text())
+        # Extract and return the RID and RTOE from the QBlastInfo tag.
+        return extract_blast_info(await resp.text())
 
 
 def extract_blast_info(html):
@@ -327,16 +527,54 @@ def extract_blast_info(html):
     return rid, int(rtoe)
 
 
-async def check_rid(settings, rid):
+def compose_blast_query(sequences):
     """
-    Check if the BLAST process identified by the passed RID is ready.
+    Compose a multi-FASTA BLAST query from a dict of sequences keyed by their NuVs sequence index. Queries are ordered
+    by sequence index, so results can be matched back to sequences by position.
 
-    :param rid: the RID to check
-    :type rid: str
+    :param sequences: nucleotide sequences keyed by sequence index
+    :type sequences: dict
+
+    :return: a multi-FASTA query
+    :rtype: str
+
+    """
+    return "\n".join(">{}\n{}".format(index, sequences[index]) for index in sorted(sequences))
+
+
+async def initialize_ncbi_blast_many(settings, session, sequences):
+    """
+    Send a single request to NCBI to BLAST several sequences. Return the RID and RTOE from the response.
 
     :param settings: the application settings object
     :type settings: :class:`virtool.app_settings.Settings`
 
+    :param session: the application HTTP client session
+    :type session: :class:`aiohttp.ClientSession`
+
+    :param sequences: nucleotide sequences keyed by sequence index
+    :type sequences: dict
+
+    :return: the RID and RTOE for the request
+    :rtype: Coroutine[tuple]
+
+    """
+    return await initialize_ncbi_blast(settings, session, compose_blast_query(sequences))
+
+
+async def check_rid(settings, session, rid):
+    """
+    Check if the BLAST process identified by the passed RID is ready.
+
+    :param settings: the application settings object
+    :type settings: :class:`virtool.app_settings.Settings`
+
+    :param session: the application HTTP client session
+    :type session: :class:`aiohttp.ClientSession`
+
+    :param rid: the RID to check
+    :type rid: str
+
     :return: ``True`` if ready, ``False`` otherwise
     :rtype: Coroutine[bool]
 
@@ -347,15 +585,14 @@ async def check_rid(settings, rid):
         "FORMAT_OBJECT": "SearchInfo"
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with virtool.http.proxy.ProxyRequest(settings, session.get, BLAST_URL, params=params) as resp:
-            if resp.status != 200:
-                raise virtool.errors.NCBIError("RID check request returned status {}".format(resp.status))
+    async with virtool.http.proxy.ProxyRequest(settings, session.get, BLAST_URL, params=params) as resp:
+        if resp.status != 200:
+            raise virtool.errors.NCBIError("RID check request returned status {}".format(resp.status))
 
-            return "Status=WAITING" not in await resp.text()
+        return "Status=WAITING" not in await resp.text()
 
 
-async def get_ncbi_blast_result(settings, rid):
+async def get_ncbi_blast_result(settings, session, rid):
     params = {
         "CMD": "Get",
         "RID": rid,
@@ -363,17 +600,80 @@ async def get_ncbi_blast_result(settings, rid):
         "FORMAT_OBJECT": "Alignment"
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with virtool.http.proxy.ProxyRequest(settings, session.get, BLAST_URL, params=params) as resp:
-            return parse_blast_content(await resp.read(), rid)
+    async with virtool.http.proxy.ProxyRequest(settings, session.get, BLAST_URL, params=params) as resp:
+        return parse_blast_content(await resp.read(), rid)
+
+
+async def get_ncbi_blast_result_many(settings, session, rid):
+    """
+    Get the results for a multi-query BLAST request. Results are returned in the order the queries were submitted.
+
+    :param settings: the application settings object
+    :type settings: :class:`virtool.app_settings.Settings`
+
+    :param session: the application HTTP client session
+    :type session: :class:`aiohttp.ClientSession`
+
+    :param rid: the RID of the BLAST request
+    :type rid: str
+
+    :return: one formatted BLAST result per query
+    :rtype: Coroutine[List[dict]]
+
+    """
+    params = {
+        "CMD": "Get",
+        "RID": rid,
+        "FORMAT_TYPE": "JSON2",
+        "FORMAT_OBJECT": "Alignment"
+    }
+
+    async with virtool.http.proxy.ProxyRequest(settings, session.get, BLAST_URL, params=params) as resp:
+        return parse_blast_content_many(await resp.read(), rid)
 
 
 def parse_blast_content(content, rid):
     zipped = zipfile.ZipFile(io.BytesIO(content))
     string = zipped.open(rid + "_1.json", "r").read().decode()
 
-    result = json.loads(string)
+    return parse_blast_report(json.loads(string))
 
+
+def parse_blast_content_many(content, rid):
+    """
+    Parse the zipped JSON2 content returned for a multi-query BLAST request. The archive contains an index file named
+    for the RID that lists one report file per query.
+
+    :param content: the zipped response content
+    :type content: bytes
+
+    :param rid: the RID of the BLAST request
+    :type rid: str
+
+    :return: one formatted BLAST result per query, in query order
+    :rtype: List[dict]
+
+    """
+    zipped = zipfile.ZipFile(io.BytesIO(content))
+
+    index = json.loads(zipped.open(rid + ".json", "r").read().decode())
+
+    reports = [json.loads(zipped.open(entry["File"], "r").read().decode()) for entry in index["BlastJSON"]]
+
+    return [parse_blast_report(report) for report in reports]
+
+
+def parse_blast_report(result):
+    """
+    Format a single decoded JSON2 BLAST report for storage in a NuVs analysis.
+
+    :param result: the decoded report
+    :type result: dict
+
+    :return: the formatted BLAST result
+    :rtype: dict
+
+    """
     if len(result) != 1:
         raise virtool.errors.NCBIError("Unexpected BLAST result count {} returned".format(len(result)))
 
@@ -419,47 +719,3 @@ def parse_blast_content(content, rid):
         output["hits"].append(cleaned)
 
     return output
-
-
-async def wait_for_blast_result(db, settings, analysis_id, sequence_index, rid):
-    """
-    Retrieve the Genbank data associated with the given accession and transform it into a Virtool-format sequence
-    document.
-
-    """
-    try:
-        ready = False
-        interval = 3
-
-        while not ready:
-            await asyncio.sleep(interval)
-
-            # Do this before checking RID for more accurate time.
-            last_checked_at = virtool.utils.timestamp()
-
-            ready = await check_rid(settings, rid)
-
-            update = {
-                "interval": interval,
-                "last_checked_at": last_checked_at,
-                "ready": ready,
-                "rid": rid
-            }
-
-            interval += 5
-
-            if update["ready"]:
-                update["result"] = await get_ncbi_blast_result(settings, rid)
-
-            await db.analyses.update_one({"_id": analysis_id, "results.index": sequence_index}, {
-                "$set": {
-                    "results.$.blast": update
-                }
-            })
-    except asyncio.CancelledError:
-        # Remove the BLAST record from the sequence if the server is shutdown.
-        await db.analyses.update_one({"_id": analysis_id, "results.index": sequence_index}, {
-            "$set": {
-                "results.$.blast": None
-            }
-        })
@@ -0,0 +1,322 @@
+"""
+Polls NCBI for the status of BLAST requests made for NuVs sequences.
+
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import zipfile
+
+import aiohttp
+
+import virtool.analyses
+import virtool.bio
+import virtool.errors
+import virtool.utils
+
+logger = logging.getLogger(__name__)
+
+#: The number of seconds to wait before first checking a new RID.
+INITIAL_INTERVAL = 3
+
+#: The number of seconds added to the check interval for a RID each time it is found to still be waiting.
+INTERVAL_INCREMENT = 5
+
+#: The longest interval in seconds between checks of a single RID.
+MAX_INTERVAL = 120
+
+
+class Poller:
+    """
+    Checks all outstanding BLAST RIDs from a single coroutine.
+
+    Pending RIDs are kept in a heap ordered by the time they are next due to be checked. Every ``tick`` seconds, at most
+    ``max_checks`` due RIDs are checked against NCBI. Analysis documents are only updated when a RID becomes ready.
+
+    Pending RIDs are stored in the analysis documents themselves, so they are picked up again by :meth:`load` when the
+    server restarts.
+
+    Completed results are stored in ``cache`` keyed by sequence if one is provided.
+
+    """
+
+    def __init__(self, loop, db, settings, session, cache=None, tick=3, max_checks=5):
+        self.loop = loop
+        self.db = db
+        self.settings = settings
+        self.session = session
+        self.cache = cache
+        self.tick = tick
+        self.max_checks = max_checks
+
+        #: A heap of ``(due, count, analysis_id, sequence_indexes, rid, interval)`` tuples.
+        self._heap = list()
+
+        #: Breaks ties between heap entries that are due at the same time.
+        self._counter = itertools.count()
+
+        #: The current RID for each ``(analysis_id, sequence_index)``. Heap entries with other RIDs are stale.
+        self._rids = dict()
+
+    @property
+    def pending_count(self):
+        return len(self._rids)
+
+    def add(self, analysis_id, sequence_index, rid, interval=INITIAL_INTERVAL):
+        """
+        Schedule a check of ``rid`` in ``interval`` seconds. Replaces any RID already pending for the sequence.
+
+        :param analysis_id: the id of the NuVs analysis
+        :type analysis_id: str
+
+        :param sequence_index: the index of the sequence in the analysis results
+        :type sequence_index: int
+
+        :param rid: the BLAST RID
+        :type rid: str
+
+        :param interval: the number of seconds to wait before checking the RID
+        :type interval: int
+
+        """
+        self.add_many(analysis_id, [sequence_index], rid, interval)
+
+    def add_many(self, analysis_id, sequence_indexes, rid, interval=INITIAL_INTERVAL):
+        """
+        Schedule a check of a multi-query ``rid`` shared by several sequences in ``interval`` seconds. The queries in the
+        request must be ordered by sequence index (see :func:`virtool.bio.compose_blast_query`). The sequence indexes
+        are also stored as ``queries`` in each sequence's BLAST record so the request can be resumed after a restart.
+
+        :param analysis_id: the id of the NuVs analysis
+        :type analysis_id: str
+
+        :param sequence_indexes: the indexes of the sequences in the analysis results
+        :type sequence_indexes: Iterable[int]
+
+        :param rid: the BLAST RID
+        :type rid: str
+
+        :param interval: the number of seconds to wait before checking the RID
+        :type interval: int
+
+        """
+        sequence_indexes = tuple(sorted(sequence_indexes))
+
+        for sequence_index in sequence_indexes:
+            self._rids[(analysis_id, sequence_index)] = rid
+
+        self._schedule(analysis_id, sequence_indexes, rid, interval)
+
+    def _schedule(self, analysis_id, sequence_indexes, rid, interval):
+        heapq.heappush(self._heap, (
+            self.loop.time() + interval,
+            next(self._counter),
+            analysis_id,
+            sequence_indexes,
+            rid,
+            interval
+        ))
+
+    def is_current(self, analysis_id, sequence_index, rid):
+        return self._rids.get((analysis_id, sequence_index)) == rid
+
+    async def load(self):
+        """
+        Schedule all BLAST requests that were still waiting when the server was last shut down. Nothing is scheduled
+        unless all of the analyses are read, so a failed load can be retried without scheduling RIDs twice.
+
+        """
+        cursor = self.db.analyses.find({"algorithm": "nuvs", "results.blast.ready": False}, [
+            "results.index",
+            "results.blast"
+        ])
+
+        rids = dict()
+        entries = list()
+
+        async for document in cursor:
+            analysis_id = document["_id"]
+
+            pending = dict()
+
+            for sequence in document["results"]:
+                blast = sequence.get("blast")
+
+                if blast and not blast["ready"]:
+                    rids[(analysis_id, sequence["index"])] = blast["rid"]
+
+                    # Multi-query requests store the indexes of all sequences submitted with them.
+                    queries = blast.get("queries", [sequence["index"]])
+
+                    pending[blast["rid"]] = (tuple(sorted(queries)), blast.get("interval", INITIAL_INTERVAL))
+
+            for rid, (sequence_indexes, interval) in pending.items():
+                entries.append((analysis_id, sequence_indexes, rid, interval))
+
+        self._rids.update(rids)
+
+        for entry in entries:
+            self._schedule(*entry)
+
+    async def run(self):
+        logger.debug("Started BLAST poller")
+
+        try:
+            while True:
+                try:
+                    await self.load()
+                    break
+                except Exception:
+                    logger.exception("Could not load pending BLAST RIDs")
+
+                await asyncio.sleep(self.tick, loop=self.loop)
+
+            while True:
+                try:
+                    await self.poll()
+                except Exception:
+                    logger.exception("Error while polling BLAST RIDs")
+
+                await asyncio.sleep(self.tick, loop=self.loop)
+        except asyncio.CancelledError:
+            pass
+
+        logger.debug("Stopped BLAST poller")
+
+    async def poll(self):
+        """
+        Check up to ``max_checks`` RIDs that are due.
+
+        """
+        now = self.loop.time()
+
+        due = list()
+
+        while self._heap and self._heap[0][0] <= now and len(due) < self.max_checks:
+            _, _, analysis_id, sequence_indexes, rid, interval = heapq.heappop(self._heap)
+
+            # The complete list of indexes is kept so results can be matched to sequences by query position.
+            if any(self.is_current(analysis_id, i, rid) for i in sequence_indexes):
+                due.append((analysis_id, sequence_indexes, rid, interval))
+
+        if due:
+            await asyncio.gather(*[self.check(*entry) for entry in due])
+
+    async def check(self, analysis_id, sequence_indexes, rid, interval):
+        """
+        Check a single RID. Reschedule it if it is still waiting, otherwise attach the results to the analysis.
+
+        Unexpected errors are logged and the RID is rescheduled with a longer interval, so one bad RID never stops the
+        poller.
+
+        """
+        try:
+            await self._check(analysis_id, sequence_indexes, rid, interval)
+        except Exception:
+            logger.exception("Error while checking BLAST RID {}".format(rid))
+            self._schedule(analysis_id, sequence_indexes, rid, min(interval + INTERVAL_INCREMENT, MAX_INTERVAL))
+
+    async def _check(self, analysis_id, sequence_indexes, rid, interval):
+        next_interval = min(interval + INTERVAL_INCREMENT, MAX_INTERVAL)
+
+        # Do this before checking RID for more accurate time.
+        last_checked_at = virtool.utils.timestamp()
+
+        try:
+            ready = await virtool.bio.check_rid(self.settings, self.session, rid)
+
+            if not ready:
+                self._schedule(analysis_id, sequence_indexes, rid, next_interval)
+                return
+
+            if len(sequence_indexes) == 1:
+                results = [await virtool.bio.get_ncbi_blast_result(self.settings, self.session, rid)]
+            else:
+                results = await virtool.bio.get_ncbi_blast_result_many(self.settings, self.session, rid)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, virtool.errors.NCBIError) as err:
+            logger.warning("Could not check BLAST RID {}: {}".format(rid, err))
+            self._schedule(analysis_id, sequence_indexes, rid, next_interval)
+            return
+
+        except (zipfile.BadZipFile, KeyError, ValueError) as err:
+            # Expired or unknown RIDs are reported as ready but return content that can't be parsed. Retrying won't
+            # help, so the request is marked as failed.
+            logger.warning("Could not parse result for BLAST RID {}: {}".format(rid, err))
+            return await self.fail(analysis_id, sequence_indexes, rid, interval, last_checked_at)
+
+        if len(results) != len(sequence_indexes):
+            logger.warning("Expected {} results for BLAST RID {}. Got {}.".format(
+                len(sequence_indexes),
+                rid,
+                len(results)
+            ))
+
+        blast = {
+            "interval": interval,
+            "last_checked_at": last_checked_at,
+            "ready": True,
+            "rid": rid
+        }
+
+        await self._set_results(analysis_id, rid, {i: dict(blast, result=r) for i, r in zip(sequence_indexes, results)})
+
+        # Queries without a report will never get one, so they are marked as failed rather than left waiting.
+        missing = sequence_indexes[len(results):]
+
+        if missing:
+            await self.fail(analysis_id, missing, rid, interval, last_checked_at)
+
+    async def fail(self, analysis_id, sequence_indexes, rid, interval, last_checked_at):
+        """
+        Mark the BLAST records for a RID whose result could not be retrieved as ready with an ``error`` and no result.
+
+        """
+        blast = {
+            "error": "Could not retrieve BLAST result",
+            "interval": interval,
+            "last_checked_at": last_checked_at,
+            "ready": True,
+            "result": None,
+            "rid": rid
+        }
+
+        await self._set_results(analysis_id, rid, {i: blast for i in sequence_indexes}, cache=False)
+
+    async def _set_results(self, analysis_id, rid, blasts, cache=True):
+        # Sequences may have been BLASTed again while the result was being retrieved.
+        blasts = {i: b for i, b in blasts.items() if self.is_current(analysis_id, i, rid)}
+
+        if not blasts:
+            return
+
+        document = await self.db.analyses.find_one(analysis_id, ["results.index", "results.sequence"])
+
+        if document is not None:
+            positions = virtool.analyses.get_nuvs_result_positions(document)
+
+            update = dict()
+
+            for sequence_index, blast in blasts.items():
+                try:
+                    position = positions[sequence_index]
+                except KeyError:
+                    continue
+
+                update["results.{}.blast".format(position)] = blast
+
+                if cache and self.cache is not None:
+                    await self.cache.set(document["results"][position]["sequence"].upper(), {
+                        "rid": rid,
+                        "result": blast["result"]
+                    })
+
+            if update:
+                await self.db.analyses.update_one({"_id": analysis_id}, {
+                    "$set": update
+                })
+
+        # Only forget the RID once the analysis is updated, so it is retried if updating fails.
+        for sequence_index in blasts:
+            del self._rids[(analysis_id, sequence_index)]
@@ -0,0 +1,429 @@
+"""
+Size-bounded caches. :class:`DiskCache` stores results retrieved from external services such as NCBI on disk.
+:class:`MemoryCache` holds recently used values in memory. :class:`OTUCache` combines the two to store patched otus.
+
+"""
+import asyncio
+import collections
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import aiofiles
+import bson.json_util
+
+#: The maximum size in bytes of the BLAST result cache.
+BLAST_MAX_SIZE = 256 * 1024 ** 2
+
+#: The number of seconds a cached BLAST result is used for (30 days).
+BLAST_TTL = 30 * 24 * 3600
+
+#: The maximum size in bytes of the GenBank record cache.
+GENBANK_MAX_SIZE = 64 * 1024 ** 2
+
+#: The number of seconds a cached GenBank record is used for (7 days).
+GENBANK_TTL = 7 * 24 * 3600
+
+#: The maximum number of patched otus held in memory.
+OTU_MEMORY_SIZE = 1000
+
+#: The maximum size in bytes of the on-disk patched otu cache.
+OTU_MAX_SIZE = 256 * 1024 ** 2
+
+#: The number of seconds a cached patched otu is used for (30 days).
+OTU_TTL = 30 * 24 * 3600
+
+#: Restore datetimes as naive UTC datetimes, matching those returned by Motor.
+OTU_JSON_OPTIONS = bson.json_util.JSONOptions(tz_aware=False)
+
+
+def get_cache_path(data_path, name):
+    return os.path.join(data_path, "cache", name)
+
+
+def hash_key(key):
+    """
+    Return the SHA-256 hex digest of ``key``. Used as the filename for the cache entry.
+
+    :param key: the cache key
+    :type key: str
+
+    :return: the hashed key
+    :rtype: str
+
+    """
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class DiskCache:
+    """
+    Stores JSON-serializable values in files named for the hash of their key.
+
+    Entries older than ``ttl`` seconds are ignored and removed when read. When the total size of the cache exceeds
+    ``max_size`` bytes, the least recently used entries are evicted. Recency is tracked using file modification times,
+    so it survives restarts.
+
+    Blocking filesystem calls are run in the default executor of ``loop``, so they don't hold up the event loop.
+
+    A cache with a ``path`` of ``None`` is disabled. It never returns a value and does not store anything.
+
+    """
+
+    def __init__(self, path, max_size, ttl, loop=None):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.loop = loop
+
+        #: Entry sizes keyed by hashed key, ordered from least to most recently used.
+        self._entries = None
+
+        #: The scan of existing cache files started by the first call to :meth:`_load`.
+        self._loading = None
+
+        self._size = 0
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    async def _run(self, func, *args):
+        loop = self.loop or asyncio.get_event_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def _load(self):
+        """
+        Index the existing cache files by modification time. Called lazily on first use. Concurrent calls share a
+        single scan of the cache directory.
+
+        """
+        if self._entries is not None:
+            return
+
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._run(self._scan))
+
+        stats = await self._loading
+
+        if self._entries is not None:
+            return
+
+        self._entries = collections.OrderedDict()
+
+        for _, hashed, size in sorted(stats):
+            self._entries[hashed] = size
+            self._size += size
+
+    def _scan(self):
+        os.makedirs(self.path, exist_ok=True)
+
+        stats = list()
+
+        for filename in os.listdir(self.path):
+            path = os.path.join(self.path, filename)
+
+            if filename.endswith(".json"):
+                stat = os.stat(path)
+                stats.append((stat.st_mtime, filename[:-5], stat.st_size))
+
+            # Remove temporary files left behind by writes that were interrupted.
+            elif filename.endswith(".tmp"):
+                _remove_files([path])
+
+        return stats
+
+    def _get_entry_path(self, hashed):
+        return os.path.join(self.path, hashed + ".json")
+
+    async def _remove(self, *hashed_keys):
+        for hashed in hashed_keys:
+            self._size -= self._entries.pop(hashed, 0)
+
+        await self._run(_remove_files, [self._get_entry_path(hashed) for hashed in hashed_keys])
+
+    async def _evict(self):
+        evicted = list()
+
+        size = self._size
+
+        for hashed, entry_size in self._entries.items():
+            if size <= self.max_size:
+                break
+
+            evicted.append(hashed)
+            size -= entry_size
+
+        if evicted:
+            await self._remove(*evicted)
+
+    def _write(self, path, content):
+        # Each write uses its own temporary file, so concurrent writes of the same key can't interfere.
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+
+            os.replace(temp_path, path)
+        except BaseException:
+            _remove_files([temp_path])
+            raise
+
+    async def get(self, key):
+        """
+        Get the value cached for ``key``.
+
+        :param key: the cache key
+        :type key: str
+
+        :return: the cached value or ``None`` if there is no fresh entry for the key
+        :rtype: Coroutine[Union[dict, list, None]]
+
+        """
+        if not self.enabled:
+            return None
+
+        await self._load()
+
+        hashed = hash_key(key)
+
+        if hashed not in self._entries:
+            return None
+
+        path = self._get_entry_path(hashed)
+
+        try:
+            async with aiofiles.open(path, "r") as f:
+                entry = json.loads(await f.read())
+        except (FileNotFoundError, ValueError):
+            await self._remove(hashed)
+            return None
+
+        if time.time() - entry["created_at"] > self.ttl:
+            await self._remove(hashed)
+            return None
+
+        # Mark the entry as most recently used.
+        self._entries.move_to_end(hashed)
+
+        try:
+            await self._run(os.utime, path)
+        except FileNotFoundError:
+            pass
+
+        return entry["value"]
+
+    async def set(self, key, value):
+        """
+        Cache ``value`` for ``key``, evicting the least recently used entries if the cache is full.
+
+        :param key: the cache key
+        :type key: str
+
+        :param value: a JSON-serializable value
+        :type value: Union[dict, list]
+
+        """
+        if not self.enabled:
+            return
+
+        await self._load()
+
+        hashed = hash_key(key)
+
+        content = json.dumps({
+            "created_at": time.time(),
+            "value": value
+        })
+
+        await self._run(self._write, self._get_entry_path(hashed), content)
+
+        self._size -= self._entries.pop(hashed, 0)
+        self._entries[hashed] = len(content)
+        self._size += len(content)
+
+        await self._evict()
+
+    async def delete(self, key):
+        """
+        Remove the entry for ``key`` if there is one.
+
+        :param key: the cache key
+        :type key: str
+
+        """
+        if not self.enabled:
+            return
+
+        await self._load()
+
+        await self._remove(hash_key(key))
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class MemoryCache:
+    """
+    A least recently used cache held in memory. Entries older than ``ttl`` seconds are ignored and removed when read.
+    When there are more than ``max_size`` entries, the least recently used are evicted.
+
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        #: ``(created_at, value)`` tuples keyed by cache key, ordered from least to most recently used.
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Get the value cached for ``key``.
+
+        :param key: the cache key
+        :type key: Hashable
+
+        :return: the cached value or ``None`` if there is no fresh entry for the key
+        :rtype: Any
+
+        """
+        try:
+            created_at, value = self._entries[key]
+        except KeyError:
+            return None
+
+        if time.monotonic() - created_at > self.ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+
+        return value
+
+    def set(self, key, value):
+        """
+        Cache ``value`` for ``key``, evicting the least recently used entry if the cache is full.
+
+        :param key: the cache key
+        :type key: Hashable
+
+        :param value: the value to cache
+        :type value: Any
+
+        """
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic(), value)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class OTUCache:
+    """
+    Stores patched, joined otus keyed by otu id and version. Recently used otus are held in a :class:`MemoryCache`.
+    All cached otus are also written to a :class:`DiskCache` at ``path`` so they survive restarts. The disk tier is
+    disabled if ``path`` is ``None``.
+
+    An otu version does not change once it is written, so entries only need to be removed when a change is reverted
+    and the version can be written again. Disk entries are namespaced by ``namespace`` so that entries written for
+    another database or before a data migration are not used.
+
+    Cached otus are copied when they are stored and retrieved so callers can modify them.
+
+    """
+
+    def __init__(self, path=None, namespace="", memory_size=OTU_MEMORY_SIZE, max_size=OTU_MAX_SIZE, ttl=OTU_TTL,
+                 loop=None):
+        self.namespace = namespace
+        self.memory = MemoryCache(memory_size, ttl)
+        self.disk = DiskCache(path, max_size, ttl, loop=loop)
+
+    def _get_key(self, otu_id, version):
+        return "{}.{}".format(otu_id, version)
+
+    async def get(self, otu_id, version):
+        """
+        Get the cached otu for ``otu_id`` and ``version``.
+
+        :param otu_id: the id of the otu
+        :type otu_id: str
+
+        :param version: the otu version
+        :type version: int
+
+        :return: a copy of the cached otu or ``None`` if it is not cached
+        :rtype: Coroutine[Union[dict, None]]
+
+        """
+        key = self._get_key(otu_id, version)
+
+        otu = self.memory.get(key)
+
+        if otu is None:
+            value = await self.disk.get(self.namespace + key)
+
+            if value is None:
+                return None
+
+            # Values are stored as MongoDB extended JSON so datetimes are restored.
+            otu = bson.json_util.loads(json.dumps(value), json_options=OTU_JSON_OPTIONS)
+
+            self.memory.set(key, otu)
+
+        return copy.deepcopy(otu)
+
+    async def set(self, otu_id, version, otu):
+        """
+        Cache ``otu`` as the joined otu for ``otu_id`` at ``version``.
+
+        :param otu_id: the id of the otu
+        :type otu_id: str
+
+        :param version: the otu version
+        :type version: int
+
+        :param otu: the joined otu
+        :type otu: dict
+
+        """
+        key = self._get_key(otu_id, version)
+
+        self.memory.set(key, copy.deepcopy(otu))
+
+        if self.disk.enabled:
+            value = json.loads(bson.json_util.dumps(otu, json_options=OTU_JSON_OPTIONS))
+            await self.disk.set(self.namespace + key, value)
+
+    async def delete(self, otu_id, version):
+        """
+        Remove the cached otu for ``otu_id`` and ``version``. Called when the version is reverted.
+
+        :param otu_id: the id of the otu
+        :type otu_id: str
+
+        :param version: the otu version
+        :type version: int
+
+        """
+        key = self._get_key(otu_id, version)
+
+        self.memory.delete(key)
+        await self.disk.delete(self.namespace + key)
@@ -1,5 +1,4 @@
 import aiofiles
-import asyncio
 import json
 
 import virtool.analyses
@@ -92,13 +91,9 @@ async def format_pathoscope(db, settings, document):
 
     formatted = dict()
 
-    otu_specifiers = {(hit["otu"]["id"], hit["otu"]["version"]) for hit in document["diagnosis"]}
+    manifest = {hit["otu"]["id"]: hit["otu"]["version"] for hit in document["diagnosis"]}
 
-    patched_otus = await asyncio.gather(*[
-          virtool.db.history.patch_to_version(db, otu_id, version) for otu_id, version in otu_specifiers
-    ])
-
-    patched_otus = {patched["_id"]: patched for _, patched, _ in patched_otus}
+    patched_otus = await virtool.db.history.patch_many_to_version(db, manifest)
 
     for hit in document["diagnosis"]:
 
@@ -264,28 +259,40 @@ async def new(app, sample_id, ref_id, user_id, algorithm):
     return document
 
 
-async def update_nuvs_blast(db, settings, analysis_id, sequence_index, rid):
+async def update_nuvs_blast(db, settings, session, analysis_id, sequence_index, rid, result=None):
     """
-    Update the BLAST data for a sequence in a NuVs analysis.
+    Update the BLAST data for a sequence in a NuVs analysis. If a ``result`` is passed, for example from the BLAST
+    cache, the BLAST data is marked ready and NCBI is not contacted.
 
-    :param settings:
     :param db:
+    :param settings:
+    :param session:
 
     :param analysis_id:
     :param sequence_index:
     :param rid:
+    :param result:
 
     :return: the blast data and the complete analysis document
     :rtype: Tuple[dict, dict]
 
     """
-    # Do initial check of RID to populate BLAST embedded document.
-    data = {
-        "rid": rid,
-        "ready": await virtool.bio.check_rid(settings, rid),
-        "last_checked_at": virtool.utils.timestamp(),
-        "interval": 3
-    }
+    if result is None:
+        # Do initial check of RID to populate BLAST embedded document.
+        data = {
+            "rid": rid,
+            "ready": await virtool.bio.check_rid(settings, session, rid),
+            "last_checked_at": virtool.utils.timestamp(),
+            "interval": 3
+        }
+    else:
+        data = {
+            "rid": rid,
+            "ready": True,
+            "last_checked_at": virtool.utils.timestamp(),
+            "interval": 3,
+            "result": result
+        }
 
     document = await db.analyses.find_one_and_update({"_id": analysis_id, "results.index": sequence_index}, {
         "$set": {
@@ -294,3 +301,103 @@ async def update_nuvs_blast(db, settings, analysis_id, sequence_index, rid):
     })
 
     return data, document
+
+
+async def update_nuvs_blast_many(db, settings, session, analysis_id, sequence_indexes, rid):
+    """
+    Update the BLAST data for several sequences in a NuVs analysis that were submitted to NCBI as a single multi-query
+    request identified by ``rid``.
+
+    :param db: the application database interface
+    :type db: :class:`virtool.db.iface.DB`
+
+    :param settings: the application settings object
+    :type settings: :class:`virtool.app_settings.Settings`
+
+    :param session: the application HTTP client session
+    :type session: :class:`aiohttp.ClientSession`
+
+    :param analysis_id: the id of the NuVs analysis
+    :type analysis_id: str
+
+    :param sequence_indexes: the indexes of the submitted sequences
+    :type sequence_indexes: List[int]
+
+    :param rid: the RID of the multi-query request
+    :type rid: str
+
+    :return: the blast data and the complete analysis document
+    :rtype: Tuple[dict, dict]
+
+    """
+    sequence_indexes = sorted(sequence_indexes)
+
+    data = {
+        "rid": rid,
+        "ready": await virtool.bio.check_rid(settings, session, rid),
+        "last_checked_at": virtool.utils.timestamp(),
+        "interval": 3,
+        "queries": sequence_indexes
+    }
+
+    document = await set_nuvs_blast(db, analysis_id, {i: data for i in sequence_indexes})
+
+    return data, document
+
+
+async def apply_cached_nuvs_blast(db, analysis_id, cached):
+    """
+    Attach cached BLAST results to several sequences in a NuVs analysis in a single write.
+
+    :param db: the application database interface
+    :type db: :class:`virtool.db.iface.DB`
+
+    :param analysis_id: the id of the NuVs analysis
+    :type analysis_id: str
+
+    :param cached: cached ``rid`` and ``result`` dicts keyed by sequence index
+    :type cached: dict
+
+    :return: the blast data keyed by sequence index and the complete analysis document
+    :rtype: Tuple[dict, dict]
+
+    """
+    timestamp = virtool.utils.timestamp()
+
+    data = {i: {
+        "rid": entry["rid"],
+        "ready": True,
+        "last_checked_at": timestamp,
+        "interval": 3,
+        "result": entry["result"]
+    } for i, entry in cached.items()}
+
+    document = await set_nuvs_blast(db, analysis_id, data)
+
+    return data, document
+
+
+async def set_nuvs_blast(db, analysis_id, data):
+    """
+    Set the BLAST data for several sequences in a NuVs analysis with a single update.
+
+    :param db: the application database interface
+    :type db: :class:`virtool.db.iface.DB`
+
+    :param analysis_id: the id of the NuVs analysis
+    :type analysis_id: str
+
+    :param data: BLAST data keyed by sequence index
+    :type data: dict
+
+    :return: the complete analysis document
+    :rtype: Coroutine[dict]
+
+    """
+    document = await db.analyses.find_one(analysis_id, ["results.index"])
+
+    positions = virtool.analyses.get_nuvs_result_positions(document)
+
+    return await db.analyses.find_one_and_update({"_id": analysis_id}, {
+        "$set": {"results.{}.blast".format(positions[i]): blast for i, blast in data.items()}
+    })
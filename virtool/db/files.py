@@ -24,8 +24,8 @@ PROJECTION = [
 async def create(db, filename, file_type, user_id=None):
     file_id = None
 
-    while file_id is None or file_id in await db.files.distinct("_id"):
-        file_id = "{}-{}".format(await virtool.db.utils.get_new_id(db.files), filename)
+    while file_id is None or await virtool.db.utils.id_exists(db.files, file_id):
+        file_id = "{}-{}".format(virtool.utils.random_alphanumeric(length=8), filename)
 
     uploaded_at = virtool.utils.timestamp()
 
@@ -1,7 +1,6 @@
+from collections import defaultdict
 from copy import deepcopy
 
-import dictdiffer
-
 import virtool.db.otus
 import virtool.errors
 import virtool.otus
@@ -111,6 +110,9 @@ async def add(db, method_name, old, new, description, user_id):
     else:
         document["diff"] = virtool.history.calculate_diff(old, new)
 
+        if otu_version % virtool.history.SNAPSHOT_INTERVAL == 0:
+            document["snapshot"] = new
+
     await db.history.insert_one(document)
 
     return document
@@ -191,8 +193,7 @@ async def patch_to_verified(db, otu_id):
             return None
 
         else:
-            diff = dictdiffer.swap(change["diff"])
-            patched = dictdiffer.patch(diff, patched)
+            patched = virtool.history.revert_diff(patched, change["diff"])
 
         if patched["verified"]:
             return patched
@@ -201,7 +202,7 @@ async def patch_to_verified(db, otu_id):
 async def patch_to_version(db, otu_id, version):
     """
     Take a joined otu back in time to the passed ``version``. Uses the diffs in the change documents associated with
-    the otu.
+    the otu, starting from the nearest full copy of the otu (see :data:`virtool.history.SNAPSHOT_INTERVAL`).
 
     :param db: the application database client
     :type db: :class:`~motor.motor_asyncio.AsyncIOMotorClient`
@@ -224,24 +225,17 @@ async def patch_to_version(db, otu_id, version):
     if "version" in current and current["version"] == version:
         return current, deepcopy(current), reverted_history_ids
 
-    patched = deepcopy(current)
-
-    # Sort the changes by descending timestamp.
-    async for change in db.history.find({"otu.id": otu_id}, sort=[("otu.version", -1)]):
-        if change["otu"]["version"] == "removed" or change["otu"]["version"] > version:
-            reverted_history_ids.append(change["_id"])
+    query = virtool.history.compose_reverted_query(otu_id, version)
 
-            if change["method_name"] == "remove":
-                patched = change["diff"]
+    # Sort the changes by descending version.
+    async for change in db.history.find(query, ["_id"], sort=[("otu.version", -1)]):
+        reverted_history_ids.append(change["_id"])
 
-            elif change["method_name"] == "create":
-                patched = None
+    patched = await db.otu_cache.get(otu_id, version)
 
-            else:
-                diff = dictdiffer.swap(change["diff"])
-                patched = dictdiffer.patch(diff, patched)
-        else:
-            break
+    if patched is None:
+        patched = await patch_from_nearest(db, otu_id, version, current)
+        await cache_patched(db, otu_id, version, patched)
 
     if current == {}:
         current = None
@@ -249,6 +243,290 @@ async def patch_to_version(db, otu_id, version):
     return current, patched, reverted_history_ids
 
 
+async def cache_patched(db, otu_id, version, patched):
+    """
+    Store a patched otu in the otu cache. The otu is not cached if it didn't exist at ``version``.
+
+    """
+    if patched is not None and patched.get("version") == version:
+        await db.otu_cache.set(otu_id, version, patched)
+
+
+async def get_nearest_snapshot(db, otu_id, version, current):
+    """
+    Find the full copy of the otu with the version closest to ``version``. The current otu, the otu stored by its
+    removal change, and the snapshots stored in its change documents are considered.
+
+    :param db: the application database client
+    :type db: :class:`~motor.motor_asyncio.AsyncIOMotorClient`
+
+    :param otu_id: the id of the otu
+    :type otu_id: str
+
+    :param version: the target version
+    :type version: int
+
+    :param current: the current joined otu or an empty dict if it has been removed
+    :type current: dict
+
+    :return: the version and joined otu of the nearest snapshot or ``(None, None)``
+    :rtype: Coroutine[tuple]
+
+    """
+    snapshots = dict()
+
+    if current:
+        snapshots[current["version"]] = None
+    else:
+        removal = await db.history.find_one({"otu.id": otu_id, "otu.version": "removed"})
+
+        if removal:
+            snapshots[removal["diff"]["version"]] = removal["diff"]
+
+    for before in (True, False):
+        change = await db.history.find_one(
+            virtool.history.compose_snapshot_query(otu_id, version, before),
+            ["otu"],
+            sort=[("otu.version", -1 if before else 1)]
+        )
+
+        if change:
+            snapshots.setdefault(change["otu"]["version"], change["_id"])
+
+    nearest = virtool.history.get_nearest(version, snapshots)
+
+    if nearest is None:
+        return None, None
+
+    snapshot = snapshots[nearest]
+
+    if snapshot is None:
+        return nearest, deepcopy(current)
+
+    if isinstance(snapshot, dict):
+        return nearest, snapshot
+
+    # Only fetch the full change document once it is known to be the nearest snapshot.
+    return nearest, virtool.history.get_snapshot(await db.history.find_one(snapshot))
+
+
+async def patch_from_nearest(db, otu_id, version, current):
+    """
+    Patch the nearest full copy of the otu (see :func:`get_nearest_snapshot`) forward or backward to ``version``. The
+    number of diffs applied depends only on the distance to the nearest snapshot.
+
+    :param db: the application database client
+    :type db: :class:`~motor.motor_asyncio.AsyncIOMotorClient`
+
+    :param otu_id: the id of the otu
+    :type otu_id: str
+
+    :param version: the target version
+    :type version: int
+
+    :param current: the current joined otu or an empty dict if it has been removed
+    :type current: dict
+
+    :return: the otu at ``version`` or ``None`` if it did not exist at that version
+    :rtype: Coroutine[Union[dict, None]]
+
+    """
+    snapshot_version, snapshot = await get_nearest_snapshot(db, otu_id, version, current)
+
+    if snapshot is None:
+        return deepcopy(current)
+
+    if snapshot_version > version:
+        query = virtool.history.compose_range_query(otu_id, version, snapshot_version)
+        changes = db.history.find(query, sort=[("otu.version", -1)])
+        return virtool.history.patch_backward(snapshot, [change async for change in changes])
+
+    query = virtool.history.compose_range_query(otu_id, snapshot_version, version)
+    changes = db.history.find(query, sort=[("otu.version", 1)])
+
+    return virtool.history.patch_forward(snapshot, [change async for change in changes])
+
+
+async def patch_many_to_version(db, manifest):
+    """
+    Patch many otus to the versions in ``manifest``. The current otus, their sequences, the versions of their stored
+    full copies, and the changes needed to patch them are each fetched with a single query. Patching is done in memory
+    from the nearest full copy of each otu, as in :func:`patch_to_version`. Otus found in the otu cache are not
+    queried at all.
+
+    :param db: the application database client
+    :type db: :class:`~motor.motor_asyncio.AsyncIOMotorClient`
+
+    :param manifest: the versions to patch to keyed by otu id
+    :type manifest: dict
+
+    :return: the patched otus keyed by otu id
+    :rtype: Coroutine[dict]
+
+    """
+    cached = dict()
+
+    for otu_id, version in manifest.items():
+        otu = await db.otu_cache.get(otu_id, version)
+
+        if otu is not None:
+            cached[otu_id] = otu
+
+    manifest = {otu_id: version for otu_id, version in manifest.items() if otu_id not in cached}
+
+    if not manifest:
+        return cached
+
+    patched, pending = await _patch_many_to_version(db, manifest)
+
+    # Current otus can still be changed without a version bump (eg. ``verified``), so only past versions are cached.
+    for otu_id in pending:
+        await cache_patched(db, otu_id, manifest[otu_id], patched[otu_id])
+
+    return dict(cached, **patched)
+
+
+async def _patch_many_to_version(db, manifest):
+    """
+    Patch the otus in ``manifest`` without using the otu cache. Returns the patched otus keyed by otu id and the ids
+    of the otus that were not already at the requested version.
+
+    """
+    otu_ids = list(manifest)
+
+    otus = {document["_id"]: document async for document in db.otus.find({"_id": {"$in": otu_ids}})}
+
+    sequences = defaultdict(list)
+
+    async for sequence in db.sequences.find({"otu_id": {"$in": list(otus)}}):
+        sequences[sequence["otu_id"]].append(sequence)
+
+    patched = {otu_id: virtool.otus.merge_otu(otu, sequences[otu_id]) for otu_id, otu in otus.items()}
+
+    pending = [otu_id for otu_id in otu_ids if otu_id not in otus or otus[otu_id]["version"] != manifest[otu_id]]
+
+    if not pending:
+        return patched, pending
+
+    # The versions at which a full copy of each otu is available. Values are the ids of the changes storing the copies
+    # or ``None`` for the current otu.
+    snapshots = defaultdict(dict)
+
+    for otu_id in pending:
+        if otu_id in otus:
+            snapshots[otu_id][otus[otu_id]["version"]] = None
+
+    cursor = db.history.find({
+        "otu.id": {"$in": pending},
+        "$or": [
+            {"method_name": {"$in": ["create", "remove"]}},
+            {"snapshot": {"$exists": True}}
+        ]
+    }, ["otu", "method_name", "diff.version"])
+
+    async for change in cursor:
+        otu_id = change["otu"]["id"]
+
+        if change["method_name"] == "remove":
+            snapshots[otu_id][change["diff"]["version"]] = change["_id"]
+        else:
+            snapshots[otu_id].setdefault(change["otu"]["version"], change["_id"])
+
+    starts = dict()
+    change_ids = set()
+
+    for otu_id in pending:
+        start = virtool.history.get_nearest(manifest[otu_id], snapshots[otu_id])
+
+        if start is None:
+            patched[otu_id] = None
+            continue
+
+        starts[otu_id] = start
+
+        if snapshots[otu_id][start] is not None:
+            change_ids.add(snapshots[otu_id][start])
+
+        change_ids.update(virtool.history.get_change_ids(otu_id, start, manifest[otu_id]))
+
+    changes = {change["_id"]: change async for change in db.history.find({"_id": {"$in": list(change_ids)}})}
+
+    for otu_id, start in starts.items():
+        version = manifest[otu_id]
+
+        snapshot_id = snapshots[otu_id][start]
+
+        if snapshot_id is None:
+            otu = patched[otu_id]
+        elif snapshot_id.endswith(".removed"):
+            otu = changes[snapshot_id]["diff"]
+        else:
+            otu = virtool.history.get_snapshot(changes[snapshot_id])
+
+        to_apply = [changes[i] for i in virtool.history.get_change_ids(otu_id, start, version) if i in changes]
+
+        if start > version:
+            patched[otu_id] = virtool.history.patch_backward(otu, to_apply)
+        else:
+            patched[otu_id] = virtool.history.patch_forward(otu, to_apply)
+
+    return patched, pending
+
+
+async def compact(db, otu_id, versions, keep):
+    """
+    Compact the changes for an otu with the given ``versions``. Runs of changes are folded into the last change in the
+    run or the next change with a version in ``keep``. The folded change stores a diff spanning the deleted changes
+    and a full copy of the otu, so the otu can still be patched to any kept version and patched or reverted through
+    later changes. See :func:`virtool.history.get_compaction_plan`.
+
+    The changes must all be included in builds. Unbuilt changes must not be compacted or they will no longer be
+    revertible.
+
+    :param db: the application database client
+    :type db: :class:`~motor.motor_asyncio.AsyncIOMotorClient`
+
+    :param otu_id: the id of the otu
+    :type otu_id: str
+
+    :param versions: the versions of the changes to compact
+    :type versions: Iterable[int]
+
+    :param keep: versions that must be kept
+    :type keep: Iterable[int]
+
+    :return: the number of deleted changes
+    :rtype: Coroutine[int]
+
+    """
+    folded, deleted = virtool.history.get_compaction_plan(versions, keep)
+
+    if not deleted:
+        return 0
+
+    # Patch to every version needed before any change is rewritten or deleted.
+    patched = dict()
+
+    for version in sorted({v for pair in folded for v in pair}):
+        _, patched[version], _ = await patch_to_version(db, otu_id, version)
+
+    for previous, version in folded:
+        await db.history.update_one({"_id": "{}.{}".format(otu_id, version)}, {
+            "$set": {
+                "diff": virtool.history.calculate_diff(patched[previous], patched[version]),
+                "snapshot": patched[version]
+            }
+        })
+
+    await db.history.delete_many({
+        "_id": {
+            "$in": ["{}.{}".format(otu_id, version) for version in deleted]
+        }
+    })
+
+    return len(deleted)
+
+
 async def revert(db, change_id):
     """
     Revert a history change given by the passed ``change_id``.
@@ -293,4 +571,11 @@ async def revert(db, change_id):
 
     await db.history.delete_many({"_id": {"$in": history_to_delete}})
 
+    # The reverted versions may be written again with different content.
+    for change_id in history_to_delete:
+        _, reverted_version = change_id.split(".")
+
+        if reverted_version != "removed":
+            await db.otu_cache.delete(otu_id, int(reverted_version))
+
     return patched
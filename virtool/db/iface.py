@@ -1,12 +1,20 @@
+import copy
+import functools
+import time
+
 import pymongo
 import pymongo.errors
+import pymongo.results
+from bson.son import SON
 
+import virtool.cache
 import virtool.db.analyses
 import virtool.db.files
 import virtool.db.history
 import virtool.db.hmm
 import virtool.db.indexes
 import virtool.db.jobs
+import virtool.db.metrics
 import virtool.db.otus
 import virtool.db.references
 import virtool.db.samples
@@ -16,6 +24,23 @@ import virtool.db.utils
 import virtool.errors
 import virtool.utils
 
+#: The maximum number of documents sent in a single ``update_many`` message.
+NOTIFICATION_BATCH_SIZE = 100
+
+#: The default number of operations sent in each ``bulk_write`` call by :class:`BulkWriter`.
+BULK_BATCH_SIZE = 500
+
+#: The maximum number of documents a single write will send notifications for when batched notifications are enabled.
+#: When more documents are changed, a single ``refetch`` message is sent instead, telling clients to request the
+#: collection again.
+NOTIFICATION_LIMIT = 1000
+
+#: The maximum number of documents held in the cache of each cached collection.
+DOCUMENT_CACHE_SIZE = 1000
+
+#: The number of seconds a cached document is used for. Limits staleness caused by writes from other processes.
+DOCUMENT_CACHE_TTL = 60
+
 COLLECTION_NAMES = [
     "analyses",
     "files",
@@ -38,9 +63,144 @@ COLLECTION_NAMES = [
 ]
 
 
+def get_cache_key(query):
+    """
+    Return the ``_id`` a :meth:`~Collection.find_one` query can be served from the document cache with. Queries can be
+    a plain id or a dict with an ``_id`` and other simple equality conditions. Returns ``None`` for other queries.
+
+    Conditions on ``None`` or booleans are not served from the cache. Mongo matches missing fields with ``None`` and
+    does not consider ``True`` equal to ``1``, which :func:`match_query` does not reproduce.
+
+    :param query: a Mongo query
+    :type query: Union[dict, str]
+
+    :return: the document id or ``None``
+    :rtype: Union[str, None]
+
+    """
+    if isinstance(query, str):
+        return query
+
+    if not isinstance(query, dict) or not isinstance(query.get("_id"), str):
+        return None
+
+    for key, value in query.items():
+        if key.startswith("$") or value is None or isinstance(value, (bool, dict, list)):
+            return None
+
+    return query["_id"]
+
+
+def match_query(document, query):
+    """
+    Check if ``document`` matches a query accepted by :func:`get_cache_key`. Dotted keys are followed into nested
+    documents and lists as they are in Mongo.
+
+    :param document: the document to check
+    :type document: dict
+
+    :param query: a Mongo query
+    :type query: Union[dict, str]
+
+    :return: whether the document matches
+    :rtype: bool
+
+    """
+    if isinstance(query, str):
+        return document["_id"] == query
+
+    return all(_match_path(document, key.split("."), value) for key, value in query.items())
+
+
+def _match_path(value, path, expected):
+    if isinstance(value, list):
+        return any(_match_path(item, path, expected) for item in value)
+
+    if not path:
+        return _equals(value, expected)
+
+    if not isinstance(value, dict) or path[0] not in value:
+        return False
+
+    child = value[path[0]]
+
+    if len(path) == 1 and isinstance(child, list) and any(_equals(item, expected) for item in child):
+        return True
+
+    return _match_path(child, path[1:], expected)
+
+
+def _equals(value, expected):
+    # Booleans are not equal to numbers in Mongo.
+    return value == expected and isinstance(value, bool) is isinstance(expected, bool)
+
+
+def get_projection_dict(projection):
+    """
+    Return ``projection`` as a dict. List projections are converted to inclusion projections.
+
+    :param projection: a Mongo-style projection
+    :type projection: Union[dict, list]
+
+    :return: the projection as a dict
+    :rtype: dict
+
+    """
+    if isinstance(projection, dict):
+        return projection
+
+    return {field: True for field in projection}
+
+
+def timed(operation, get_count=None, log_query=True):
+    """
+    Decorate a :class:`Collection` method so its latency and the number of documents it touched are recorded in the
+    collection's :class:`~virtool.db.metrics.Metrics`. The first argument passed to the method is logged as the query
+    for slow operations if ``log_query`` is ``True``.
+
+    :param operation: the operation name to record the method under
+    :type operation: str
+
+    :param get_count: a function that returns the number of documents touched given the method's return value
+    :type get_count: Union[Callable, None]
+
+    :param log_query: log the first argument as the query for slow operations
+    :type log_query: bool
+
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            if self.metrics is None:
+                return await func(self, *args, **kwargs)
+
+            start = time.monotonic()
+
+            result = await func(self, *args, **kwargs)
+
+            self.metrics.observe(
+                self.name,
+                operation,
+                time.monotonic() - start,
+                get_count(result) if get_count else None,
+                query=args[0] if args and log_query else None
+            )
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _count_document(result):
+    return 0 if result is None else 1
+
+
 class Collection:
 
-    def __init__(self, name, collection, dispatch, processor, projection, silent=False):
+    def __init__(self, name, collection, dispatch, processor, projection, silent=False, cache=None, metrics=None,
+                 batch_notifications=False):
         self.name = name
         self._collection = collection
         self.dispatch = dispatch
@@ -48,6 +208,19 @@ class Collection:
         self.projection = projection
         self.silent = silent
 
+        #: Dispatch ``update_many`` and ``refetch`` messages for writes affecting many documents. Otherwise, a message is
+        #: dispatched for each document, as understood by all clients.
+        self.batch_notifications = batch_notifications
+
+        #: A :class:`~virtool.cache.MemoryCache` of whole documents keyed by ``_id``. Used by :meth:`find_one`.
+        self.cache = cache
+
+        #: Incremented whenever cached documents are invalidated. Used to avoid caching documents read during a write.
+        self._cache_generation = 0
+
+        #: A :class:`~virtool.db.metrics.Metrics` object operations on the collection are recorded in.
+        self.metrics = metrics
+
         self.aggregate = self._collection.aggregate
         self.count = self._collection.count
         self.create_index = self._collection.create_index
@@ -55,32 +228,186 @@ class Collection:
         self.distinct = self._collection.distinct
         self.drop_index = self._collection.drop_index
         self.drop_indexes = self._collection.drop_indexes
-        self.find_one = self._collection.find_one
         self.find = self._collection.find
         self.insert_many = self._collection.insert_many
         self.rename = self._collection.rename
 
+        if cache is None:
+            self.find_one = self._collection.find_one
+
+        if metrics is not None:
+            self.aggregate = self._time_cursor("aggregate", self._collection.aggregate)
+            self.count = self._time_coroutine("count", self._collection.count)
+            self.distinct = self._time_coroutine("distinct", self._collection.distinct, len)
+            self.find = self._time_cursor("find", self._collection.find)
+            self.insert_many = self._time_coroutine("insert_many", self._collection.insert_many,
+                                                    lambda r: len(r.inserted_ids), log_query=False)
+
+            if cache is None:
+                self.find_one = self._time_coroutine("find_one", self._collection.find_one, _count_document)
+
+    def _time_coroutine(self, operation, method, get_count=None, log_query=True):
+        """
+        Wrap a Motor collection coroutine method so its latency is recorded in :attr:`metrics`. Arguments are the same
+        as for :func:`timed`.
+
+        """
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            start = time.monotonic()
+
+            result = await method(*args, **kwargs)
+
+            self.metrics.observe(
+                self.name,
+                operation,
+                time.monotonic() - start,
+                get_count(result) if get_count else None,
+                query=args[0] if args and log_query else None
+            )
+
+            return result
+
+        return wrapper
+
+    def _time_cursor(self, operation, method):
+        """
+        Wrap a Motor collection method that returns a cursor so the time taken to retrieve the results and the number
+        of documents returned are recorded in :attr:`metrics`.
+
+        """
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            query = args[0] if args else kwargs.get("filter")
+
+            def record(duration, count):
+                self.metrics.observe(self.name, operation, duration, count, query=query)
+
+            return virtool.db.metrics.TimedCursor(method(*args, **kwargs), record)
+
+        return wrapper
+
+    @timed("find_one", _count_document)
+    async def find_one(self, query=None, *args, **kwargs):
+        """
+        Find a single document. Used instead of :meth:`motor.motor_asyncio.AsyncIOMotorCollection.find_one` when the
+        collection is cached.
+
+        Queries by ``_id`` (see :func:`get_cache_key`) with no projection or a projection of top-level fields are
+        served from the cache. The whole document is cached on a miss. All other queries go to the database.
+
+        """
+        key = get_cache_key(query)
+
+        projection = kwargs.get("projection", args[0] if args else None)
+
+        cacheable = (
+            key is not None and
+            len(args) + len(kwargs) <= 1 and
+            (len(kwargs) == 0 or "projection" in kwargs) and
+            not (projection and any("." in field for field in projection))
+        )
+
+        if not cacheable:
+            return await self._collection.find_one(query, *args, **kwargs)
+
+        document = self.cache.get(key)
+
+        if document is None:
+            generation = self._cache_generation
+
+            document = await self._collection.find_one({"_id": key})
+
+            if document is None:
+                return None
+
+            if generation == self._cache_generation:
+                self.cache.set(key, document)
+
+        if not match_query(document, query):
+            return None
+
+        document = copy.deepcopy(document)
+
+        if projection:
+            return virtool.db.utils.apply_projection(document, copy.copy(projection))
+
+        return document
+
+    def invalidate(self, id_list=None):
+        """
+        Remove documents from the cache. The whole cache is cleared if ``id_list`` is not provided.
+
+        :param id_list: the ids of the changed documents
+        :type id_list: Union[list, None]
+
+        """
+        if self.cache is None:
+            return
+
+        self._cache_generation += 1
+
+        if id_list is None:
+            self.cache.clear()
+        else:
+            for document_id in id_list:
+                self.cache.delete(document_id)
+
+    async def _get_notification_ids(self, query):
+        """
+        Get the ids of the documents matching ``query`` for sending change notifications. Returns ``None`` if batched
+        notifications are enabled and more than :data:`NOTIFICATION_LIMIT` documents match.
+
+        """
+        if not self.batch_notifications:
+            return await self._collection.distinct("_id", query)
+
+        cursor = self._collection.find(query, ["_id"]).limit(NOTIFICATION_LIMIT + 1)
+
+        id_list = [document["_id"] async for document in cursor]
+
+        if len(id_list) > NOTIFICATION_LIMIT:
+            return None
+
+        return id_list
+
+    @timed("delete_many", lambda r: r.deleted_count)
     async def delete_many(self, query, silent=False):
-        id_list = await self.distinct("_id", query)
+        if silent or self.silent:
+            delete_result = await self._collection.delete_many(query)
+            self.invalidate()
+            return delete_result
+
+        id_list = await self._get_notification_ids(query)
 
         delete_result = await self._collection.delete_many(query)
 
-        if not silent and not self.silent and len(id_list):
+        self.invalidate(id_list)
+
+        if id_list is None:
+            await self.dispatch(self._collection.name, "refetch", None)
+
+        elif id_list:
             await self.dispatch(self._collection.name, "delete", id_list)
 
         return delete_result
 
+    @timed("delete_one", lambda r: r.deleted_count)
     async def delete_one(self, query, silent=False):
         document = await self._collection.find_one(query, ["_id"])
 
         delete_result = await self._collection.delete_one(query)
 
+        if document:
+            self.invalidate([document["_id"]])
+
         if not silent and not self.silent and document:
             id_list = [document["_id"]]
             await self.dispatch(self._collection.name, "delete", id_list)
 
         return delete_result
 
+    @timed("find_one_and_update", _count_document)
     async def find_one_and_update(self, query, update, projection=None, silent=False, upsert=False):
         document = await self._collection.find_one_and_update(
             query,
@@ -92,6 +419,8 @@ class Collection:
         if document is None:
             return None
 
+        self.invalidate([document["_id"]])
+
         if not silent and not self.silent:
             if self.projection:
                 projected = virtool.db.utils.apply_projection(document, self.projection)
@@ -104,30 +433,40 @@ class Collection:
 
         return document
 
+    @timed("insert_one", lambda r: 1, log_query=False)
     async def insert_one(self, document, silent=False):
+        """
+        Insert ``document`` and dispatch it. If the document has no ``_id``, a random one is generated. The insert is
+        retried with a new id if the generated id already exists, so no lookup is needed to find an unused id.
+
+        """
         generate_id = "_id" not in document
 
         if generate_id:
             document["_id"] = virtool.utils.random_alphanumeric(8)
 
-        try:
-            await self._collection.insert_one(document)
+        while True:
+            try:
+                await self._collection.insert_one(document)
+                break
+            except pymongo.errors.DuplicateKeyError:
+                if not generate_id:
+                    raise
 
-            if not silent and not self.silent:
-                if self.projection:
-                    projected = virtool.db.utils.apply_projection(document, self.projection)
-                    await self.dispatch(self.name, "insert", self.processor(projected))
-                else:
-                    await self.dispatch(self.name, "insert", self.processor(document))
+                document["_id"] = virtool.utils.random_alphanumeric(8)
 
-            return document
-        except pymongo.errors.DuplicateKeyError:
-            if generate_id:
-                document.pop("_id")
-                return await self._collection.insert_one(document)
+        self.invalidate([document["_id"]])
+
+        if not silent and not self.silent:
+            if self.projection:
+                projected = virtool.db.utils.apply_projection(document, self.projection)
+                await self.dispatch(self.name, "insert", self.processor(projected))
+            else:
+                await self.dispatch(self.name, "insert", self.processor(document))
 
-            raise
+        return document
 
+    @timed("replace_one", _count_document)
     async def replace_one(self, query, replacement, upsert=False):
         document = await self._collection.find_one_and_replace(
             query,
@@ -136,44 +475,309 @@ class Collection:
             upsert=upsert
         )
 
+        if "_id" in replacement:
+            self.invalidate([replacement["_id"]])
+        elif document:
+            self.invalidate([document["_id"]])
+        else:
+            self.invalidate()
+
         if not self.silent:
             await self.dispatch(self.name, "update", self.processor(replacement))
 
         return document
 
+    @timed("update_many", lambda r: r.matched_count)
     async def update_many(self, query, update, silent=False):
-        updated_ids = await self._collection.distinct("_id", query)
+        """
+        Update all documents matching ``query``. An ``update`` message is dispatched for each updated document.
+
+        If batched notifications are enabled, updated documents are dispatched in ``update_many`` messages of up to
+        :data:`NOTIFICATION_BATCH_SIZE` documents instead. If more than :data:`NOTIFICATION_LIMIT` documents are
+        updated, a single ``refetch`` message is dispatched.
+
+        """
+        if silent or self.silent:
+            update_result = await self._collection.update_many(query, update)
+            self.invalidate()
+            return update_result
+
+        id_list = await self._get_notification_ids(query)
 
         update_result = await self._collection.update_many(query, update)
 
-        if not silent and not self.silent:
-            async for document in self._collection.find({"_id": {"$in": updated_ids}}, projection=self.projection):
-                await self.dispatch(self.name, "update", self.processor(document))
+        self.invalidate(id_list)
+
+        if id_list is None:
+            await self.dispatch(self.name, "refetch", None)
+            return update_result
+
+        batch = list()
+
+        async for document in self._collection.find({"_id": {"$in": id_list}}, projection=self.projection):
+            batch.append(self.processor(document))
+
+            if len(batch) == NOTIFICATION_BATCH_SIZE:
+                await self._dispatch_updates(batch)
+                batch = list()
+
+        if batch:
+            await self._dispatch_updates(batch)
 
         return update_result
 
+    async def _dispatch_updates(self, documents):
+        await self._dispatch_documents("update", documents)
+
+    async def _dispatch_documents(self, operation, documents):
+        if len(documents) > 1 and self.batch_notifications:
+            return await self.dispatch(self.name, operation + "_many", documents)
+
+        for document in documents:
+            await self.dispatch(self.name, operation, document)
+
+    @timed("update_one", lambda r: r.matched_count)
     async def update_one(self, query, update, upsert=False, silent=False):
-        document = await self.find_one(query, ["_id"])
+        """
+        Update a single document and dispatch the updated document in one round trip to the database. Uses the
+        ``findAndModify`` command so whether a document was matched or upserted is known without further queries.
+
+        The returned :class:`~pymongo.results.UpdateResult` reports a ``modified_count`` equal to ``matched_count``
+        because ``findAndModify`` does not report whether the matched document changed.
+
+        """
+        command = SON([
+            ("findAndModify", self._collection.name),
+            ("query", query),
+            ("update", update),
+            ("new", True),
+            ("upsert", upsert)
+        ])
+
+        if self.projection:
+            command["fields"] = get_projection_dict(self.projection)
+
+        result = await self._collection.database.command(command)
 
-        update_result = await self._collection.update_one(query, update, upsert=upsert)
+        document = result.get("value")
 
         if document:
-            document = await self.find_one(document["_id"], projection=self.projection)
-        else:
-            document = await self.find_one(query, projection=self.projection)
+            self.invalidate([document["_id"]])
 
         if not silent and not self.silent and document:
             await self.dispatch(self.name, "update", self.processor(document))
 
-        return update_result
+        last_error = result.get("lastErrorObject", {})
+
+        raw_result = {
+            "n": last_error.get("n", 0),
+            "nModified": last_error.get("n", 0) if last_error.get("updatedExisting") else 0,
+            "ok": result.get("ok", 1.0)
+        }
+
+        if "upserted" in last_error:
+            raw_result["upserted"] = last_error["upserted"]
+
+        return pymongo.results.UpdateResult(raw_result, acknowledged=True)
+
+
+class BulkWriter:
+    """
+    Buffers writes to a :class:`Collection` and sends them to the database in ``bulk_write`` calls of up to
+    ``batch_size`` operations. Use :meth:`DB.bulk` to create one:
+
+    .. code-block:: python
+
+        async with db.bulk("otus") as batch:
+            for otu in otus:
+                await batch.insert_one(otu)
+
+    No messages are dispatched until the block exits. Then an ``insert`` or ``update`` message is dispatched for each
+    inserted or updated document. If batched notifications are enabled for the collection, the documents are
+    dispatched in ``insert_many`` and ``update_many`` messages instead, or a single ``refetch`` message if more than
+    :data:`NOTIFICATION_LIMIT` documents were written.
+
+    If the block raises an exception, buffered operations are discarded but notifications are still sent for the
+    operations that were already written.
+
+    """
+
+    def __init__(self, collection, batch_size=BULK_BATCH_SIZE, silent=False):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.silent = silent or collection.silent
+
+        #: Buffered ``(operation, query, document, generate_id)`` tuples. ``query`` is set for updates and replacements.
+        #: ``document`` is set for inserts.
+        self._operations = list()
+
+        #: Ids of inserted documents in insertion order.
+        self._inserted = dict()
+
+        #: Ids of updated and replaced documents in update order.
+        self._updated = dict()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.flush()
+
+        if not self.silent:
+            await self._dispatch()
+
+    async def insert_one(self, document):
+        """
+        Buffer the insertion of ``document``. An ``_id`` is generated if the document does not have one.
+
+        :param document: the document to insert
+        :type document: dict
+
+        :return: the document including its ``_id``
+        :rtype: dict
+
+        """
+        generate_id = "_id" not in document
+
+        if generate_id:
+            document["_id"] = virtool.utils.random_alphanumeric(8)
+
+        await self._add(pymongo.InsertOne(document), document=document, generate_id=generate_id)
+
+        return document
+
+    async def update_one(self, query, update, upsert=False):
+        """
+        Buffer an update of a single document.
+
+        """
+        await self._add(pymongo.UpdateOne(query, update, upsert=upsert), query=query)
+
+    async def replace_one(self, query, replacement, upsert=False):
+        """
+        Buffer the replacement of a single document.
+
+        """
+        await self._add(pymongo.ReplaceOne(query, replacement, upsert=upsert), query=query)
+
+    async def _add(self, operation, query=None, document=None, generate_id=False):
+        self._operations.append((operation, query, document, generate_id))
+
+        if len(self._operations) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """
+        Write all buffered operations to the database.
+
+        """
+        operations, self._operations = self._operations, list()
+
+        if not operations:
+            return
+
+        # The ids of documents matched by queries other than ``_id`` must be found before they are updated.
+        queries = [query for _, query, _, _ in operations if query is not None and not _is_id_query(query)]
+
+        matched_ids = list()
+
+        if queries and not self.silent:
+            matched_ids = await self.collection.distinct("_id", {"$or": queries})
+
+        upserted_ids = await self._bulk_write(operations)
+
+        self.collection.invalidate()
+
+        if self.silent:
+            return
+
+        for _, query, document, _ in operations:
+            if document is not None:
+                self._inserted[document["_id"]] = None
+            elif _is_id_query(query):
+                self._updated[query["_id"]] = None
+
+        for document_id in matched_ids + upserted_ids:
+            self._updated[document_id] = None
+
+    async def _bulk_write(self, operations):
+        """
+        Write ``operations`` in order. If an insert fails because its generated id collides with an existing document,
+        a new id is generated and writing resumes from that insert.
+
+        :return: the ids of upserted documents
+        :rtype: list
+
+        """
+        start = time.monotonic()
+
+        try:
+            result = await self.collection._collection.bulk_write([operation for operation, _, _, _ in operations])
+            self._observe(start, len(operations))
+            return list(result.upserted_ids.values())
+        except pymongo.errors.BulkWriteError as err:
+            error = err.details["writeErrors"][0]
+
+            self._observe(start, error["index"])
+
+            _, _, document, generate_id = operations[error["index"]]
+
+            if error["code"] != 11000 or not generate_id:
+                raise
+
+            document["_id"] = virtool.utils.random_alphanumeric(8)
+
+            upserted_ids = [upserted["_id"] for upserted in err.details.get("upserted", [])]
+
+            return upserted_ids + await self._bulk_write(operations[error["index"]:])
+
+    def _observe(self, start, count):
+        if self.collection.metrics is not None:
+            self.collection.metrics.observe(self.collection.name, "bulk_write", time.monotonic() - start, count)
+
+    async def _dispatch(self):
+        # Documents that were inserted and then updated in the same block are dispatched as inserts.
+        inserted = list(self._inserted)
+        updated = [i for i in self._updated if i not in self._inserted]
+
+        self._inserted = dict()
+        self._updated = dict()
+
+        if self.collection.batch_notifications and len(inserted) + len(updated) > NOTIFICATION_LIMIT:
+            return await self.collection.dispatch(self.collection.name, "refetch", None)
+
+        for operation, id_list in (("insert", inserted), ("update", updated)):
+            for index in range(0, len(id_list), NOTIFICATION_BATCH_SIZE):
+                chunk = id_list[index:index + NOTIFICATION_BATCH_SIZE]
+
+                cursor = self.collection.find({"_id": {"$in": chunk}}, projection=self.collection.projection)
+
+                documents = [self.collection.processor(d) async for d in cursor]
+
+                if documents:
+                    await self.collection._dispatch_documents(operation, documents)
+
+
+def _is_id_query(query):
+    return isinstance(query, dict) and len(query) == 1 and isinstance(query.get("_id"), (str, int))
 
 
 class DB:
 
-    def __init__(self, client, dispatch, loop):
+    def __init__(self, client, dispatch, loop, metrics=None, otu_cache=None, batch_notifications=False):
         self.dispatch = dispatch
         self.loop = loop
 
+        #: Dispatch batched messages for writes affecting many documents. See :class:`Collection`.
+        self.batch_notifications = batch_notifications
+
+        #: Records the latency and volume of operations on all bound collections.
+        self.metrics = metrics or virtool.db.metrics.Metrics()
+
+        #: Caches otus patched to past versions. See :func:`virtool.db.history.patch_to_version`.
+        self.otu_cache = otu_cache or virtool.cache.OTUCache()
+
         for collection_name in COLLECTION_NAMES:
             setattr(self, collection_name, None)
 
@@ -182,35 +786,61 @@ class DB:
     async def connect(self):
         await self.bind_collection("analyses", projection=virtool.db.analyses.PROJECTION)
         await self.bind_collection("files", projection=virtool.db.files.PROJECTION)
-        await self.bind_collection("groups")
+        await self.bind_collection("groups", cache=True)
         await self.bind_collection("history", projection=virtool.db.history.LIST_PROJECTION)
         await self.bind_collection("hmm", projection=virtool.db.hmm.PROJECTION)
         await self.bind_collection("indexes", projection=virtool.db.indexes.PROJECTION)
         await self.bind_collection("jobs", projection=virtool.db.jobs.PROJECTION, processor=virtool.db.jobs.processor)
-        await self.bind_collection("keys", silent=True)
+        await self.bind_collection("keys", silent=True, cache=True)
         await self.bind_collection("kinds", silent=True)
         await self.bind_collection("otus", projection=virtool.db.otus.PROJECTION)
         await self.bind_collection("processes")
-        await self.bind_collection("references", projection=virtool.db.references.PROJECTION)
+        await self.bind_collection("references", projection=virtool.db.references.PROJECTION, cache=True)
         await self.bind_collection("samples", projection=virtool.db.samples.LIST_PROJECTION)
         await self.bind_collection("sequences")
-        await self.bind_collection("sessions", silent=True)
-        await self.bind_collection("status")
+        await self.bind_collection("sessions", silent=True, cache=True)
+        await self.bind_collection("status", cache=True)
         await self.bind_collection("subtraction", projection=virtool.db.subtractions.PROJECTION)
-        await self.bind_collection("users", projection=virtool.db.users.PROJECTION)
+        await self.bind_collection("users", projection=virtool.db.users.PROJECTION, cache=True)
         await self.bind_collection("viruses", projection=virtool.db.otus.PROJECTION)
 
-    async def bind_collection(self, name, processor=None, projection=None, silent=False):
+    async def bind_collection(self, name, processor=None, projection=None, silent=False, cache=False):
+        async def dispatch(interface, operation, data):
+            self.metrics.record_dispatch(name)
+            return await self.dispatch(interface, operation, data)
+
         collection = Collection(
             name,
             self.motor_client[name],
-            self.dispatch,
+            dispatch,
             processor or virtool.utils.base_processor,
             projection,
-            silent
+            silent,
+            cache=virtool.cache.MemoryCache(DOCUMENT_CACHE_SIZE, DOCUMENT_CACHE_TTL) if cache else None,
+            metrics=self.metrics,
+            batch_notifications=self.batch_notifications
         )
 
         setattr(self, name, collection)
 
+    def bulk(self, name, batch_size=BULK_BATCH_SIZE, silent=False):
+        """
+        Return a :class:`BulkWriter` for the collection called ``name``. Use it as an asynchronous context manager.
+
+        :param name: the name of the collection
+        :type name: str
+
+        :param batch_size: the maximum number of operations sent in each ``bulk_write`` call
+        :type batch_size: int
+
+        :param silent: don't dispatch any messages for the writes
+        :type silent: bool
+
+        :return: a bulk writer
+        :rtype: :class:`BulkWriter`
+
+        """
+        return BulkWriter(getattr(self, name), batch_size=batch_size, silent=silent)
+
     async def collection_names(self):
         return await self.motor_client.collection_names()
@@ -44,6 +44,36 @@ async def find(db, req_query, ref_id=None):
     return data
 
 
+async def get_active_index_ids(db, ref_id):
+    """
+    Get a list of the active index ids for the reference defined by the given ``ref_id``. Active indexes are the
+    current index, an index that is being built, and indexes used by analyses that haven't finished.
+
+    :param db: the application database client
+    :type db: :class:`~motor.motor_asyncio.AsyncIOMotorClient`
+
+    :param ref_id: the id of the reference to list active index ids for
+    :type ref_id: str
+
+    :return: the ids of the active indexes for the reference
+    :rtype: Coroutine[list]
+
+    """
+    active_index_ids = set(await db.analyses.distinct("index.id", {"ready": False, "reference.id": ref_id}))
+
+    current_index_id, _ = await get_current_id_and_version(db, ref_id)
+
+    active_index_ids.add(current_index_id)
+
+    async for document in db.indexes.find({"reference.id": ref_id, "ready": False}, ["_id"]):
+        active_index_ids.add(document["_id"])
+
+    active_index_ids.discard(None)
+    active_index_ids.discard("unbuilt")
+
+    return list(active_index_ids)
+
+
 async def get_contributors(db, index_id):
     """
     Return an list of contributors and their contribution count for a specific index.
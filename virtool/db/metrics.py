@@ -0,0 +1,219 @@
+"""
+Records the latency and volume of database operations made through :mod:`virtool.db.iface`.
+
+"""
+import bisect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+#: The upper bounds in seconds of the latency histogram buckets. The last bucket holds all slower operations.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def get_query_keys(query):
+    """
+    Describe ``query`` by its top-level keys for logging. Values are left out because they can contain secrets, such
+    as session tokens. Queries that are a bare id are described as ``_id``.
+
+    :param query: a query
+    :type query: Union[dict, str, None]
+
+    :return: the top-level keys of the query
+    :rtype: list
+
+    """
+    if query is None:
+        return list()
+
+    if isinstance(query, dict):
+        return sorted(str(key) for key in query)
+
+    return ["_id"]
+
+
+class OperationMetrics:
+    """
+    Latency and document count totals for a single operation on a single collection.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.documents = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, duration, documents=None):
+        self.count += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+
+        if documents:
+            self.documents += documents
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "documents": self.documents,
+            "total_time": self.total_time,
+            "mean_time": self.total_time / self.count if self.count else 0,
+            "max_time": self.max_time,
+            "histogram": {
+                **{str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.buckets)},
+                "inf": self.buckets[-1]
+            }
+        }
+
+
+class Metrics:
+    """
+    Collects :class:`OperationMetrics` labelled by collection and operation and counts the messages dispatched for each
+    collection.
+
+    Operations that take longer than ``slow_threshold`` seconds are logged as warnings. Slow operations are not
+    logged if ``slow_threshold`` is ``None``.
+
+    """
+
+    def __init__(self, slow_threshold=None):
+        self.slow_threshold = slow_threshold
+        self.started_at = time.time()
+
+        #: :class:`OperationMetrics` keyed by ``(collection, operation)``.
+        self.operations = dict()
+
+        #: Dispatched message counts keyed by collection.
+        self.dispatches = dict()
+
+    def observe(self, collection, operation, duration, documents=None, query=None):
+        """
+        Record a completed operation.
+
+        :param collection: the name of the collection
+        :type collection: str
+
+        :param operation: the name of the operation (eg. ``find``, ``update_one``)
+        :type operation: str
+
+        :param duration: the number of seconds the operation took
+        :type duration: float
+
+        :param documents: the number of documents returned or changed by the operation
+        :type documents: Union[int, None]
+
+        :param query: the query used by the operation. Only its top-level keys are used in slow operation log messages
+        :type query: Union[dict, str, None]
+
+        """
+        key = (collection, operation)
+
+        try:
+            metrics = self.operations[key]
+        except KeyError:
+            metrics = self.operations[key] = OperationMetrics()
+
+        metrics.observe(duration, documents)
+
+        if self.slow_threshold is not None and duration > self.slow_threshold:
+            logger.warning("Slow database operation: {}.{} took {:.3f}s (query keys: {})".format(
+                collection,
+                operation,
+                duration,
+                get_query_keys(query)
+            ))
+
+    def record_dispatch(self, collection):
+        self.dispatches[collection] = self.dispatches.get(collection, 0) + 1
+
+    def to_dict(self):
+        """
+        Return all of the collected metrics in a JSON-serializable form.
+
+        :return: the metrics
+        :rtype: dict
+
+        """
+        collections = dict()
+
+        for (collection, operation), metrics in sorted(self.operations.items()):
+            collections.setdefault(collection, {"dispatches": 0, "operations": dict()})
+            collections[collection]["operations"][operation] = metrics.to_dict()
+
+        for collection, count in self.dispatches.items():
+            collections.setdefault(collection, {"dispatches": 0, "operations": dict()})
+            collections[collection]["dispatches"] = count
+
+        return {
+            "started_at": self.started_at,
+            "slow_threshold": self.slow_threshold,
+            "buckets": list(LATENCY_BUCKETS),
+            "collections": collections
+        }
+
+
+class TimedCursor:
+    """
+    Wraps a Motor cursor so the time spent retrieving results and the number of documents returned are recorded when
+    the cursor is exhausted. Chained cursor methods such as ``sort`` and ``limit`` return the wrapper.
+
+    """
+
+    def __init__(self, cursor, record):
+        self._cursor = cursor
+        self._record = record
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+
+        if not callable(attr):
+            return attr
+
+        def wrapped(*args, **kwargs):
+            result = attr(*args, **kwargs)
+
+            if result is self._cursor:
+                return self
+
+            return result
+
+        return wrapped
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        # Only time spent waiting for the database is counted, not time spent by the caller handling each document.
+        elapsed = 0
+        count = 0
+
+        iterator = self._cursor.__aiter__()
+
+        try:
+            while True:
+                start = time.monotonic()
+
+                try:
+                    document = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    elapsed += time.monotonic() - start
+
+                count += 1
+
+                yield document
+        finally:
+            self._record(elapsed, count)
+
+    async def to_list(self, length):
+        start = time.monotonic()
+
+        documents = await self._cursor.to_list(length)
+
+        self._record(time.monotonic() - start, len(documents))
+
+        return documents
@@ -1,4 +1,5 @@
 import asyncio
+import collections
 import json.decoder
 import logging
 import os
@@ -8,6 +9,7 @@ import pymongo
 import semver
 
 import virtool.db.history
+import virtool.db.indexes
 import virtool.db.otus
 import virtool.db.processes
 import virtool.db.utils
@@ -19,6 +21,9 @@ import virtool.processes
 import virtool.references
 import virtool.utils
 
+#: The number of otus patched together when cloning a reference.
+PATCH_BATCH_SIZE = 100
+
 PROJECTION = [
     "_id",
     "remotes_from",
@@ -523,6 +528,64 @@ async def get_unbuilt_count(db, ref_id):
     })
 
 
+async def compact_history(app, ref_id, process_id):
+    """
+    Compact the history of a reference. Only changes included in index builds that are no longer active are
+    compacted. Versions in the manifests of the reference's indexes are always kept, so analyses and clones can still
+    patch otus to the versions they used. Unbuilt changes are not touched and remain revertible.
+
+    :param app: the application object
+    :type app: :class:`aiohttp.web.Application`
+
+    :param ref_id: the id of the reference to compact history for
+    :type ref_id: str
+
+    :param process_id: the id of the process tracking the compaction
+    :type process_id: str
+
+    """
+    db = app["db"]
+
+    active_index_ids = await virtool.db.indexes.get_active_index_ids(db, ref_id)
+
+    keep = collections.defaultdict(set)
+
+    async for document in db.indexes.find({"reference.id": ref_id}, ["manifest"]):
+        for otu_id, version in document.get("manifest", dict()).items():
+            keep[otu_id].add(version)
+
+    versions = collections.defaultdict(list)
+
+    cursor = db.history.find({
+        "reference.id": ref_id,
+        "index.id": {
+            "$nin": active_index_ids + ["unbuilt"]
+        },
+        "otu.version": {
+            "$ne": "removed"
+        }
+    }, ["otu"])
+
+    async for change in cursor:
+        versions[change["otu"]["id"]].append(change["otu"]["version"])
+
+    await virtool.db.processes.update(db, process_id, progress=0.1, step="compact_changes")
+
+    progress_tracker = virtool.processes.ProgressTracker(
+        db,
+        process_id,
+        len(versions),
+        factor=0.9,
+        initial=0.1
+    )
+
+    for otu_id, otu_versions in versions.items():
+        await virtool.db.history.compact(db, otu_id, otu_versions, keep[otu_id])
+        await progress_tracker.add(1)
+
+    await virtool.db.processes.update(db, process_id, progress=1)
+
+
 async def create_clone(db, settings, name, clone_from, description, user_id):
 
     source = await db.references.find_one(clone_from)
@@ -726,14 +789,13 @@ async def export(db, ref_id, scope):
     if scope == "built" or scope == "remote":
         query["last_indexed_version"] = {"$ne": None}
 
-        async for document in db.otus.find(query):
-            _, joined, _ = await virtool.db.history.patch_to_version(
-                db,
-                document["_id"],
-                document["last_indexed_version"]
-            )
+        cursor = db.otus.find(query, ["last_indexed_version"])
+
+        manifest = {document["_id"]: document["last_indexed_version"] async for document in cursor}
+
+        patched = await virtool.db.history.patch_many_to_version(db, manifest)
 
-            otu_list.append(joined)
+        otu_list = [patched[otu_id] for otu_id in manifest]
 
     elif scope == "unbuilt":
         async for document in db.otus.find(query):
@@ -760,14 +822,20 @@ async def finish_clone(app, ref_id, created_at, manifest, process_id, user_id):
 
     inserted_otu_ids = list()
 
-    for source_otu_id, version in manifest.items():
-        _, patched, _ = await virtool.db.history.patch_to_version(db, source_otu_id, version)
+    source_otu_ids = list(manifest)
 
-        otu_id = await insert_joined_otu(db, patched, created_at, ref_id, user_id)
+    # Patch the source otus in batches so progress can still be reported.
+    for index in range(0, len(source_otu_ids), PATCH_BATCH_SIZE):
+        batch = {otu_id: manifest[otu_id] for otu_id in source_otu_ids[index:index + PATCH_BATCH_SIZE]}
 
-        inserted_otu_ids.append(otu_id)
+        patched_otus = await virtool.db.history.patch_many_to_version(db, batch)
 
-        await progress_tracker.add(1)
+        for source_otu_id in batch:
+            otu_id = await insert_joined_otu(db, patched_otus[source_otu_id], created_at, ref_id, user_id)
+
+            inserted_otu_ids.append(otu_id)
+
+            await progress_tracker.add(1)
 
     await virtool.db.processes.update(db, process_id, progress=0.6, step="create_history")
 
@@ -1042,8 +1110,9 @@ async def insert_joined_otu(db, otu, created_at, ref_id, user_id, remote=False):
 
     document = await db.otus.insert_one(otu)
 
-    for sequence in all_sequences:
-        await db.sequences.insert_one(dict(sequence, otu_id=document["_id"]), silent=True)
+    async with db.bulk("sequences", silent=True) as batch:
+        for sequence in all_sequences:
+            await batch.insert_one(dict(sequence, otu_id=document["_id"]))
 
     return document["_id"]
 
@@ -5,9 +5,9 @@ not used.
 """
 from copy import deepcopy
 
-import dictdiffer
 import pymongo
 
+import virtool.history
 import virtool.otus
 
 
@@ -117,7 +117,7 @@ def join_otu(db, query, document=None):
 def patch_otu_to_version(db, otu_id, version):
     """
     Take a joined otu back in time to the passed ``version``. Uses the diffs in the change documents associated with
-    the otu.
+    the otu, starting from the nearest full copy of the otu (see :data:`virtool.history.SNAPSHOT_INTERVAL`).
 
     :param db: the application database object
     :type db: :class:`~pymongo.database.Database`
@@ -140,26 +140,131 @@ def patch_otu_to_version(db, otu_id, version):
     if "version" in current and current["version"] == version:
         return current, deepcopy(current), reverted_history_ids
 
-    patched = deepcopy(current)
+    query = virtool.history.compose_reverted_query(otu_id, version)
 
-    # Sort the changes by descending timestamp.
-    for change in db.history.find({"otu.id": otu_id}, sort=[("otu.version", -1)]):
-        if change["otu"]["version"] == "removed" or change["otu"]["version"] > version:
-            reverted_history_ids.append(change["_id"])
+    # Sort the changes by descending version.
+    for change in db.history.find(query, ["_id"], sort=[("otu.version", -1)]):
+        reverted_history_ids.append(change["_id"])
 
-            if change["method_name"] == "remove":
-                patched = change["diff"]
-
-            elif change["method_name"] == "create":
-                patched = None
-
-            else:
-                diff = dictdiffer.swap(change["diff"])
-                patched = dictdiffer.patch(diff, patched)
-        else:
-            break
+    patched = patch_otu_from_nearest(db, otu_id, version, current)
 
     if current == {}:
         current = None
 
     return current, patched, reverted_history_ids
+
+
+def get_nearest_otu_snapshot(db, otu_id, version, current):
+    """
+    Find the full copy of the otu with the version closest to ``version``. The current otu, the otu stored by its
+    removal change, and the snapshots stored in its change documents are considered.
+
+    :param db: the application database object
+    :type db: :class:`~pymongo.database.Database`
+
+    :param otu_id: the id of the otu
+    :type otu_id: str
+
+    :param version: the target version
+    :type version: int
+
+    :param current: the current joined otu or an empty dict if it has been removed
+    :type current: dict
+
+    :return: the version and joined otu of the nearest snapshot or ``(None, None)``
+    :rtype: tuple
+
+    """
+    snapshots = dict()
+
+    if current:
+        snapshots[current["version"]] = None
+    else:
+        removal = db.history.find_one({"otu.id": otu_id, "otu.version": "removed"})
+
+        if removal:
+            snapshots[removal["diff"]["version"]] = removal["diff"]
+
+    for before in (True, False):
+        change = db.history.find_one(
+            virtool.history.compose_snapshot_query(otu_id, version, before),
+            ["otu"],
+            sort=[("otu.version", -1 if before else 1)]
+        )
+
+        if change:
+            snapshots.setdefault(change["otu"]["version"], change["_id"])
+
+    nearest = virtool.history.get_nearest(version, snapshots)
+
+    if nearest is None:
+        return None, None
+
+    snapshot = snapshots[nearest]
+
+    if snapshot is None:
+        return nearest, deepcopy(current)
+
+    if isinstance(snapshot, dict):
+        return nearest, snapshot
+
+    # Only fetch the full change document once it is known to be the nearest snapshot.
+    return nearest, virtool.history.get_snapshot(db.history.find_one(snapshot))
+
+
+def patch_otu_from_nearest(db, otu_id, version, current):
+    """
+    Patch the nearest full copy of the otu (see :func:`get_nearest_otu_snapshot`) forward or backward to ``version``.
+
+    :param db: the application database object
+    :type db: :class:`~pymongo.database.Database`
+
+    :param otu_id: the id of the otu
+    :type otu_id: str
+
+    :param version: the target version
+    :type version: int
+
+    :param current: the current joined otu or an empty dict if it has been removed
+    :type current: dict
+
+    :return: the otu at ``version`` or ``None`` if it did not exist at that version
+    :rtype: Union[dict, None]
+
+    """
+    snapshot_version, snapshot = get_nearest_otu_snapshot(db, otu_id, version, current)
+
+    if snapshot is None:
+        return deepcopy(current)
+
+    if snapshot_version > version:
+        query = virtool.history.compose_range_query(otu_id, version, snapshot_version)
+        return virtool.history.patch_backward(snapshot, db.history.find(query, sort=[("otu.version", -1)]))
+
+    query = virtool.history.compose_range_query(otu_id, snapshot_version, version)
+
+    return virtool.history.patch_forward(snapshot, db.history.find(query, sort=[("otu.version", 1)]))
+
+
+def store_otu_snapshots(db, snapshots):
+    """
+    Store full copies of joined otus in the change documents that produced them. Used when building an index so
+    otus can later be patched to the indexed versions quickly.
+
+    :param db: the application database object
+    :type db: :class:`~pymongo.database.Database`
+
+    :param snapshots: joined otus keyed by the ids of the changes that produced them
+    :type snapshots: dict
+
+    """
+    if not snapshots:
+        return
+
+    db.history.bulk_write([
+        pymongo.UpdateOne(
+            {"_id": change_id, "method_name": {"$ne": "create"}, "snapshot": {"$exists": False}},
+            {"$set": {"snapshot": otu}}
+        )
+        for change_id, otu in snapshots.items()
+    ], ordered=False)
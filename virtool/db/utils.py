@@ -41,6 +41,9 @@ async def get_new_id(collection, excluded=None):
     Returns a new, unique, id that can be used for inserting a new document. Will not return any id that is included
     in ``excluded``.
 
+    Random ids are checked against the ``_id`` index one at a time, so the cost does not grow with the size of the
+    collection. Collisions are very unlikely and only result in another lookup.
+
     :param collection: the Mongo collection to get a new _id for
     :type collection: :class:`motor.motor_asyncio.AsyncIOMotorCollection`
 
@@ -53,9 +56,13 @@ async def get_new_id(collection, excluded=None):
     """
     excluded = set(excluded or set())
 
-    excluded.update(await collection.distinct("_id"))
+    while True:
+        candidate = virtool.utils.random_alphanumeric(length=8, excluded=excluded)
+
+        if not await id_exists(collection, candidate):
+            return candidate
 
-    return virtool.utils.random_alphanumeric(length=8, excluded=excluded)
+        excluded.add(candidate)
 
 
 async def get_one_field(collection, field, query):
@@ -0,0 +1,255 @@
+"""
+Calculates and applies diffs between joined otu documents.
+
+Isolates are matched by ``id`` and sequences by ``_id`` rather than by list position, so adding, removing, or editing
+one isolate or sequence only records that isolate or sequence. Other fields are recorded as whole values. A diff looks
+like this:
+
+.. code-block:: python
+
+    {
+        "format": "otu",
+        "fields": {
+            "name": {"old": "Prunus virus F", "new": "Prunus virus E"},
+            "version": {"old": 1, "new": 2}
+        },
+        "isolates": {
+            "order": {"old": ["cab8b360"], "new": ["cab8b360", "bcb9b352"]},
+            "items": [
+                {
+                    "id": "cab8b360",
+                    "fields": {"default": {"old": True, "new": False}},
+                    "sequences": {
+                        "items": [{"id": "KX269872.1", "fields": {"sequence": {"old": "ATAG", "new": "ATGG"}}}]
+                    }
+                },
+                {"id": "bcb9b352", "new": {"id": "bcb9b352", "sequences": [], ...}}
+            ]
+        }
+    }
+
+A field that is missing before or after the change has no ``old`` or ``new`` value respectively. List ``order`` is
+only recorded when the ids in the list change. Changed list items are stored in lists rather than keyed by id because
+ids such as versioned accessions can contain characters that are not allowed in MongoDB keys. Diffs can be applied in
+either direction.
+
+"""
+from copy import deepcopy
+
+#: Identifies diffs produced by :func:`diff_otus`.
+FORMAT = "otu"
+
+
+def is_otu_diff(diff):
+    """
+    Check if ``diff`` was produced by :func:`diff_otus`. Diffs in older change documents are ``dictdiffer`` diffs.
+
+    :param diff: a diff from a change document
+    :type diff: Union[dict, list]
+
+    :return: whether the diff was produced by :func:`diff_otus`
+    :rtype: bool
+
+    """
+    return isinstance(diff, dict) and diff.get("format") == FORMAT
+
+
+def diff_otus(old, new):
+    """
+    Calculate the diff between two joined otus.
+
+    :param old: the joined otu before the change
+    :type old: dict
+
+    :param new: the joined otu after the change
+    :type new: dict
+
+    :return: the diff
+    :rtype: dict
+
+    """
+    diff = {
+        "format": FORMAT,
+        "fields": dict()
+    }
+
+    if _has_lists(old, new, "isolates", "id"):
+        diff["fields"] = _diff_fields(old, new, exclude="isolates")
+
+        isolates = _diff_lists(old["isolates"], new["isolates"], "id", _diff_isolates)
+
+        if isolates:
+            diff["isolates"] = isolates
+    else:
+        diff["fields"] = _diff_fields(old, new)
+
+    return diff
+
+
+def apply_otu_diff(otu, diff, reverse=False):
+    """
+    Apply a diff produced by :func:`diff_otus` to a joined otu. The diff is reverted instead if ``reverse`` is
+    ``True``. The passed otu is not modified.
+
+    :param otu: the joined otu to patch
+    :type otu: dict
+
+    :param diff: the diff to apply
+    :type diff: dict
+
+    :param reverse: revert the diff instead of applying it
+    :type reverse: bool
+
+    :return: the patched otu
+    :rtype: dict
+
+    """
+    side = "old" if reverse else "new"
+
+    otu = deepcopy(otu)
+
+    _patch_fields(otu, diff["fields"], side)
+
+    if "isolates" in diff:
+        otu["isolates"] = _patch_list(otu["isolates"], diff["isolates"], "id", _patch_isolate, side)
+
+    return otu
+
+
+def _has_lists(old, new, key, id_key):
+    """
+    Check that ``key`` is a list of documents with unique ``id_key`` values in both ``old`` and ``new``. Lists that
+    can't be matched by id are diffed as whole values.
+
+    """
+    for document in (old, new):
+        items = document.get(key)
+
+        if not isinstance(items, list) or not all(isinstance(item, dict) and id_key in item for item in items):
+            return False
+
+        if len({item[id_key] for item in items}) != len(items):
+            return False
+
+    return True
+
+
+def _diff_fields(old, new, exclude=None):
+    fields = dict()
+
+    for key in sorted(set(old) | set(new)):
+        if key == exclude or (key in old and key in new and old[key] == new[key]):
+            continue
+
+        entry = dict()
+
+        if key in old:
+            entry["old"] = old[key]
+
+        if key in new:
+            entry["new"] = new[key]
+
+        fields[key] = entry
+
+    return fields
+
+
+def _diff_lists(old, new, id_key, diff_item):
+    old_items = {item[id_key]: item for item in old}
+    new_items = {item[id_key]: item for item in new}
+
+    items = list()
+
+    for item_id, old_item in old_items.items():
+        if item_id not in new_items:
+            items.append({"id": item_id, "old": old_item})
+            continue
+
+        item_diff = diff_item(old_item, new_items[item_id])
+
+        if item_diff:
+            items.append(dict(item_diff, id=item_id))
+
+    for item_id, new_item in new_items.items():
+        if item_id not in old_items:
+            items.append({"id": item_id, "new": new_item})
+
+    diff = dict()
+
+    if items:
+        diff["items"] = items
+
+    old_order = [item[id_key] for item in old]
+    new_order = [item[id_key] for item in new]
+
+    if old_order != new_order:
+        diff["order"] = {"old": old_order, "new": new_order}
+
+    return diff
+
+
+def _diff_isolates(old, new):
+    diff = dict()
+
+    if _has_lists(old, new, "sequences", "_id"):
+        fields = _diff_fields(old, new, exclude="sequences")
+        sequences = _diff_lists(old["sequences"], new["sequences"], "_id", _diff_sequences)
+
+        if sequences:
+            diff["sequences"] = sequences
+    else:
+        fields = _diff_fields(old, new)
+
+    if fields:
+        diff["fields"] = fields
+
+    return diff
+
+
+def _diff_sequences(old, new):
+    fields = _diff_fields(old, new)
+
+    if fields:
+        return {"fields": fields}
+
+    return None
+
+
+def _patch_fields(document, fields, side):
+    for key, entry in fields.items():
+        if side in entry:
+            document[key] = deepcopy(entry[side])
+        else:
+            document.pop(key, None)
+
+
+def _patch_list(items, diff, id_key, patch_item, side):
+    by_id = {item[id_key]: item for item in items}
+
+    for entry in diff.get("items", list()):
+        item_id = entry["id"]
+
+        if "old" in entry or "new" in entry:
+            # The whole item was added or removed.
+            if side in entry:
+                by_id[item_id] = deepcopy(entry[side])
+            else:
+                by_id.pop(item_id, None)
+        else:
+            patch_item(by_id[item_id], entry, side)
+
+    if "order" in diff:
+        return [by_id[item_id] for item_id in diff["order"][side]]
+
+    return [by_id[item[id_key]] for item in items]
+
+
+def _patch_isolate(isolate, diff, side):
+    _patch_fields(isolate, diff.get("fields", dict()), side)
+
+    if "sequences" in diff:
+        isolate["sequences"] = _patch_list(isolate["sequences"], diff["sequences"], "_id", _patch_sequence, side)
+
+
+def _patch_sequence(sequence, diff, side):
+    _patch_fields(sequence, diff["fields"], side)
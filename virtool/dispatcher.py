@@ -1,37 +1,318 @@
+import asyncio
+import collections
+import json
 import logging
+import time
 from copy import deepcopy
 
+import pymongo
+import pymongo.errors
+
 import virtool.api.utils
+import virtool.jsonpatch
 
 
 async def default_writer(connection, message):
     return await connection.send(message)
 
 
+#: The maximum number of messages waiting to be sent to a single connection.
+SEND_QUEUE_SIZE = 500
+
+#: The WebSocket close code sent to clients that were evicted for falling behind. They should reload their data.
+CLOSE_CODE_RESYNC = 4000
+
+#: The interfaces with documents large enough to benefit from delta updates.
+DELTA_INTERFACES = ("otus", "references", "samples")
+
+#: The maximum number of documents the dispatcher remembers the last sent version of for delta updates.
+DELTA_CACHE_SIZE = 1000
+
+#: The number of broadcast messages kept for clients resuming after a reconnect.
+EVENT_LOG_SIZE = 1000
+
+#: The size in bytes of the capped collection used to persist the event log.
+EVENT_LOG_COLLECTION_SIZE = 64 * 1024 ** 2
+
+#: The message sent to clients that were evicted for falling behind.
+RESYNC_MESSAGE = virtool.api.utils.compact_dumps({
+    "interface": "websocket",
+    "operation": "resync",
+    "data": None
+})
+
+
 class Connection:
+    """
+    Wraps a WebSocket connection. Messages are added to a bounded queue that is drained by a task owned by the
+    connection, so a slow client never delays the dispatcher or other clients. The task is started with
+    :meth:`start`.
 
-    def __init__(self, ws, session):
+    """
+
+    def __init__(self, ws, session, queue_size=SEND_QUEUE_SIZE):
         self._ws = ws
         self.ping = self._ws.ping
         self.user_id = session.user_id
         self.groups = session.groups
         self.permissions = session.permissions
 
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._task = None
+
+    def start(self):
+        """
+        Start the task that sends queued messages to the client.
+
+        """
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        try:
+            while True:
+                encoded = await self._queue.get()
+
+                if encoded is None:
+                    await self._ws.close(code=CLOSE_CODE_RESYNC, message=b"resync")
+                    return
+
+                await self._ws.send_str(encoded)
+        except (ConnectionResetError, RuntimeError) as err:
+            logging.debug("Stopped sending to connection {}: {}".format(self.user_id, err))
+
+    def stop(self):
+        """
+        Stop sending queued messages. Called when the connection has closed.
+
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def enqueue(self, encoded):
+        """
+        Queue an encoded message to be sent to the client.
+
+        :param encoded: the JSON-encoded message
+        :type encoded: str
+
+        :raises asyncio.QueueFull: the client has fallen too far behind
+
+        """
+        self._queue.put_nowait(encoded)
+
     async def send(self, message):
-        await self._ws.send_json(message, dumps=virtool.api.utils.dumps)
+        self.enqueue(virtool.api.utils.dumps(message))
+
+    async def send_encoded(self, encoded):
+        """
+        Send a message that has already been encoded as JSON. Allows one encoded message to be shared by many
+        connections.
+
+        :param encoded: the JSON-encoded message
+        :type encoded: str
+
+        """
+        self.enqueue(encoded)
+
+    def evict(self):
+        """
+        Discard all queued messages, then tell the client to resync and close the connection. Used when the client
+        cannot keep up with the messages sent to it.
+
+        """
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+        self._queue.put_nowait(RESYNC_MESSAGE)
+        self._queue.put_nowait(None)
 
     async def close(self):
+        self.stop()
         await self._ws.close()
 
 
+class EventLog:
+    """
+    A bounded, sequence-numbered log of the messages broadcast by the dispatcher. A client that reconnects can pass
+    the last sequence number it saw and receive only the messages it missed.
+
+    Sequence numbers start at the current time in milliseconds so numbers from before a restart are not mistaken for
+    current ones. The log can be persisted to a capped collection with :meth:`persist`, so clients can resume across
+    restarts.
+
+    """
+
+    def __init__(self, size=EVENT_LOG_SIZE):
+        self.size = size
+
+        #: The sequence number of the last logged message.
+        self.sequence = int(time.time() * 1000)
+
+        #: ``(sequence, interface, encoded)`` tuples for the most recent messages.
+        self._events = collections.deque(maxlen=size)
+
+        self._collection = None
+
+    async def persist(self, db, name="events"):
+        """
+        Store logged messages in a capped collection and load any messages already stored there.
+
+        :param db: the Motor database
+        :type db: :class:`motor.motor_asyncio.AsyncIOMotorDatabase`
+
+        :param name: the name of the capped collection
+        :type name: str
+
+        """
+        try:
+            await db.create_collection(name, capped=True, size=EVENT_LOG_COLLECTION_SIZE, max=self.size)
+        except pymongo.errors.CollectionInvalid:
+            pass
+
+        self._collection = db[name]
+
+        documents = await self._collection.find().sort("_id", pymongo.DESCENDING).to_list(self.size)
+
+        for document in reversed(documents):
+            self._events.append((document["_id"], document["interface"], document["message"]))
+
+        if self._events:
+            self.sequence = max(self.sequence, self._events[-1][0])
+
+    def append(self, interface, message):
+        """
+        Assign the next sequence number to ``message``, encode it, and log it.
+
+        :param interface: the interface the message is for
+        :type interface: str
+
+        :param message: the message
+        :type message: dict
+
+        :return: the encoded message
+        :rtype: str
+
+        """
+        self.sequence += 1
+
+        message["sequence"] = self.sequence
+
+        encoded = virtool.api.utils.compact_dumps(message)
+
+        self._events.append((self.sequence, interface, encoded))
+
+        if self._collection is not None:
+            future = asyncio.ensure_future(self._collection.insert_one({
+                "_id": self.sequence,
+                "interface": interface,
+                "message": encoded
+            }))
+
+            future.add_done_callback(log_persist_error)
+
+        return encoded
+
+    def since(self, sequence, until=None):
+        """
+        Get the messages logged after ``sequence`` and up to and including ``until``.
+
+        :param sequence: the last sequence number seen by the client
+        :type sequence: int
+
+        :param until: the last sequence number to return
+        :type until: Union[int, None]
+
+        :return: ``(interface, encoded)`` tuples, or ``None`` if the messages are no longer available
+        :rtype: Union[list, None]
+
+        """
+        if sequence > self.sequence:
+            return None
+
+        first = self._events[0][0] if self._events else self.sequence + 1
+
+        if sequence < first - 1:
+            return None
+
+        return [(i, e) for s, i, e in self._events if s > sequence and (until is None or s <= until)]
+
+
+def log_persist_error(future):
+    """
+    Log the exception raised by a failed write of a message to the persisted event log.
+
+    :param future: the completed write
+    :type future: :class:`asyncio.Future`
+
+    """
+    if not future.cancelled() and future.exception() is not None:
+        logging.error("Could not persist event log message", exc_info=future.exception())
+
+
 class Dispatcher:
+    """
+    Sends messages to WebSocket connections.
+
+    If ``coalesce_interval`` is set, ``update`` messages dispatched to all interested connections are buffered for that
+    many seconds. Only the latest document for each ``id`` is kept. When the buffer is flushed, each interface gets a
+    single ``update`` message, or an ``update_many`` message containing a list of documents if several were buffered.
+
+    Any other message for an interface flushes the updates buffered for it first, so the client sees changes in
+    order. Buffered updates for documents that are deleted are discarded.
+
+    For interfaces in ``delta_interfaces``, the last document sent for each ``id`` is remembered along with a version
+    number. Broadcast ``insert`` and ``update`` messages for these interfaces carry a top-level ``version``. When a list
+    of JSON Patch operations is smaller than the updated document, a ``patch`` message is sent instead:
+
+    .. code-block:: json
+
+        {"interface": "otus", "operation": "patch", "version": 4, "data": {"id": "foo", "patch": [...]}}
+
+    Versions increase by one for each message about a document. A client that sees a gap can request the current
+    document with :meth:`send_current`.
+
+    If an :class:`.EventLog` is provided, broadcast messages carry a ``sequence`` number and are kept so reconnecting
+    clients can catch up with :meth:`resume`.
 
-    def __init__(self, loop):
+    """
+
+    def __init__(self, loop, coalesce_interval=None, delta_interfaces=None, event_log=None):
         self.loop = loop
 
+        #: Logs broadcast messages so clients can resume after reconnecting.
+        self.event_log = event_log
+
+        #: The event log sequence number when each connection was added.
+        self._connected_at = dict()
+
+        #: The interfaces delta updates are sent for.
+        self.delta_interfaces = frozenset(delta_interfaces or [])
+
+        #: The last version and document sent for each ``(interface, id)``, ordered from least to most recently used.
+        self._versions = collections.OrderedDict()
+
+        #: The number of seconds to buffer ``update`` messages for. Coalescing is disabled if this is not set.
+        self.coalesce_interval = coalesce_interval
+
+        #: Buffered update documents keyed by interface and then document id.
+        self._pending = dict()
+
+        #: The handle for the scheduled flush of buffered updates.
+        self._flush_handle = None
+
         #: A dict of all active connections.
         self.connections = list()
 
+        #: Connections that have subscribed to each interface.
+        self.subscribers = collections.defaultdict(set)
+
+        #: The interfaces each subscribed connection is interested in.
+        self._subscriptions = dict()
+
+        #: Connections that have never subscribed to an interface. These receive messages for all interfaces.
+        self._unsubscribed = set()
+
         logging.debug("Initialized dispatcher")
 
     def add_connection(self, connection):
@@ -40,8 +321,112 @@ class Dispatcher:
 
         """
         self.connections.append(connection)
+        self._unsubscribed.add(connection)
+
+        if self.event_log is not None:
+            self._connected_at[connection] = self.event_log.sequence
+
         logging.debug("Added connection to dispatcher: {}".format(connection.user_id))
 
+    def subscribe(self, connection, interfaces):
+        """
+        Subscribe a connection to one or more ``interfaces``. Once a connection has subscribed, it only receives
+        messages for the interfaces it is subscribed to.
+
+        :param connection: the connection to subscribe
+        :type connection: :class:`.Connection`
+
+        :param interfaces: the names of the interfaces to subscribe to
+        :type interfaces: Iterable[str]
+
+        """
+        self._unsubscribed.discard(connection)
+
+        subscriptions = self._subscriptions.setdefault(connection, set())
+
+        for interface in interfaces:
+            subscriptions.add(interface)
+            self.subscribers[interface].add(connection)
+
+    def unsubscribe(self, connection, interfaces):
+        """
+        Unsubscribe a connection from one or more ``interfaces``.
+
+        :param connection: the connection to unsubscribe
+        :type connection: :class:`.Connection`
+
+        :param interfaces: the names of the interfaces to unsubscribe from
+        :type interfaces: Iterable[str]
+
+        """
+        self._unsubscribed.discard(connection)
+
+        subscriptions = self._subscriptions.setdefault(connection, set())
+
+        for interface in interfaces:
+            subscriptions.discard(interface)
+            self._discard_subscriber(interface, connection)
+
+    def _discard_subscriber(self, interface, connection):
+        subscribers = self.subscribers.get(interface)
+
+        if subscribers is not None:
+            subscribers.discard(connection)
+
+            if not subscribers:
+                del self.subscribers[interface]
+
+    def get_subscribers(self, interface):
+        """
+        Get the connections that should receive messages for ``interface``. These are the connections subscribed to
+        the interface and those that have never subscribed to any interface.
+
+        :param interface: the name of the interface
+        :type interface: str
+
+        :return: the interested connections
+        :rtype: list
+
+        """
+        return list(self._unsubscribed) + list(self.subscribers.get(interface, ()))
+
+    def is_subscribed(self, connection, interface):
+        return connection in self._unsubscribed or connection in self.subscribers.get(interface, ())
+
+    async def resume(self, connection, sequence):
+        """
+        Send ``connection`` the logged messages it missed after ``sequence`` and before it connected. If the messages
+        are no longer available, the client is told to resync instead. Nothing is sent to connections that are not
+        authorized.
+
+        :param connection: the reconnected connection
+        :type connection: :class:`.Connection`
+
+        :param sequence: the last sequence number the client saw
+        :type sequence: int
+
+        """
+        if not connection.user_id:
+            return
+
+        events = None
+
+        if self.event_log is not None:
+            events = self.event_log.since(sequence, until=self._connected_at.get(connection))
+
+        try:
+            if events is None:
+                return await connection.send_encoded(RESYNC_MESSAGE)
+
+            for interface, encoded in events:
+                if self.is_subscribed(connection, interface):
+                    await connection.send_encoded(encoded)
+
+        except asyncio.QueueFull:
+            logging.warning("Evicted slow connection: {}".format(connection.user_id))
+            self.remove_connection(connection)
+            connection.evict()
+
     def remove_connection(self, connection):
         """
         Remove a connection from the dispatcher. Make sure it is closed first.
@@ -50,6 +435,12 @@ class Dispatcher:
         :type connection: :class:`.SocketHandler`
 
         """
+        self._unsubscribed.discard(connection)
+        self._connected_at.pop(connection, None)
+
+        for interface in self._subscriptions.pop(connection, ()):
+            self._discard_subscriber(interface, connection)
+
         try:
             self.connections.remove(connection)
             logging.debug("Removed connection from dispatcher: {}".format(connection.user_id))
@@ -82,16 +473,178 @@ class Dispatcher:
         :param writer: modifies the written message based on the connection.
         :type writer: callable
 
+        When the default ``writer`` is used, the message is encoded once and the same encoded string is sent to every
+        connection. A custom ``writer`` receives its own copy of the message for each connection.
+
         """
+        broadcast = (
+            connections is None and
+            conn_filter is None and
+            conn_modifier is None and
+            writer is default_writer
+        )
+
+        is_document = isinstance(data, dict) and "id" in data
+
+        if self.coalesce_interval and broadcast and operation == "update" and is_document:
+            return self._buffer(interface, data)
+
+        if interface in self._pending:
+            if operation == "delete" and isinstance(data, list):
+                for document_id in data:
+                    self._pending[interface].pop(document_id, None)
+
+            await self.flush_interface(interface)
+
+        if interface in self.delta_interfaces:
+            if broadcast and operation in ("insert", "update") and is_document:
+                return await self._send_delta(interface, operation, data)
+
+            # Not every client will receive this message, so the next update must contain the full document.
+            if is_document:
+                self._versions.pop((interface, data["id"]), None)
+
+            elif operation == "delete" and isinstance(data, list):
+                for document_id in data:
+                    self._versions.pop((interface, document_id), None)
+
+            elif operation == "update_many" and isinstance(data, list):
+                for document in data:
+                    self._versions.pop((interface, document["id"]), None)
+
+            elif operation == "refetch":
+                for key in [key for key in self._versions if key[0] == interface]:
+                    del self._versions[key]
+
+        await self._send(interface, operation, data, connections, conn_filter, conn_modifier, writer)
+
+    async def _send_delta(self, interface, operation, document):
+        key = (interface, document["id"])
+
+        encoded = virtool.api.utils.compact_dumps(document)
+
+        previous = self._versions.pop(key, None)
+
+        version = 1 if previous is None else previous[0] + 1
+
+        # Keep a decoded copy so later changes to the dispatched document do not affect the next patch.
+        current = json.loads(encoded)
+
+        self._versions[key] = (version, current)
+
+        if len(self._versions) > DELTA_CACHE_SIZE:
+            self._versions.popitem(last=False)
+
+        if previous is not None and operation == "update":
+            patch = virtool.jsonpatch.make_patch(previous[1], current)
+
+            if len(virtool.api.utils.compact_dumps(patch)) < len(encoded):
+                return await self._send(interface, "patch", {"id": document["id"], "patch": patch}, version=version)
+
+        await self._send(interface, operation, document, version=version)
+
+    async def send_current(self, connection, interface, document_id):
+        """
+        Send the last version of a document dispatched for a delta interface to a single ``connection``. Used when a
+        client misses a version. Nothing is sent if the document is not remembered, in which case the client should
+        retrieve it through the API. Nothing is sent to connections that are not authorized.
+
+        :param connection: the connection to send the document to
+        :type connection: :class:`.Connection`
+
+        :param interface: the name of the interface
+        :type interface: str
+
+        :param document_id: the id of the document
+        :type document_id: str
+
+        :return: ``True`` if the document was sent
+        :rtype: bool
+
+        """
+        if not connection.user_id:
+            return False
+
+        current = self._versions.get((interface, document_id))
+
+        if current is None:
+            return False
+
+        version, document = current
+
+        await self._send(interface, "update", document, connections=[connection], version=version)
+
+        return True
+
+    def _buffer(self, interface, data):
+        pending = self._pending.setdefault(interface, collections.OrderedDict())
+
+        # Move the document to the end so buffered updates are flushed in the order they were last made.
+        pending.pop(data["id"], None)
+        pending[data["id"]] = data
+
+        if self._flush_handle is None:
+            self._flush_handle = self.loop.call_later(self.coalesce_interval, self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._flush_handle = None
+        asyncio.ensure_future(self.flush(), loop=self.loop)
+
+    async def flush_interface(self, interface):
+        """
+        Send the updates buffered for ``interface``.
+
+        :param interface: the name of the interface
+        :type interface: str
+
+        """
+        pending = self._pending.pop(interface, None)
+
+        if not pending:
+            return
+
+        if interface in self.delta_interfaces:
+            for document in pending.values():
+                await self._send_delta(interface, "update", document)
+
+        elif len(pending) == 1:
+            await self._send(interface, "update", next(iter(pending.values())))
+        else:
+            await self._send(interface, "update_many", list(pending.values()))
+
+    async def flush(self):
+        """
+        Send all buffered updates.
+
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        for interface in list(self._pending):
+            await self.flush_interface(interface)
+
+    async def _send(self, interface, operation, data, connections=None, conn_filter=None, conn_modifier=None,
+                    writer=default_writer, version=None):
         message = {
             "operation": operation,
             "interface": interface,
             "data": data
         }
 
-        # If the connections parameter was not set, dispatch the message to all authorized connections. Authorized
-        # connections have assigned ``user_id`` properties.
-        connections = connections or [conn for conn in self.connections if conn.user_id]
+        if version is not None:
+            message["version"] = version
+
+        encoded = None
+
+        broadcast = connections is None and conn_filter is None and conn_modifier is None and writer is default_writer
+
+        if broadcast and self.event_log is not None:
+            encoded = self.event_log.append(interface, message)
+
+        # If the connections parameter was not set, dispatch the message to all authorized connections interested in
+        # the interface. Authorized connections have assigned ``user_id`` properties.
+        connections = connections or [conn for conn in self.get_subscribers(interface) if conn.user_id]
 
         if conn_filter:
             if not callable(conn_filter):
@@ -109,11 +662,24 @@ class Dispatcher:
         if writer and not callable(writer):
             raise TypeError("writer must be callable")
 
+        if writer is default_writer:
+            encoded = encoded or virtool.api.utils.compact_dumps(message)
+
+            async def write(connection):
+                await connection.send_encoded(encoded)
+        else:
+            async def write(connection):
+                await writer(connection, deepcopy(message))
+
         connections_to_remove = list()
+        connections_to_evict = list()
 
+        # Connections only queue messages, so one slow client does not hold up the others.
         for connection in connections:
             try:
-                await writer(connection, deepcopy(message))
+                await write(connection)
+            except asyncio.QueueFull:
+                connections_to_evict.append(connection)
             except RuntimeError as err:
                 if "RuntimeError: unable to perform operation on <TCPTransport" in str(err):
                     connections_to_remove.append(connection)
@@ -121,11 +687,18 @@ class Dispatcher:
         for connection in connections_to_remove:
             self.remove_connection(connection)
 
+        for connection in connections_to_evict:
+            logging.warning("Evicted slow connection: {}".format(connection.user_id))
+            self.remove_connection(connection)
+            connection.evict()
+
         logging.debug("Dispatched {}.{}".format(interface, operation))
 
     async def close(self):
         logging.debug("Closing dispatcher")
 
+        await self.flush()
+
         for connection in self.connections:
             await connection.close()
 
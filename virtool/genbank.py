@@ -1,5 +1,4 @@
 import logging
-import string
 
 import virtool.http.proxy
 
@@ -10,6 +9,153 @@ TOOL = "virtool"
 
 FETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
 
+#: A :meth:`str.translate` table that removes everything but the sequence from lines in the ORIGIN section of a record.
+SEQUENCE_DELETE_TABLE = str.maketrans("", "", " \t\r\n/0123456789")
+
+
+class Parser:
+    """
+    A single-pass parser for GenBank flat files. Lines are passed to :meth:`feed` one at a time, so a response can be
+    parsed as it is streamed. The sequence is collected in chunks and joined once per record.
+
+    """
+
+    def __init__(self):
+        self._data = None
+        self._sequence = None
+        self._in_origin = False
+        self._reset()
+
+    def _reset(self):
+        self._data = {
+            "host": ""
+        }
+
+        self._sequence = list()
+        self._in_origin = False
+
+    def _finish(self):
+        data = self._data
+        data["sequence"] = "".join(self._sequence).upper()
+
+        self._reset()
+
+        return data
+
+    def feed(self, line):
+        """
+        Parse a single line.
+
+        :param line: a line from a GenBank flat file
+        :type line: str
+
+        :return: the parsed record if ``line`` ended one, otherwise ``None``
+        :rtype: Union[dict, None]
+
+        """
+        if line.startswith("//"):
+            return self._finish()
+
+        if self._in_origin:
+            self._sequence.append(line.translate(SEQUENCE_DELETE_TABLE))
+            return None
+
+        if line.startswith("ORIGIN"):
+            self._in_origin = True
+
+        elif line.startswith("VERSION"):
+            self._data["accession"] = line.replace("VERSION", "").strip()
+
+        elif line.startswith("DEFINITION"):
+            self._data["definition"] = line.replace("DEFINITION", "").strip()
+
+        elif "/host=" in line:
+            self._data["host"] = line.strip().replace("/host=", "").replace('"', "")
+
+        return None
+
+    def close(self):
+        """
+        Finish parsing. Returns the last record if it was not terminated with ``//``.
+
+        :return: the parsed record or ``None``
+        :rtype: Union[dict, None]
+
+        """
+        if self._in_origin or len(self._data) > 1:
+            return self._finish()
+
+        return None
+
+
+def parse(body):
+    """
+    Parse all of the records in a GenBank flat file.
+
+    :param body: the GenBank flat file content
+    :type body: str
+
+    :return: the parsed records in file order
+    :rtype: List[dict]
+
+    """
+    parser = Parser()
+
+    records = list()
+
+    for line in body.splitlines():
+        record = parser.feed(line)
+
+        if record:
+            records.append(record)
+
+    record = parser.close()
+
+    if record:
+        records.append(record)
+
+    return records
+
+
+def match_records(accessions, records):
+    """
+    Match parsed records to the accessions they were requested with. A record matches an accession if its versioned
+    accession or its accession without the version is the same as the requested one. If a single accession was
+    requested, a single record is matched to it regardless, so records requested by other identifiers are still
+    returned.
+
+    :param accessions: the requested accessions
+    :type accessions: Iterable[Union[int,str]]
+
+    :param records: the parsed records
+    :type records: List[dict]
+
+    :return: the matching record or ``None`` keyed by requested accession
+    :rtype: dict
+
+    """
+    requested = {str(accession): accession for accession in accessions}
+
+    matched = dict.fromkeys(requested.values())
+
+    for record in records:
+        version = record.get("accession", "")
+
+        for key in (version, version.rsplit(".", 1)[0]):
+            accession = requested.get(key)
+
+            if accession is not None and matched[accession] is None:
+                matched[accession] = record
+                break
+
+    if len(matched) == 1 and len(records) == 1:
+        accession = next(iter(matched))
+
+        if matched[accession] is None:
+            matched[accession] = records[0]
+
+    return matched
+
 
 async def fetch(settings, session, accession):
     """
@@ -27,11 +173,60 @@ async def fetch(settings, session, accession):
     :return: parsed Genbank data
     :rtype: dict
 
+    """
+    records = await fetch_many(settings, session, [accession])
+
+    return records[accession]
+
+
+async def fetch_many(settings, session, accessions):
+    """
+    Fetch the Genbank records for several accessions in a single request. The response is parsed as it is streamed.
+
+    NCBI rejects the whole request if any of the accessions can't be retrieved. The accessions are then fetched one at
+    a time, so the records that can be retrieved are still returned.
+
+    :param settings: the application settings object
+    :type settings: :class:`virtool.app_settings.Settings`
+
+    :param session: an aiohttp client session
+    :type session: :class:`aiohttp.ClientSession`
+
+    :param accessions: the accessions to fetch
+    :type accessions: Iterable[Union[int,str]]
+
+    :return: parsed Genbank data or ``None`` keyed by requested accession
+    :rtype: dict
+
+    """
+    accessions = list(dict.fromkeys(accessions))
+
+    records = await _fetch_records(settings, session, accessions)
+
+    if records is not None:
+        return match_records(accessions, records)
+
+    if len(accessions) == 1:
+        return {accessions[0]: None}
+
+    matched = dict()
+
+    for accession in accessions:
+        matched.update(await fetch_many(settings, session, [accession]))
+
+    return matched
+
+
+async def _fetch_records(settings, session, accessions):
+    """
+    Request the Genbank records for ``accessions`` and parse them in response order. Returns ``None`` if NCBI rejects
+    the request.
+
     """
     params = {
         "db": "nuccore",
         "email": EMAIL,
-        "id": accession,
+        "id": ",".join(str(accession) for accession in accessions),
         "retmode": "text",
         "rettype": "gb",
         "tool": TOOL
@@ -39,35 +234,27 @@ async def fetch(settings, session, accession):
 
     async with virtool.http.proxy.ProxyRequest(settings, session.get, FETCH_URL, params=params) as resp:
 
-        body = await resp.text()
-
         if resp.status != 200:
+            body = await resp.text()
+
             if "Failed to retrieve sequence" not in body:
                 logger.warning("Unexpected Genbank error: {}".format(body))
 
             return None
 
-        data = {
-            "host": ""
-        }
-
-        for line in body.split("\n"):
+        parser = Parser()
 
-            if line.startswith("VERSION"):
-                data["accession"] = line.replace("VERSION", "").lstrip(" ")
+        records = list()
 
-            if line.startswith("DEFINITION"):
-                data["definition"] = line.replace("DEFINITION", "").lstrip(" ")
+        async for line in resp.content:
+            record = parser.feed(line.decode())
 
-            if "/host=" in line:
-                data["host"] = line.lstrip(" ").replace("/host=", "").replace('"', "")
+            if record:
+                records.append(record)
 
-            # Extract sequence
-            sequence_field = body.split("ORIGIN")[1].lower()
+        record = parser.close()
 
-            for char in [" ", "/", "\n"] + list(string.digits):
-                sequence_field = sequence_field.replace(char, "")
+        if record:
+            records.append(record)
 
-            data["sequence"] = sequence_field.upper()
-
-        return data
+        return records
@@ -1,9 +1,15 @@
 import dictdiffer
 
+import virtool.diff
+
+#: A full copy of the joined otu is stored with every change that produces an otu version divisible by this number.
+SNAPSHOT_INTERVAL = 20
+
 
 def calculate_diff(old, new):
     """
-    Calculate the diff for a joined otu document before and after modification.
+    Calculate the diff for a joined otu document before and after modification. See :mod:`virtool.diff` for the
+    format of the diff.
 
     :param old: the joined otu document before modification
     :type old: dict
@@ -12,10 +18,264 @@ def calculate_diff(old, new):
     :type new: dict
 
     :return: the diff
+    :rtype: dict
+
+    """
+    return virtool.diff.diff_otus(old, new)
+
+
+def apply_diff(otu, diff):
+    """
+    Apply the diff from a change document to a joined otu. Diffs calculated by :func:`calculate_diff` and the
+    ``dictdiffer`` diffs stored in older change documents are both supported.
+
+    :param otu: the joined otu before the change
+    :type otu: dict
+
+    :param diff: the diff from the change document
+    :type diff: Union[dict, list]
+
+    :return: the joined otu after the change
+    :rtype: dict
+
+    """
+    if virtool.diff.is_otu_diff(diff):
+        return virtool.diff.apply_otu_diff(otu, diff)
+
+    return dictdiffer.patch(diff, otu)
+
+
+def revert_diff(otu, diff):
+    """
+    Revert the diff from a change document on a joined otu. Diffs calculated by :func:`calculate_diff` and the
+    ``dictdiffer`` diffs stored in older change documents are both supported.
+
+    :param otu: the joined otu after the change
+    :type otu: dict
+
+    :param diff: the diff from the change document
+    :type diff: Union[dict, list]
+
+    :return: the joined otu before the change
+    :rtype: dict
+
+    """
+    if virtool.diff.is_otu_diff(diff):
+        return virtool.diff.apply_otu_diff(otu, diff, reverse=True)
+
+    return dictdiffer.patch(dictdiffer.swap(diff), otu)
+
+
+def get_snapshot(change):
+    """
+    Return the full joined otu stored in a change document. Creation changes store the new otu as their diff. Other
+    changes may have a ``snapshot`` field (see :data:`SNAPSHOT_INTERVAL`).
+
+    :param change: a change document
+    :type change: dict
+
+    :return: the joined otu at the version of the change or ``None``
+    :rtype: Union[dict, None]
+
+    """
+    if change["method_name"] == "create":
+        return change["diff"]
+
+    return change.get("snapshot")
+
+
+def compose_snapshot_query(otu_id, version, before):
+    """
+    Compose a query that matches changes for the given otu that store a full copy of the otu. Only changes with a
+    version at or below ``version`` are matched if ``before`` is ``True``. Otherwise, only later changes are matched.
+
+    :param otu_id: the id of the otu
+    :type otu_id: str
+
+    :param version: the version to find snapshots relative to
+    :type version: int
+
+    :param before: match changes at or before ``version`` instead of after
+    :type before: bool
+
+    :return: a Mongo query
+    :rtype: dict
+
+    """
+    return {
+        "otu.id": otu_id,
+        "otu.version": {"$lte": version} if before else {"$gt": version},
+        "$or": [
+            {"method_name": "create"},
+            {"snapshot": {"$exists": True}}
+        ]
+    }
+
+
+def compose_range_query(otu_id, lower, upper):
+    """
+    Compose a query that matches the changes for an otu with versions greater than ``lower`` and less than or equal
+    to ``upper``.
+
+    """
+    return {
+        "otu.id": otu_id,
+        "otu.version": {
+            "$gt": lower,
+            "$lte": upper
+        }
+    }
+
+
+def compose_reverted_query(otu_id, version):
+    """
+    Compose a query that matches the changes that must be reverted to take an otu back to ``version``.
+
+    """
+    return {
+        "otu.id": otu_id,
+        "$or": [
+            {"otu.version": "removed"},
+            {"otu.version": {"$gt": version}}
+        ]
+    }
+
+
+def get_nearest(version, versions):
+    """
+    Return the version in ``versions`` that is closest to ``version``. Returns ``None`` if ``versions`` is empty.
+
+    :param version: the target version
+    :type version: int
+
+    :param versions: versions at which a full otu document is available
+    :type versions: Iterable[int]
+
+    :return: the nearest version
+    :rtype: Union[int, None]
+
+    """
+    return min(versions, key=lambda v: abs(v - version), default=None)
+
+
+def get_change_ids(otu_id, start, version):
+    """
+    Return the ids of the changes that must be applied to a full copy of an otu at version ``start`` to patch it to
+    ``version``. Change ids are derived from the otu id and version, so no query is needed to find them. The ids are
+    returned in the order the changes should be applied.
+
+    :param otu_id: the id of the otu
+    :type otu_id: str
+
+    :param start: the version of the full copy of the otu
+    :type start: int
+
+    :param version: the target version
+    :type version: int
+
+    :return: the change ids
     :rtype: list
 
     """
-    return list(dictdiffer.diff(old, new))
+    if start > version:
+        versions = range(start, max(version, -1), -1)
+    else:
+        versions = range(start + 1, version + 1)
+
+    return ["{}.{}".format(otu_id, v) for v in versions]
+
+
+def get_compaction_plan(versions, keep):
+    """
+    Decide which of the compactable changes for an otu are kept and which are deleted. The versions are split into
+    runs of consecutive versions. The first and last change in each run and the changes for versions in ``keep`` are
+    kept. Each kept change that follows deleted changes is paired with the previous kept change in its run so its diff
+    can be recalculated to span the deleted changes.
+
+    :param versions: the versions of the compactable changes
+    :type versions: Iterable[int]
+
+    :param keep: versions that must be kept (eg. those in index manifests)
+    :type keep: Iterable[int]
+
+    :return: pairs of previous and kept versions to fold and the versions to delete
+    :rtype: Tuple[List[tuple], List[int]]
+
+    """
+    versions = sorted(versions)
+    keep = set(keep)
+
+    folded = list()
+    deleted = list()
+
+    kept = None
+    pending = list()
+
+    for i, version in enumerate(versions):
+        first = i == 0 or versions[i - 1] != version - 1
+        last = i == len(versions) - 1 or versions[i + 1] != version + 1
+
+        if first:
+            kept = version
+            pending = list()
+
+        elif last or version in keep:
+            if pending:
+                folded.append((kept, version))
+                deleted += pending
+
+            kept = version
+            pending = list()
+
+        else:
+            pending.append(version)
+
+    return folded, deleted
+
+
+def patch_backward(otu, changes):
+    """
+    Revert the given changes on ``otu``. The changes must be in descending version order and start with the change
+    that produced ``otu``. Returns ``None`` if the creation of the otu is reverted.
+
+    :param otu: the joined otu to patch
+    :type otu: dict
+
+    :param changes: the changes to revert
+    :type changes: Iterable[dict]
+
+    :return: the patched otu
+    :rtype: Union[dict, None]
+
+    """
+    for change in changes:
+        if change["method_name"] == "create":
+            return None
+
+        otu = revert_diff(otu, change["diff"])
+
+    return otu
+
+
+def patch_forward(otu, changes):
+    """
+    Apply the given changes to ``otu``. The changes must be in ascending version order and start with the change that
+    follows the version of ``otu``.
+
+    :param otu: the joined otu to patch
+    :type otu: dict
+
+    :param changes: the changes to apply
+    :type changes: Iterable[dict]
+
+    :return: the patched otu
+    :rtype: dict
+
+    """
+    for change in changes:
+        otu = apply_diff(otu, change["diff"])
+
+    return otu
 
 
 def compose_create_description(document):
@@ -64,13 +64,24 @@ class BuildIndex(Job):
         """
         fasta_dict = dict()
 
+        # Snapshots are stored for the otu versions in the index so they can be quickly rebuilt later.
+        snapshots = dict()
+
+        built_change_ids = set(self.db.history.distinct("_id", {"index.id": self.params["index_id"]}))
+
         for patch_id, patch_version in self.params["manifest"].items():
             document = self.db.otus.find_one(patch_id)
 
+            change_id = "{}.{}".format(patch_id, patch_version)
+
             if document["version"] == patch_version:
                 joined = virtool.db.sync.join_otu(self.db, patch_id)
+
+                if change_id in built_change_ids:
+                    snapshots[change_id] = joined
             else:
                 _, joined, _ = virtool.db.sync.patch_otu_to_version(self.db, patch_id, patch_version)
+                snapshots[change_id] = joined
 
             # Extract the list of sequences from the joined patched patch.
             sequences = virtool.otus.extract_default_sequences(joined)
@@ -85,6 +96,8 @@ class BuildIndex(Job):
             except TypeError:
                 raise
 
+        virtool.db.sync.store_otu_snapshots(self.db, snapshots)
+
         fasta_path = os.path.join(self.params["index_path"], "ref.fa")
 
         write_fasta_dict_to_file(fasta_path, fasta_dict)
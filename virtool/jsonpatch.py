@@ -0,0 +1,142 @@
+"""
+Produces `JSON Patch <https://tools.ietf.org/html/rfc6902>`_ operations that describe the difference between two
+JSON-compatible documents.
+
+"""
+
+
+def escape_token(token):
+    """
+    Escape a key for use in a JSON pointer as described in RFC 6901.
+
+    :param token: a dict key or list index
+    :type token: Union[str, int]
+
+    :return: the escaped token
+    :rtype: str
+
+    """
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def make_patch(old, new, path=""):
+    """
+    Return a list of JSON Patch operations that transform ``old`` into ``new``.
+
+    Dicts are compared key by key. Lists are compared item by item up to the length of the shorter list, then items
+    are added to or removed from the end. This keeps the patch small for the common case of items being changed or
+    appended.
+
+    Values are only considered equal if they also have the same type, so changing ``1`` to ``True`` or ``1.0``
+    produces a ``replace`` operation even though the values are equal in Python.
+
+    :param old: the original document
+    :type old: Union[dict, list]
+
+    :param new: the updated document
+    :type new: Union[dict, list]
+
+    :param path: the JSON pointer of the documents being compared
+    :type path: str
+
+    :return: a list of JSON Patch operations
+    :rtype: list
+
+    """
+    if old is new:
+        return list()
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        return _make_dict_patch(old, new, path)
+
+    if isinstance(old, list) and isinstance(new, list):
+        return _make_list_patch(old, new, path)
+
+    if type(old) is type(new) and old == new:
+        return list()
+
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def _make_dict_patch(old, new, path):
+    patch = list()
+
+    for key, value in old.items():
+        key_path = "{}/{}".format(path, escape_token(key))
+
+        if key not in new:
+            patch.append({"op": "remove", "path": key_path})
+        else:
+            patch += make_patch(value, new[key], key_path)
+
+    for key, value in new.items():
+        if key not in old:
+            patch.append({"op": "add", "path": "{}/{}".format(path, escape_token(key)), "value": value})
+
+    return patch
+
+
+def _make_list_patch(old, new, path):
+    patch = list()
+
+    common = min(len(old), len(new))
+
+    for index in range(common):
+        patch += make_patch(old[index], new[index], "{}/{}".format(path, index))
+
+    # Remove from the end so the indexes of the remaining items do not change.
+    for index in reversed(range(common, len(old))):
+        patch.append({"op": "remove", "path": "{}/{}".format(path, index)})
+
+    for index in range(common, len(new)):
+        patch.append({"op": "add", "path": "{}/-".format(path), "value": new[index]})
+
+    return patch
+
+
+def apply_patch(document, patch):
+    """
+    Apply a list of JSON Patch operations produced by :func:`make_patch` to ``document`` in place. Only the ``add``,
+    ``remove``, and ``replace`` operations are supported.
+
+    :param document: the document to patch
+    :type document: Union[dict, list]
+
+    :param patch: the JSON Patch operations
+    :type patch: list
+
+    :return: the patched document
+    :rtype: Union[dict, list]
+
+    """
+    for operation in patch:
+        if operation["path"] == "":
+            document = operation["value"]
+            continue
+
+        tokens = [t.replace("~1", "/").replace("~0", "~") for t in operation["path"].split("/")[1:]]
+
+        parent = document
+
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+
+        token = tokens[-1]
+
+        if isinstance(parent, list):
+            if operation["op"] == "add":
+                if token == "-":
+                    parent.append(operation["value"])
+                else:
+                    parent.insert(int(token), operation["value"])
+            elif operation["op"] == "remove":
+                del parent[int(token)]
+            else:
+                parent[int(token)] = operation["value"]
+        else:
+            if operation["op"] == "remove":
+                del parent[token]
+            else:
+                parent[token] = operation["value"]
+
+    return document
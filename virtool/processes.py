@@ -1,6 +1,7 @@
 import virtool.db.processes
 
 FIRST_STEPS = {
+    "compact_history": "find_changes",
     "delete_reference": "delete_indexes",
     "clone_reference": "copy_otus",
     "import_reference": "load_file",
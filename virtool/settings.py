@@ -76,11 +76,18 @@ SCHEMA = {
     "db_password": {"type": "string", "default": ""},
     "db_use_auth": get_default_boolean(False),
     "db_use_ssl": get_default_boolean(True),
+    "db_slow_op_ms": get_default_integer(500),
+    "db_batch_notifications": get_default_boolean(False),
+    "otu_disk_cache": get_default_boolean(True),
 
     # HTTP Server
     "server_host": {"type": "string", "default": "localhost"},
     "server_port": get_default_integer(9950),
     "enable_api": {"type": "boolean", "default": False},
+    "dispatcher_coalesce_ms": get_default_integer(0),
+    "dispatcher_delta_updates": get_default_boolean(False),
+    "dispatcher_event_log": get_default_boolean(False),
+    "dispatcher_persist_events": get_default_boolean(False),
 
     # Proxy Server
     "proxy_address": {"type": "string", "default": ""},